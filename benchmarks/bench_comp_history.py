@@ -0,0 +1,65 @@
+"""
+Measures CompHistory.buildAllHistory time and peak resident memory on
+generated tasklist dumps of increasing length.  Each size runs in a fresh
+interpreter so that its peak RSS is its own.
+
+    python benchmarks/bench_comp_history.py [nFiles ...]
+"""
+import os
+import sys
+import time
+import subprocess
+import tempfile
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+from corpus import writeTasklistCorpus
+
+
+def peakRSS():
+    """
+    Peak resident set size of this process in MB, or None where the
+    resource module is not available (ie Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    scale = 1. if sys.platform == 'darwin' else 1024.
+    return maxrss * scale / 2**20
+
+
+def child(directory):
+    from comp_history import CompHistory
+    baseline = peakRSS()
+    t0 = time.perf_counter()
+    history = CompHistory(directory, directory, 'FW7')
+    history.buildAllHistory()
+    elapsed = time.perf_counter() - t0
+    traces = (history.cpuTraceBank.getAllTraces() +
+              history.memTraceBank.getAllTraces())
+    nPoints = sum(len(trace.x) for trace in traces)
+    print(elapsed, nPoints, baseline, peakRSS())
+
+
+def main(*sizes):
+    sizes = [int(size) for size in sizes] or [250, 500, 1000, 2000]
+    print('{0:>7s} {1:>9s} {2:>9s} {3:>13s}'.format(
+        'files', 'seconds', 'points', 'peak RSS (MB)'))
+    for nFiles in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            writeTasklistCorpus(tmp, 'FW7', nFiles)
+            out = subprocess.check_output(
+                [sys.executable, __file__, '--child', tmp + os.sep])
+        (elapsed, nPoints, baseline, peak) = out.split()
+        peak = 'n/a' if peak == b'None' else '{0:.1f} (+{1:.1f})'.format(
+            float(peak), float(peak) - float(baseline))
+        print('{0:7d} {1:9.2f} {2:9d} {3:>13s}'.format(
+            nFiles, float(elapsed), int(nPoints), peak))
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--child']:
+        child(sys.argv[2])
+    else:
+        main(*sys.argv[1:])
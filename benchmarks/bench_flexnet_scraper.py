@@ -0,0 +1,77 @@
+"""
+Compares the single pass lmstat parser with the original one regex search
+per module parser on a generated corpus, then the single pass parser with the
+memory mapped, section indexed reader on large dumps serving many modules.
+
+    python benchmarks/bench_flexnet_scraper.py [nFiles] [nBigFiles]
+"""
+import os
+import sys
+import time
+import tempfile
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+from flexnet_scraper import readFlexNetFile, extractReadTime, extractX
+from flexnet_scraper import readFlexNetFileMapped
+from corpus import writeLmstatCorpus, COMSOL_MODULES
+
+
+def readFlexNetFilePerModule(fName, moduleList):
+    file = open(fName, "r")
+    textBlock = file.read()
+    file.close()
+    readTime = extractReadTime(textBlock)
+    leaseRecords = []
+    for moduleName in moduleList:
+        leaseRecords.extend(extractX(textBlock, moduleName, readTime))
+    return leaseRecords
+
+
+def timeParser(parser, paths, modules):
+    t0 = time.perf_counter()
+    nRecords = 0
+    for path in paths:
+        nRecords += len(parser(path, modules))
+    return (time.perf_counter() - t0, nRecords)
+
+
+def readFlexNetFileIndexed(fName, moduleList):
+    return readFlexNetFileMapped(fName, moduleList, cacheIndex=True)
+
+
+def readFlexNetFileUnindexed(fName, moduleList):
+    return readFlexNetFileMapped(fName, moduleList, cacheIndex=False)
+
+
+def main(nFiles=2000, nBigFiles=200):
+    # The original parser never finds the last section of a file, so it is
+    # left unrequested to keep the two record counts comparable.
+    modules = COMSOL_MODULES[:-1]
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = writeLmstatCorpus(tmp, 'COMSOL', nFiles, COMSOL_MODULES)
+        for (name, parser) in [('per module', readFlexNetFilePerModule),
+                               ('single pass', readFlexNetFile)]:
+            (elapsed, nRecords) = timeParser(parser, paths, modules)
+            print('{0:12s} {1:8.3f} s  {2:8d} records  {3:7.1f} us/file'
+                  .format(name, elapsed, nRecords, 1e6 * elapsed / nFiles))
+    # Dumps of a server with several vendor daemons list hundreds of
+    # features, of which only a few are charted.  Half of the leases are of
+    # the charted ones, so their sections are full.
+    manyModules = ['FEATURE%03d' % i for i in range(400)] + COMSOL_MODULES
+    weights = [1] * 400 + [50] * len(COMSOL_MODULES)
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = writeLmstatCorpus(tmp, 'COMSOL', nBigFiles, manyModules,
+                                  meanOpen=800, weights=weights)
+        print('{0} files of {1:.0f} kB'.format(
+            nBigFiles, os.path.getsize(paths[-1]) / 1e3))
+        for (name, parser) in [('single pass', readFlexNetFile),
+                               ('mmap', readFlexNetFileUnindexed),
+                               ('mmap + .idx', readFlexNetFileIndexed),
+                               ('cached .idx', readFlexNetFileIndexed)]:
+            (elapsed, nRecords) = timeParser(parser, paths, COMSOL_MODULES)
+            print('{0:12s} {1:8.3f} s  {2:8d} records  {3:7.1f} us/file'
+                  .format(name, elapsed, nRecords, 1e6 * elapsed / nBigFiles))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
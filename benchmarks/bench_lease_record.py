@@ -0,0 +1,102 @@
+"""
+Memory and throughput of LeaseRecord against the original dict based
+record, whose hash rebuilt the signature tuple on every call.
+
+    python benchmarks/bench_lease_record.py [nSnapshots]
+"""
+import os
+import sys
+import time
+import tracemalloc
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+from lease_record import LeaseRecord
+from flexnet_history import reconcileSnapshot
+from corpus import leaseWalk, COMSOL_MODULES
+
+
+class LegacyLeaseRecord:
+
+    def __init__(self, user, module, server, terminal, version,
+                 licServer, start, lastSeen=None, checkedOut=True):
+        self.user = user
+        self.module = module
+        self.server = server
+        self.terminal = terminal
+        self.version = version
+        self.licServer = licServer
+        self.start = start
+        if lastSeen is None:
+            self.lastSeen = start
+        else:
+            self.lastSeen = lastSeen
+        self.checkedOut = checkedOut
+        self.licNumber = None
+
+    def getSig(self):
+        return (self.user, self.module, self.server, self.checkedOut)
+
+    def __hash__(self):
+        return hash(self.getSig())
+
+    def __eq__(self, other):
+        return hash(self) == hash(other)
+
+
+def fresh(string):
+    return string[:1] + string[1:]
+
+
+def snapshotRows(nSnapshots):
+    """
+    The fields of every lease line of a random walk of snapshots, with fresh
+    string objects per line as a parser produces them.
+    """
+    rows = []
+    for (t, leases) in leaseWalk(nSnapshots, COMSOL_MODULES, meanOpen=40):
+        rows.append([(fresh(user), fresh(module), fresh(server),
+                      fresh(server), fresh('v5.31'), fresh('FW90/1718 3504'),
+                      start, t)
+                     for (user, module, server, start) in leases])
+    return rows
+
+
+def main(nSnapshots=20000):
+    rows = snapshotRows(nSnapshots)
+    nRecords = sum(len(snapshot) for snapshot in rows)
+    print('{0} snapshots, {1} records'.format(nSnapshots, nRecords))
+    for (name, recordClass) in [('legacy', LegacyLeaseRecord),
+                                ('slots', LeaseRecord)]:
+        t0 = time.perf_counter()
+        snapshots = [[recordClass(*row) for row in snapshot]
+                     for snapshot in rows]
+        build = time.perf_counter() - t0
+        # Parsed strings are only kept alive by the records, so the rows
+        # are rebuilt to measure them along with the records.
+        del snapshots
+        tracemalloc.start()
+        snapshots = [[recordClass(*row) for row in snapshot]
+                     for snapshot in snapshotRows(nSnapshots)]
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        t0 = time.perf_counter()
+        openLics = []
+        nClosed = 0
+        for snapshot in snapshots:
+            (openLics, closed, opened) = reconcileSnapshot(openLics, snapshot)
+            openLics.extend(opened)
+            nClosed += len(closed)
+        reconcile = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        nDistinct = len(set(record for snapshot in snapshots
+                            for record in snapshot))
+        hashing = time.perf_counter() - t0
+        print('{0:7s} build {1:6.3f} s  {2:6.1f} MB ({3:4.0f} B/record)  '
+              'reconcile {4:6.3f} s  set {5:6.3f} s  ({6} closed, '
+              '{7} distinct)'.format(
+                  name, build, memory / 1e6, memory / nRecords, reconcile,
+                  hashing, nClosed, nDistinct))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
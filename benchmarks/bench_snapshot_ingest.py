@@ -0,0 +1,66 @@
+"""
+Compares reconciling every parsed record of each lmstat snapshot with
+reconciling the raw lease lines, which parses only the lines not listed in
+the previous snapshot.  The reports are rendered in memory beforehand, so
+only parsing and reconciliation are timed.  Leases sharing a signature may be
+paired differently by the two (see FlexNetHistory.appendLines), so they are
+checked to hold the same seats.
+
+    python benchmarks/bench_snapshot_ingest.py [nSnapshots] [meanOpen]
+"""
+import os
+import sys
+import time
+from collections import Counter
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import flexnet_scraper
+from flexnet_scraper import parseFlexNetText, parseLeaseLines
+from flexnet_history import FlexNetHistory
+from corpus import leaseWalk, lmstatText, COMSOL_MODULES
+
+
+def countRecords():
+    """
+    Counts the LeaseRecords built by the scraper from here on.
+    """
+    recordFromMatch = flexnet_scraper._recordFromMatch
+    counter = [0]
+
+    def counted(*args):
+        counter[0] += 1
+        return recordFromMatch(*args)
+
+    flexnet_scraper._recordFromMatch = counted
+    return counter
+
+
+def seats(records):
+    return Counter((record.getSig(), record.lastSeen) for record in records)
+
+
+def main(nSnapshots=5000, meanOpen=200):
+    texts = [lmstatText(t, leases, COMSOL_MODULES) for (t, leases)
+             in leaseWalk(nSnapshots, COMSOL_MODULES, meanOpen=meanOpen)]
+    counter = countRecords()
+    results = dict()
+    for name in ['records', 'lines']:
+        counter[0] = 0
+        history = FlexNetHistory('', '', 'COMSOL', COMSOL_MODULES)
+        t0 = time.perf_counter()
+        if name == 'records':
+            for text in texts:
+                history.appendHistory(parseFlexNetText(text, COMSOL_MODULES))
+        else:
+            for text in texts:
+                history.appendLines(*parseLeaseLines(text, COMSOL_MODULES))
+        elapsed = time.perf_counter() - t0
+        results[name] = (seats(history.closedLicenses),
+                         seats(history.openLicenses))
+        print('{0:8s} {1:8.3f} s  {2:9d} records built  {3:7.1f} us/snapshot'
+              .format(name, elapsed, counter[0], 1e6 * elapsed / nSnapshots))
+    print('same seats:', results['records'] == results['lines'])
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
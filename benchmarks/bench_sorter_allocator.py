@@ -0,0 +1,49 @@
+"""
+Benchmark of license slot assignment: the slot scanning
+PlaceAllInAvailableSlots against the heap based PlaceAllInFreeSlots.
+
+    python benchmarks/bench_sorter_allocator.py [nLeases] [meanOpen]
+"""
+import os
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+from sorter_allocator import PlaceAllInAvailableSlots, PlaceAllInFreeSlots
+
+
+def sampleLeases(nLeases, meanOpen, seed=0):
+    """
+    (start, end) pairs of leases arriving every few minutes and held for
+    long enough that about 'meanOpen' are open at once.
+    """
+    rnd = random.Random(seed)
+    t = datetime(2018, 1, 1)
+    leases = []
+    for _ in range(nLeases):
+        t += timedelta(minutes=rnd.randint(0, 10))
+        duration = timedelta(minutes=rnd.expovariate(1. / (5 * meanOpen)))
+        leases.append((t, t + duration))
+    return leases
+
+
+def main(nLeases=20000, meanOpen=200):
+    leases = sampleLeases(nLeases, meanOpen)
+    results = []
+    for (name, place) in [('scan', PlaceAllInAvailableSlots),
+                          ('heap', PlaceAllInFreeSlots)]:
+        items = list(leases)
+        t0 = time.perf_counter()
+        slotBank = place(items, lambda lease: lease[0],
+                         lambda lease: lease[1])
+        elapsed = time.perf_counter() - t0
+        results.append(slotBank)
+        print('{0:5s} {1:8.3f} s  {2:4d} slots'.format(
+            name, elapsed, len(slotBank)))
+    assert results[0] == results[1]
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,61 @@
+"""
+Micro-benchmark of lease start time parsing: datetime.strptime against
+flexnet_scraper.parseStartTime.
+
+    python benchmarks/bench_start_time.py [nLines]
+"""
+import os
+import sys
+import time
+import random
+from datetime import datetime, timedelta
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+from flexnet_scraper import parseStartTime
+
+
+def strptimeStartTime(partialStartTimeStr, readTime):
+    startTime = datetime.strptime(partialStartTimeStr, '%m/%d %H:%M')
+    startTime = startTime.replace(year=readTime.year)
+    if startTime > readTime:
+        startTime = startTime.replace(year=(startTime.year - 1))
+    return startTime
+
+
+def sampleLines(nLines, nLeases=30, seed=0):
+    """
+    (partialStartTime, readTime) pairs as they occur in consecutive
+    snapshots: a few dozen open leases, each repeated in every snapshot.
+    """
+    rnd = random.Random(seed)
+    readTime = datetime(2018, 12, 31, 23, 0)
+    starts = [readTime - timedelta(minutes=rnd.randint(0, 50000))
+              for _ in range(nLeases)]
+    samples = []
+    while len(samples) < nLines:
+        readTime += timedelta(minutes=5)
+        if rnd.random() < 0.05:
+            starts[rnd.randrange(nLeases)] = readTime
+        for start in starts:
+            raw = '{0}/{1} {2}:{3:02d}'.format(
+                start.month, start.day, start.hour, start.minute)
+            samples.append((raw, readTime))
+    return samples
+
+
+def main(nLines=200000):
+    samples = sampleLines(nLines)
+    results = []
+    for (name, parser) in [('strptime', strptimeStartTime),
+                           ('parseStartTime', parseStartTime)]:
+        t0 = time.perf_counter()
+        parsed = [parser(raw, readTime) for (raw, readTime) in samples]
+        elapsed = time.perf_counter() - t0
+        results.append(parsed)
+        print('{0:15s} {1:8.3f} s  {2:7.2f} us/line'.format(
+            name, elapsed, 1e6 * elapsed / len(samples)))
+    assert results[0] == results[1]
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
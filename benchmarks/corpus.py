@@ -0,0 +1,180 @@
+"""
+Generators for synthetic lmstat dumps used by the benchmarks.
+"""
+import os
+import random
+import datetime
+
+_days = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+
+COMSOL_MODULES = [
+    'COMSOLGUI', 'WAVEOPTICS', 'RF', 'HEATTRANSFER', 'ACOUSTICS',
+    'LLMATLAB', 'CADIMPORT', 'OPTIMIZATION']
+
+
+def lmstatText(readTime, leases, modules):
+    """
+    Renders an lmstat report.
+
+    Arguments:
+        readTime (datetime) -- The time of the report.
+        leases (list(tuple)) -- (user, module, server, start) of every lease.
+        modules (list(str)) -- The modules served, in report order.
+
+    Returns:
+        (str) -- The report as written by 'lmutil lmstat -a'.
+    """
+    t = readTime
+    lines = [
+        'lmstat - Copyright (c) 1989-2017 Flexera Software LLC. '
+        'All Rights Reserved.',
+        'Flexible License Manager status on %s %d/%d/%d %02d:%02d' % (
+            _days[t.weekday()], t.month, t.day, t.year, t.hour, t.minute),
+        '',
+        '[Detecting lmgrd processes...]',
+        'License server status: 1718@FW90',
+        '    License file(s) on FW90: C:\\COMSOL\\license.dat:',
+        '',
+        'Feature usage info:',
+        '']
+    for module in modules:
+        inUse = [lease for lease in leases if lease[1] == module]
+        lines.append('Users of %s:  (Total of 10 licenses issued;  '
+                     'Total of %d licenses in use)' % (module, len(inUse)))
+        lines.append('')
+        if len(inUse) == 0:
+            continue
+        lines.append('  "%s" v5.3, vendor: LMCOMSOL, expiry: permanent(no '
+                     'expiration date)' % module)
+        lines.append('  floating license')
+        lines.append('')
+        for (user, _, server, start) in inUse:
+            lines.append(
+                '    %s %s %s (v5.31) (FW90/1718 3504), start %s %d/%d %d:%02d'
+                % (user, server, server, _days[start.weekday()], start.month,
+                   start.day, start.hour, start.minute))
+        lines.append('')
+    return '\n'.join(lines) + '\n'
+
+
+def leaseWalk(nSnapshots, modules, seed=0, meanOpen=20,
+              firstTime=datetime.datetime(2018, 12, 30), weights=None):
+    """
+    Yields (readTime, leases) for a random walk of license usage sampled
+    every five minutes, with about 'meanOpen' leases open at a time from the
+    first snapshot on.  Leases are spread over the modules in proportion to
+    'weights', evenly if None.
+    """
+    rnd = random.Random(seed)
+    users = ['user' + str(i) for i in range(40)]
+    servers = ['FW3', 'FW4', 'FW5', 'FW6', 'FW7']
+    t = firstTime
+    closeProb = 1. / 50
+
+    def newLease(start):
+        module = rnd.choices(modules, weights)[0]
+        return (rnd.choice(users), module, rnd.choice(servers), start)
+
+    # Start at the steady state, with leases taken over the last few hours.
+    leases = [newLease(t - datetime.timedelta(minutes=rnd.randint(5, 600)))
+              for _ in range(_poisson(rnd, meanOpen))]
+    for _ in range(nSnapshots):
+        t += datetime.timedelta(minutes=5)
+        leases = [lease for lease in leases if rnd.random() > closeProb]
+        # As many leases start as close, on average.
+        for _ in range(_poisson(rnd, meanOpen * closeProb)):
+            leases.append(newLease(
+                t - datetime.timedelta(minutes=rnd.randint(0, 4))))
+        yield (t, list(leases))
+
+
+def _poisson(rnd, mean):
+    """
+    Draws from a Poisson distribution by counting the arrivals of a Poisson
+    process in a unit of time.
+    """
+    (n, elapsed) = (0, rnd.expovariate(mean) if mean > 0 else 1.)
+    while elapsed < 1.:
+        n += 1
+        elapsed += rnd.expovariate(mean)
+    return n
+
+
+def writeLmstatCorpus(directory, prefix, nFiles, modules=COMSOL_MODULES,
+                      seed=0, meanOpen=20, weights=None):
+    """
+    Writes 'nFiles' lmstat reports named like the dump script does.
+
+    Returns:
+        list(str) -- The paths of the written files in chronological order.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = list()
+    for (t, leases) in leaseWalk(nFiles, modules, seed, meanOpen,
+                                 weights=weights):
+        fName = '%s_%s.txt' % (prefix, t.strftime('%Y_%m_%d_%H_%M_%S'))
+        path = os.path.join(directory, fName)
+        with open(path, 'w') as file:
+            file.write(lmstatText(t, leases, modules))
+        paths.append(path)
+    return paths
+
+
+def tasklistText(processes):
+    """
+    Renders the output of 'tasklist /nh /v /fo csv'.
+
+    Arguments:
+        processes (list(tuple)) -- (imageName, pid, memKB, user, cpuSeconds)
+
+    Returns:
+        (str) -- The csv text.
+    """
+    lines = []
+    for (imageName, pid, mem, user, seconds) in processes:
+        (h, rem) = divmod(int(seconds), 3600)
+        (m, s) = divmod(rem, 60)
+        lines.append('"%s","%d","Console","1","%s K","Running","%s",'
+                     '"%d:%02d:%02d","N/A"' % (
+                         imageName, pid, '{0:,}'.format(int(mem)), user,
+                         h, m, s))
+    return '\n'.join(lines) + '\n'
+
+
+def writeTasklistCorpus(directory, compName, nFiles, nProcesses=200, seed=0,
+                        firstTime=datetime.datetime(2018, 6, 26, 20, 0)):
+    """
+    Writes 'nFiles' tasklist dumps five minutes apart, named like the dump
+    script does (ie FW7_2018_06_26_20_05_00.txt).
+
+    Returns:
+        list(str) -- The written file names in chronological order.
+    """
+    rnd = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    users = ['NT AUTHORITY\\SYSTEM', 'N/A', 'NT AUTHORITY\\NETWORK SERVICE']
+    users += [compName + '\\user' + str(i) for i in range(6)]
+    images = ['comsol.exe', 'chrome.exe', 'explorer.exe', 'svchost.exe',
+              'matlab.exe', 'python.exe', 'cst design environment.exe']
+    nextPid = 100
+    processes = list()
+    for _ in range(nProcesses):
+        processes.append([rnd.choice(images), nextPid, rnd.randint(1e3, 1e6),
+                          rnd.choice(users), rnd.randint(0, 1e4)])
+        nextPid += 4
+    t = firstTime
+    fNames = list()
+    for _ in range(nFiles):
+        t += datetime.timedelta(minutes=5)
+        for process in processes:
+            process[4] += rnd.randint(0, 300)
+        for i in range(len(processes)):
+            if rnd.random() < 0.01:
+                processes[i] = [rnd.choice(images), nextPid,
+                                rnd.randint(1e3, 1e6), rnd.choice(users), 0]
+                nextPid += 4
+        fName = '%s_%s.txt' % (compName, t.strftime('%Y_%m_%d_%H_%M_%S'))
+        with open(os.path.join(directory, fName), 'w') as file:
+            file.write(tasklistText(processes))
+        fNames.append(fName)
+    return fNames
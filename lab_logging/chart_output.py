@@ -0,0 +1,187 @@
+"""
+Writes the chart figures, either as self-contained HTML pages or as compact
+JSON data files, optionally gzipped, along with one static viewer page per
+chart type which loads them with plotly.js.  Every file is built in memory and
+published with a single atomic write, so the web server never serves a partly
+written page.
+
+The viewer for a chart type is shared by every figure of that type, so a
+figure is opened as ie 'gantt_viewer.html?data=COMSOL'.  Only the data file
+changes between runs; the viewer is rewritten only if its content changed.
+"""
+import io
+import os
+import gzip
+import json
+from plotly.offline import plot
+from plotly.utils import PlotlyJSONEncoder
+
+outputModes = ('html', 'json', 'json.gz')
+
+# The pages load plotly.js from the CDN rather than embedding it.
+plotlyScriptCall = (
+    '<script src="https://cdn.plot.ly/plotly-latest.min.js"></script>')
+
+_pageTemplate = """<html>
+<head><meta charset="utf-8" />{script}</head>
+<body>
+{div}
+</body>
+</html>
+"""
+
+_viewerTemplate = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{chartType}</title>
+{script}
+<style>html, body, #chart {{ height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="chart"></div>
+<script>
+var name = new URLSearchParams(window.location.search).get('data') || '';
+var chart = document.getElementById('chart');
+function loadFigure(url) {{
+    return fetch(url).then(function (response) {{
+        if (!response.ok) {{
+            throw new Error(url + ': ' + response.status);
+        }}
+        if (url.slice(-3) === '.gz') {{
+            var stream = response.body.pipeThrough(
+                new DecompressionStream('gzip'));
+            return new Response(stream).json();
+        }}
+        return response.json();
+    }});
+}}
+if (!/^[A-Za-z0-9_.-]+$/.test(name)) {{
+    chart.textContent = 'No figure given, ie ?data=COMSOL';
+}} else {{
+    document.title = name;
+    loadFigure(encodeURIComponent(name) + '{suffix}').then(function (fig) {{
+        Plotly.newPlot(chart, fig.data, fig.layout);
+    }}).catch(function (error) {{
+        chart.textContent = error.message;
+    }});
+}}
+</script>
+</body>
+</html>
+"""
+
+
+def writeFigure(fig, outDirectory, name, chartType, outputMode='html'):
+    """
+    Writes 'fig' in the given output mode.
+
+    Arguments:
+        fig (dict or plotly Figure) -- The figure, with 'data' and 'layout'.
+        outDirectory (str) -- Where the files are written.
+        name (str) -- The figure name, ie 'COMSOL' for 'COMSOL.html'.
+        chartType (str) -- The viewer the figure is shown in if it is
+            written as data, ie 'gantt'.
+
+    Keyword Arguments:
+        outputMode (str) -- 'html', 'json' or 'json.gz'. (default: {'html'})
+
+    Returns:
+        (list(str)) -- The paths of the files the figure is shown from.
+    """
+    if outputMode == 'html':
+        return writeFigureHTML(fig, outDirectory, name)
+    return writeFigureData(fig, outDirectory, name, chartType, outputMode)
+
+
+def writeFigureHTML(fig, outDirectory, name):
+    """
+    Writes 'fig' as a page which loads plotly.js from the CDN.
+
+    Returns:
+        (list(str)) -- The path of the page.
+    """
+    div = plot(fig, output_type='div', include_plotlyjs=False)
+    page = _pageTemplate.format(script=plotlyScriptCall, div=div)
+    outPath = os.path.join(outDirectory, name + '.html')
+    writeAtomic(outPath, page.encode('utf-8'))
+    return [outPath]
+
+
+def figureSuffix(outputMode):
+    """
+    The extension of the data files written in 'outputMode'.
+    """
+    if outputMode not in outputModes[1:]:
+        raise ValueError("Unknown output mode: " + repr(outputMode))
+    return '.' + outputMode
+
+
+def viewerPath(outDirectory, chartType):
+    return os.path.join(outDirectory, chartType + '_viewer.html')
+
+
+def writeFigureData(fig, outDirectory, name, chartType, outputMode='json'):
+    """
+    Writes the data and layout of 'fig' as compact JSON, and the viewer page
+    for 'chartType' if it is missing or out of date.
+
+    Arguments:
+        fig (dict or plotly Figure) -- The figure, with 'data' and 'layout'.
+        outDirectory (str) -- Where the files are written.
+        name (str) -- The figure name, ie 'COMSOL' for 'COMSOL.json'.
+        chartType (str) -- The viewer the figure is shown in, ie 'gantt'.
+
+    Keyword Arguments:
+        outputMode (str) -- 'json', or 'json.gz' to gzip the data file.
+            (default: {'json'})
+
+    Returns:
+        (list(str)) -- The paths of the data file and of the viewer, which
+        the figure needs whether or not it was rewritten.
+    """
+    suffix = figureSuffix(outputMode)
+    figure = dict(data=fig['data'], layout=fig['layout'])
+    data = json.dumps(figure, cls=PlotlyJSONEncoder,
+                      separators=(',', ':')).encode('utf-8')
+    if outputMode == 'json.gz':
+        data = gzipBytes(data)
+    outPath = os.path.join(outDirectory, name + suffix)
+    writeAtomic(outPath, data)
+    viewer = _viewerTemplate.format(chartType=chartType, suffix=suffix,
+                                    script=plotlyScriptCall).encode('utf-8')
+    viewerOutPath = viewerPath(outDirectory, chartType)
+    if readBytes(viewerOutPath) != viewer:
+        writeAtomic(viewerOutPath, viewer)
+    return [outPath, viewerOutPath]
+
+
+def gzipBytes(data):
+    """
+    Gzips 'data' with a fixed timestamp, so unchanged figures give unchanged
+    files.
+    """
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as file:
+        file.write(data)
+    return buffer.getvalue()
+
+
+def readBytes(path):
+    try:
+        with open(path, 'rb') as file:
+            return file.read()
+    except OSError:
+        return None
+
+
+def writeAtomic(path, data):
+    """
+    Writes 'data' to a temporary file next to 'path' and renames it over
+    'path', so readers never see a partly written file.  Concurrent chart
+    builds may write the same viewer, so the temporary name is per process.
+    """
+    tmpPath = path + '.' + str(os.getpid()) + '.tmp'
+    with open(tmpPath, 'wb') as file:
+        file.write(data)
+    os.replace(tmpPath, path)
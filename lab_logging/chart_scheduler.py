@@ -0,0 +1,134 @@
+import os
+import sys
+import json
+import time
+import datetime
+import traceback
+import multiprocessing
+from multiprocessing.connection import wait
+from chart_output import writeAtomic
+
+
+class ChartJob:
+    """
+    A named chart build to be run by runJobs.
+    """
+
+    def __init__(self, name, func, args=()):
+        """
+        Standard initialization.  Saves arguments as instance attributes.
+
+        Arguments:
+            name (str) -- Job name used in messages and the summary.
+            func (callable) -- A module level function that builds the chart
+                and returns a dict of statistics (see FlexNetHistory.getStats).
+                It must be picklable so that it can run in a worker process.
+
+        Keyword Arguments:
+            args (tuple) -- Positional arguments for func. (default: {()})
+        """
+        self.name = name
+        self.func = func
+        self.args = args
+
+
+def runJobs(jobs, nWorkers=None, timeout=None, summaryPath=None):
+    """
+    Runs independent ChartJobs in worker processes, at most nWorkers at a
+    time, and reports how each one went.
+
+    Each job gets its own process, so a job that exceeds 'timeout' can be
+    terminated without affecting the others.  A job that raises is reported
+    as failed along with its traceback.
+
+    Arguments:
+        jobs (list(ChartJob)) -- The jobs to run.
+
+    Keyword Arguments:
+        nWorkers (int) -- Concurrent jobs. (default: {os.cpu_count()})
+        timeout (float) -- Seconds after which a job is terminated.  Jobs are
+            never terminated if None. (default: {None})
+        summaryPath (str) -- Where to write the results as JSON.  Nothing is
+            written if None. (default: {None})
+
+    Returns:
+        list(dict) -- One result per job, in the order of 'jobs', with the
+        keys 'name', 'success', 'wallTime' and, on success, the statistics
+        returned by the job or, on failure, 'error'.
+    """
+    if nWorkers is None:
+        nWorkers = os.cpu_count() or 1
+    started = datetime.datetime.now()
+    t0 = time.perf_counter()
+    pending = list(enumerate(jobs))
+    pending.reverse()
+    running = dict()  # connection -> (index, job, process, start time)
+    results = [None] * len(jobs)
+    while pending or running:
+        while pending and len(running) < nWorkers:
+            (index, job) = pending.pop()
+            (recvConn, sendConn) = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(
+                target=_runJob, args=(job.func, job.args, sendConn),
+                name=job.name)
+            process.start()
+            sendConn.close()
+            running[recvConn] = (index, job, process, time.perf_counter())
+        for conn in wait(list(running.keys()), timeout=1.):
+            (index, job, process, jobStart) = running.pop(conn)
+            try:
+                result = conn.recv()
+            except EOFError:
+                result = dict(
+                    success=False,
+                    wallTime=time.perf_counter() - jobStart,
+                    error='worker exited with code ' + str(process.exitcode))
+            conn.close()
+            process.join()
+            results[index] = _report(job, result)
+        if timeout is None:
+            continue
+        now = time.perf_counter()
+        for (conn, (index, job, process, jobStart)) in list(running.items()):
+            if now - jobStart > timeout:
+                process.terminate()
+                process.join()
+                conn.close()
+                del running[conn]
+                results[index] = _report(job, dict(
+                    success=False, wallTime=now - jobStart,
+                    error='timed out after ' + str(timeout) + ' s'))
+    if summaryPath is not None:
+        summary = dict(
+            started=started.isoformat(),
+            wallTime=time.perf_counter() - t0,
+            nWorkers=nWorkers,
+            jobs=results)
+        writeAtomic(summaryPath, json.dumps(summary, indent=1).encode())
+    return results
+
+
+def _runJob(func, args, conn):
+    """
+    Worker process entry point.  Sends the job's result through conn.
+    """
+    jobStart = time.perf_counter()
+    try:
+        stats = func(*args) or dict()
+        result = dict(success=True, **stats)
+    except Exception:
+        result = dict(success=False, error=traceback.format_exc())
+    result['wallTime'] = time.perf_counter() - jobStart
+    sys.stdout.flush()
+    conn.send(result)
+    conn.close()
+
+
+def _report(job, result):
+    result = dict(name=job.name, **result)
+    if result['success']:
+        print(job.name, "Chart Success ({0:.1f} s)".format(result['wallTime']))
+    else:
+        print(result['error'], file=sys.stderr)
+        print(job.name, "Chart Failed")
+    return result
@@ -0,0 +1,173 @@
+"""
+Runs the license status and process list commands on a schedule and hands
+their output straight to the parsers, rather than dumping text files for a
+later pass to read back.  The raw output can still be archived to the dump
+directory, named as the dump scripts name their files, so the charts can be
+rebuilt from it.
+
+Every source runs in its own asyncio task with its own interval, and the
+commands run as subprocesses, so a slow license server does not hold up the
+other sources.
+"""
+import os
+import sys
+import time
+import asyncio
+import datetime
+import locale
+import subprocess
+import traceback
+from functools import partial
+from flexnet_scraper import parseLeaseLines
+from comp_snapshot import Comp_Snapshot, parseTasklistText, buildMemUsage
+from chart_output import writeAtomic
+
+# What the dump scripts' redirection writes and open(fName, 'r') reads.
+_textEncoding = locale.getpreferredencoding(False)
+
+
+class Source:
+    """
+    A command whose output is collected periodically.
+    """
+
+    def __init__(self, name, command, parse, interval=300., timeout=60.):
+        """
+        Standard initialization.  Saves arguments as instance attributes.
+
+        Arguments:
+            name (str) -- The dump file prefix, ie 'COMSOL' or 'FW7'.
+            command (list(str)) -- The program and its arguments.
+            parse (callable) -- Takes the output text and the time the command
+                was started and returns the snapshot handed on.
+
+        Keyword Arguments:
+            interval (float) -- Seconds between the starts of two runs.
+                (default: {300.})
+            timeout (float) -- Seconds after which a run is killed.
+                (default: {60.})
+        """
+        self.name = name
+        self.command = command
+        self.parse = parse
+        self.interval = interval
+        self.timeout = timeout
+
+
+def lmstatSource(name, command, modules, interval=300., timeout=60.):
+    """
+    A Source for 'lmutil lmstat -a', whose snapshots are the lease lines of
+    'modules' (see flexnet_scraper.parseLeaseLines).
+    """
+    return Source(name, command, partial(parseLmstat, moduleList=modules),
+                  interval, timeout)
+
+
+def tasklistSource(name, command, interval=300., timeout=60.):
+    """
+    A Source for 'tasklist /nh /v /fo csv', whose snapshots are
+    Comp_Snapshots.
+    """
+    return Source(name, command, parseTasklist, interval, timeout)
+
+
+def parseLmstat(text, started, moduleList=None):
+    # lmstat reports its own read time.
+    return parseLeaseLines(text, moduleList)
+
+
+def parseTasklist(text, started):
+    table = parseTasklistText(text)
+    return Comp_Snapshot(started, table, buildMemUsage(table))
+
+
+def dumpFileName(name, started):
+    """
+    The name the dump scripts give a file, ie 'FW7_2018_06_26_20_05_00.txt'.
+    """
+    return name + started.strftime('_%Y_%m_%d_%H_%M_%S') + '.txt'
+
+
+async def runCommand(command, timeout=None):
+    """
+    Runs a command and returns its standard output.
+
+    Raises:
+        subprocess.TimeoutExpired -- If it ran longer than 'timeout' seconds.
+            It is killed.
+        subprocess.CalledProcessError -- If it exited with an error.
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL)
+    try:
+        (stdout, _) = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        try:
+            process.kill()
+        except ProcessLookupError:
+            # It exited as the timeout fired.
+            pass
+        await process.wait()
+        raise subprocess.TimeoutExpired(command, timeout)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command,
+                                            stdout)
+    return stdout
+
+
+async def collectSource(source, handle, archiveDirectory=None, nRuns=None):
+    """
+    Runs 'source' every 'source.interval' seconds and hands each snapshot to
+    'handle'.  A run which fails or times out is reported and skipped.  Runs
+    which would start while the previous one is still going are skipped.
+
+    Arguments:
+        source (Source) -- What to run.
+        handle (callable) -- Called as handle(source, snapshot, fName), where
+            fName is the name of the archived output, or None.
+
+    Keyword Arguments:
+        archiveDirectory (str) -- Where the raw output is written, named as
+            by the dump scripts.  Nothing is written if None.
+            (default: {None})
+        nRuns (int) -- Stop after this many runs.  Runs forever if None.
+            (default: {None})
+    """
+    nextRun = time.monotonic()
+    run = 0
+    while nRuns is None or run < nRuns:
+        started = datetime.datetime.now().replace(microsecond=0)
+        try:
+            output = await runCommand(source.command, source.timeout)
+            fName = None
+            if archiveDirectory is not None:
+                fName = dumpFileName(source.name, started)
+                writeAtomic(os.path.join(archiveDirectory, fName), output)
+            # Text mode reads of the archived files translate newlines.
+            text = output.decode(_textEncoding, errors='replace')
+            text = text.replace('\r\n', '\n')
+            handle(source, source.parse(text, started), fName)
+        except Exception:
+            print("Warning: collecting", source.name, "failed.",
+                  file=sys.stderr)
+            traceback.print_exc()
+        run += 1
+        if nRuns is not None and run >= nRuns:
+            break
+        nextRun += source.interval
+        now = time.monotonic()
+        if nextRun < now and source.interval > 0:
+            # Skip the runs which were missed.
+            nextRun += ((now - nextRun) // source.interval + 1) * \
+                source.interval
+        await asyncio.sleep(max(0., nextRun - now))
+
+
+async def collect(sources, handle, archiveDirectory=None, nRuns=None):
+    """
+    Collects every source concurrently (see collectSource).
+    """
+    await asyncio.gather(*[
+        collectSource(source, handle, archiveDirectory, nRuns)
+        for source in sources])
@@ -1,9 +1,20 @@
 import os
 import sys
-import glob
-from plotly.offline import download_plotlyjs, init_notebook_mode, plot, iplot
+import itertools
+import numpy as np
+from functools import partial
 import plotly.graph_objs as go
-from comp_snapshot import Comp_Snapshot
+from comp_snapshot import Comp_Snapshot, importTable
+from comp_snapshot import processColumns, processesFromColumns
+from snapshot_cache import SnapshotCache
+from dump_index import DumpIndex
+from chart_output import writeFigure
+from fingerprint import inputFingerprint
+from ordered_pool import orderedPoolMap
+from decimation import TracePyramid
+
+# The number of usage samples written to the store per transaction.
+storeBatch = 1000
 
 
 class CompHistory:
@@ -27,7 +38,9 @@ class CompHistory:
     information about a user in the latest snapshot that trace can be closed.
     """
 
-    def __init__(self, dataDirectory, outDirectory, compName):
+    def __init__(self, dataDirectory, outDirectory, compName, nWorkers=1,
+                 cacheDirectory=None, fileNames=None, decimation=None,
+                 outputMode='html', store=None):
         """
         CompHistory plots computer usage by processing
 
@@ -35,6 +48,20 @@ class CompHistory:
             dataDirectory: The directory where the data files live.  (ie '.\\dump\\'.)
             outDirectory: The directory where the output files go. (ie 'c:\\bleh')
             compName: Computer name as it appears in the files.  (ie 'FW7')
+            nWorkers: Number of processes used to parse the files.  Files are
+                parsed serially if 1.
+            cacheDirectory: Where parsed files are cached between runs (see
+                SnapshotCache).  Nothing is cached if None.
+            fileNames: The sorted names of this computer's files, ie from a
+                shared DumpIndex.  The data directory is listed if None.
+            decimation: A decimation.Decimation applied to every trace before
+                plotting, with ages counted from the latest sample.  Every
+                sample is plotted if None.
+            outputMode: 'html' for a self-contained Plotly page, or 'json' /
+                'json.gz' for a data file shown by the shared 'usage' viewer
+                page (see chart_output).
+            store: A LeaseStore to which the usage samples are written as
+                they are folded.  Nothing is stored if None.
 
         Returns:
             Nothing.  File generated.
@@ -47,6 +74,21 @@ class CompHistory:
         self.dataDirectory = dataDirectory
         self.outDirectory = outDirectory
         self.compName = compName
+        self.nWorkers = nWorkers
+        self.cacheDirectory = cacheDirectory
+        self.fileNames = fileNames
+        self.decimation = decimation
+        # The decimation.TracePyramid of each trace, kept between renders.
+        self.pyramids = dict()
+        self.outputMode = outputMode
+        self.nFilesParsed = 0
+        self.outputFiles = list()
+        self.store = store
+        self.storedUntil = None
+        self.lastFile = None
+        self.lastSnapshot = None
+        # The (start, end) of the store window loaded by loadWindow, if any.
+        self.window = None
 
     def buildAllHistory(self):
         """
@@ -54,22 +96,180 @@ class CompHistory:
         Comp_Snapshots to generate memory and CPU usage.
 
         In order to generate CPU usage, two Comp_Snapshots must be compared.
+        The steps are chained generators (file names -> snapshots -> usage),
+        so only the two snapshots being compared are held in memory.
+        """
+        self.foldFiles(self.gatherFileNames())
+
+    def appendFiles(self, fNames):
+        """
+        Folds newly dumped files into the history, ie as they are found by a
+        DumpWatcher.  Files not newer than the last one folded are ignored.
+
+        Args:
+            fNames: The sorted names of the new files, relative to the data
+                directory.
+        """
+        self.checkNotWindow()
+        fNames = [fName for fName in fNames
+                  if self.lastFile is None or fName > self.lastFile]
+        if self.fileNames is not None:
+            self.fileNames.extend(fNames)
+        self.foldFiles(fNames)
+
+    def foldFiles(self, fNames):
+        """
+        Appends the usage of the files to the trace banks.  The last snapshot
+        is kept, so that the CPU usage of the next file folded can be computed.
+
+        Args:
+            fNames: The sorted file names, relative to the data directory.
+        """
+        self.foldSnapshots(self.parseFiles(fNames))
+        self.nFilesParsed += len(fNames)
+        if fNames:
+            self.lastFile = fNames[-1]
+
+    def appendSnapshot(self, snapshot, fName=None):
         """
-        baseDir = os.getcwd()
-        os.chdir(self.dataDirectory)
-        fNames = glob.glob(self.compName + "_20*.*")
-        os.chdir(baseDir)
-        fNames.sort()
-        csOld = Comp_Snapshot.fromFile(self.dataDirectory, fNames[0])
-        for i in range(2, len(fNames)):
-            csNew = Comp_Snapshot.fromFile(self.dataDirectory, fNames[i])
-            csNew.computeCPUUsage(csOld)
-            # print(csNew.memUsage)
-            date = csNew.date
-            self.cpuTraceBank.addValues(csNew.cpuUsage, date)
-            self.memTraceBank.addValues(csNew.memUsage, date)
-            csOld = csNew
-        os.chdir(baseDir)
+        Folds a snapshot taken in process (see collector) into the history.
+
+        Args:
+            snapshot: The Comp_Snapshot, newer than any folded so far.
+            fName: The name of the file the output was archived to, relative
+                to the data directory, or None if it was not archived.
+        """
+        self.foldSnapshots([snapshot])
+        if fName is not None:
+            self.lastFile = fName
+            if self.fileNames is not None:
+                self.fileNames.append(fName)
+
+    def foldSnapshots(self, snapshots):
+        """
+        Appends the usage of the snapshots to the trace banks.  If there is a
+        store, the samples are written to it every 'storeBatch' samples, so
+        that only a batch of usage dicts is held in memory.
+        """
+        self.checkNotWindow()
+        snapshots = iter(snapshots)
+        if self.lastSnapshot is not None:
+            snapshots = itertools.chain([self.lastSnapshot], snapshots)
+        samples = list()
+        for (date, cpuUsage, memUsage) in iterUsage(self.keepLast(snapshots)):
+            self.cpuTraceBank.addValues(cpuUsage, date)
+            self.memTraceBank.addValues(memUsage, date)
+            if self.store is not None:
+                samples.append((date, cpuUsage, memUsage))
+                if len(samples) >= storeBatch:
+                    self.storeSamples(samples)
+                    samples = list()
+        if samples:
+            self.storeSamples(samples)
+
+    def storeSamples(self, samples):
+        """
+        Writes the samples newer than those already in the store, in one
+        transaction.  The history is rebuilt from every file on each run, so
+        most samples are already stored.
+        """
+        if self.storedUntil is None:
+            self.storedUntil = self.store.lastUsageTime(self.compName)
+        if self.storedUntil is not None:
+            samples = [sample for sample in samples
+                       if sample[0] > self.storedUntil]
+        if samples:
+            self.store.addUsage(self.compName, samples)
+            self.storedUntil = samples[-1][0]
+
+    def loadWindow(self, start, end):
+        """
+        Fills the trace banks with the samples of the store taken in the
+        window [start, end), so that the chart of the window is built without
+        reading the data files.
+
+        The history is then only fit for rendering: folding files or
+        snapshots raises a RuntimeError, since the window is not the whole
+        history.
+        """
+        self.memTraceBank = TraceBank()
+        self.cpuTraceBank = TraceBank()
+        self.pyramids = dict()
+        self.window = (start, end)
+        self.lastFile = None
+        self.lastSnapshot = None
+        for (date, cpuUsage, memUsage) in self.store.usage(
+                self.compName, start, end):
+            self.cpuTraceBank.addValues(cpuUsage, date)
+            self.memTraceBank.addValues(memUsage, date)
+
+    def checkNotWindow(self):
+        if self.window is not None:
+            raise RuntimeError(
+                "The " + self.compName + " history holds a window of the "
+                "store and can only be rendered.")
+
+    def keepLast(self, snapshots):
+        for snapshot in snapshots:
+            self.lastSnapshot = snapshot
+            yield snapshot
+
+    def gatherFileNames(self):
+        """
+        Returns:
+            list(str) -- The sorted names of this computer's files, relative
+            to the data directory.
+        """
+        if self.fileNames is not None:
+            return self.fileNames
+        return DumpIndex(self.dataDirectory).fileNames(self.compName)
+
+    def parseFiles(self, fNames):
+        """
+        Imports the files as Comp_Snapshots, in a process pool if 'nWorkers'
+        is greater than 1, and through the SnapshotCache if there is a
+        'cacheDirectory'.
+
+        Args:
+            fNames: The file names, relative to the data directory.
+
+        Returns:
+            An iterator of Comp_Snapshots in the order of fNames.
+        """
+        parse = partial(importTable, self.dataDirectory)
+        if self.cacheDirectory is None:
+            tasks = self.mapFiles(parse, fNames)
+        else:
+            cache = SnapshotCache(self.cacheDirectory)
+            tasks = cache.mapCached(
+                parse, fNames, processColumns, processesFromColumns,
+                directory=self.dataDirectory, mapFunc=self.mapFiles)
+        return map(Comp_Snapshot.fromTasks, fNames, tasks)
+
+    def inputFingerprint(self, settings=()):
+        """
+        Fingerprints the data files, the decimation and the output mode (see
+        fingerprint.inputFingerprint).
+
+        Args:
+            settings: Anything else the chart depends on.
+        """
+        decimation = self.decimation
+        if decimation is not None:
+            decimation = (decimation.method, decimation.tiers)
+        settings = (self.compName, decimation,
+                    self.outputMode) + tuple(settings)
+        return inputFingerprint(self.dataDirectory, self.gatherFileNames(),
+                                settings)
+
+    def fingerprintPath(self):
+        return os.path.join(self.outDirectory,
+                            self.compName + '.fingerprint.json')
+
+    def mapFiles(self, parse, fNames):
+        if self.nWorkers > 1:
+            return orderedPoolMap(parse, fNames, self.nWorkers)
+        return map(parse, fNames)
 
     def buildScatterPlot(self):
         """
@@ -79,9 +279,24 @@ class CompHistory:
         maxes = self.getTraceMaxes(data)
         layout = self.buildPlotlyLayout(maxes)
         fig = dict(data=data, layout=layout)
-        outPath = os.path.join(self.outDirectory, self.compName + '.html')
-        plot(fig, filename=outPath, auto_open=False, include_plotlyjs=False)
-        addPlotlyScriptCall(outPath)
+        self.outputFiles.extend(writeFigure(
+            fig, self.outDirectory, self.compName, 'usage', self.outputMode))
+
+    def getStats(self):
+        """
+        Summarizes the work done by this history for run reports.
+
+        Returns:
+            A dict with the number of files parsed, of trace points produced
+            and the total size in bytes of the generated figures.
+        """
+        traces = (self.cpuTraceBank.getAllTraces() +
+                  self.memTraceBank.getAllTraces())
+        return dict(
+            filesParsed=self.nFilesParsed,
+            recordsProduced=sum(len(trace.x) for trace in traces),
+            outputBytes=sum(os.path.getsize(outPath)
+                            for outPath in set(self.outputFiles)))
 
     def buildPlotlyData(self):
         """
@@ -95,6 +310,7 @@ class CompHistory:
         """
         cpuTraces = self.cpuTraceBank.getAllTraces()
         memTraces = self.memTraceBank.getAllTraces()
+        plotValues = self.plotValues(cpuTraces + memTraces)
         plotDataCPU = []
         plotDataMem = []
         for trace in cpuTraces:
@@ -103,9 +319,10 @@ class CompHistory:
             grn = str(hash(user + 'g') % 256)
             blu = str(hash(user + 'b') % 256)
             color = "rgb(" + red + ", " + grn + ", " + blu + ")"
+            (x, y) = plotValues(trace)
             scat = go.Scatter(
-                x=trace.x,
-                y=trace.y,
+                x=x,
+                y=y,
                 name=user,
                 mode='lines',
                 line=dict(color=color, width=1),
@@ -118,9 +335,10 @@ class CompHistory:
             grn = str(hash(user + 'g') % 256)
             blu = str(hash(user + 'b') % 256)
             color = "rgb(" + red + ", " + grn + ", " + blu + ")"
+            (x, y) = plotValues(trace)
             scat = go.Scatter(
-                x=trace.x,
-                y=trace.y,
+                x=x,
+                y=y,
                 name=user,
                 mode='lines',
                 line=dict(color=color, width=1),
@@ -137,6 +355,29 @@ class CompHistory:
         data.extend(plotDataCPU)
         return data
 
+    def plotValues(self, traces):
+        """
+        Returns a function giving the (x, y) values to plot for a trace,
+        decimated if there is a 'decimation'.  The pyramid of each trace is
+        kept, so rendering again only decimates the samples appended since.
+
+        Args:
+            traces: All the traces to be plotted, used to find the latest
+                sample that ages are counted from.
+        """
+        if self.decimation is None:
+            return lambda trace: (trace.x, trace.y)
+        now = max((trace.x[-1] for trace in traces if trace.n > 0),
+                  default=None)
+
+        def values(trace):
+            pyramid = self.pyramids.get(trace)
+            if pyramid is None:
+                pyramid = TracePyramid(self.decimation)
+                self.pyramids[trace] = pyramid
+            return self.decimation.apply(trace.x, trace.y, now, pyramid)
+        return values
+
     def getTraceMaxes(self, data):
         maxes = dict()
         for scatter in data:
@@ -205,16 +446,61 @@ class CompHistory:
         return layout
 
 
+def iterUsage(snapshots):
+    """
+    Compares each Comp_Snapshot with the previous one.
+
+    Arguments:
+        snapshots (iterator(Comp_Snapshot)) -- Snapshots in chronological
+            order.
+
+    Yields:
+        (tuple(datetime, dict, dict)) -- The date, CPU usage and memory usage
+        of every snapshot but the first.
+    """
+    csOld = next(snapshots, None)
+    for csNew in snapshots:
+        csNew.computeCPUUsage(csOld)
+        yield (csNew.date, csNew.cpuUsage, csNew.memUsage)
+        csOld = csNew
+
+
 class Trace:
     """
     POPO for holding trace data.
+
+    The x and y values are kept in NumPy buffers which double in size when
+    full, so appending is amortized O(1) and no Python objects are kept per
+    point.  Closed traces are trimmed to their length.
     """
 
-    def __init__(self, name):
-        self.x = list()
-        self.y = list()
+    def __init__(self, name, capacity=16):
+        self._x = np.empty(capacity, dtype='datetime64[s]')
+        self._y = np.empty(capacity, dtype=np.float64)
+        self.n = 0
         self.name = name
 
+    @property
+    def x(self):
+        return self._x[:self.n]
+
+    @property
+    def y(self):
+        return self._y[:self.n]
+
+    def append(self, date, value):
+        if self.n == len(self._x):
+            capacity = max(2 * self.n, 16)
+            self._x = np.resize(self._x, capacity)
+            self._y = np.resize(self._y, capacity)
+        self._x[self.n] = date
+        self._y[self.n] = value
+        self.n += 1
+
+    def trim(self):
+        self._x = self._x[:self.n].copy()
+        self._y = self._y[:self.n].copy()
+
     def __repr__(self):
         return "Trace" + str((self.name, self.x, self.y))
 
@@ -255,16 +541,15 @@ class TraceBank:
         for (user, value) in usage.items():
             if user in self.openTraces.keys():
                 trace = self.openTraces[user]
-                trace.x.append(date)
-                trace.y.append(value)
+                trace.append(date, value)
             else:
                 trace = Trace(user)
-                trace.x.append(date)
-                trace.y.append(value)
+                trace.append(date, value)
                 self.openTraces[user] = trace
         retiredUsers = self.openTraces.keys() - usage.keys()
         for user in retiredUsers:
             trace = self.openTraces.pop(user)
+            trace.trim()
             self.closedTraces.append(trace)
 
     def getAllTraces(self):
@@ -278,15 +563,3 @@ class TraceBank:
         allTraces = self.closedTraces.copy()
         allTraces.extend(self.openTraces.values())
         return allTraces
-
-def addPlotlyScriptCall(fName):
-    str1 = open(fName, mode='r')
-    text = str1.read()
-    str1.close()
-    pHeadEnd = text.find("</head>") + 7
-    scriptCall = '<script src="https://cdn.plot.ly/plotly-latest.min.js"></script>'
-    textSequence = (text[0:pHeadEnd], scriptCall, text[pHeadEnd:])
-    newHTML = "".join(textSequence)
-    str2 = open(fName,mode='w')
-    str2.write(newHTML)
-    str2.close()
\ No newline at end of file
@@ -7,6 +7,7 @@ from collections import namedtuple
 
 
 _systemUsers = {'local service', 'maxwell', 'n/a', 'network service', 'system'}
+_processStrFields = ['imageName', 'user']
 
 Process = namedtuple('Process', ['imageName', 'pid', 'mem', 'user', 'time'])
 Process.imageName.__doc__ = "str: The name of the running process (ie notepad.exe)"
@@ -26,26 +27,130 @@ Process.time.__doc__ = "float: The total number of seconds the process has been
 #         self.time = time
 
 
+_processDtype = np.dtype([
+    ('pid', np.int64), ('mem', np.float64), ('time', np.float64),
+    ('user', np.int32), ('image', np.int32)])
+
+
+class ProcessTable:
+    """
+    The processes of one snapshot held as a NumPy structured array.
+
+    Each row holds the pid, mem and time of a process along with integer codes
+    for its user and image name.  The codes index into the 'users' and
+    'images' arrays of the table, so each name is stored once per snapshot.
+    """
+
+    def __init__(self, rows, users, images):
+        """
+        Standard init.  Saves arguments as instance variables.
+
+        Arguments:
+            rows (ndarray) -- Structured array with the fields pid, mem, time,
+                user and image.
+            users (ndarray(str)) -- The user names indexed by rows['user'].
+            images (ndarray(str)) -- The image names indexed by rows['image'].
+        """
+        self.rows = rows
+        self.users = users
+        self.images = images
+
+    @classmethod
+    def fromColumns(cls, columns):
+        """
+        Builds a table from per-process arrays (see toColumns).
+        """
+        rows = np.zeros(len(columns['pid']), dtype=_processDtype)
+        rows['pid'] = columns['pid']
+        rows['mem'] = columns['mem']
+        rows['time'] = columns['time']
+        (users, rows['user']) = np.unique(columns['user'],
+                                          return_inverse=True)
+        (images, rows['image']) = np.unique(columns['imageName'],
+                                            return_inverse=True)
+        return cls(rows, users, images)
+
+    @classmethod
+    def fromProcesses(cls, processes):
+        columns = dict()
+        for field in _processStrFields:
+            columns[field] = np.array(
+                [getattr(p, field) for p in processes], dtype=str)
+        columns['pid'] = np.array([p.pid for p in processes], dtype=np.int64)
+        columns['mem'] = np.array([p.mem for p in processes],
+                                  dtype=np.float64)
+        columns['time'] = np.array([p.time for p in processes],
+                                   dtype=np.float64)
+        return cls.fromColumns(columns)
+
+    def toColumns(self):
+        """
+        Returns:
+            (dict(str=ndarray)) -- One array per Process field.
+        """
+        return dict(
+            imageName=self.images[self.rows['image']],
+            pid=self.rows['pid'],
+            mem=self.rows['mem'],
+            user=self.users[self.rows['user']],
+            time=self.rows['time'])
+
+    def toProcesses(self):
+        columns = self.toColumns()
+        return [Process(imageName=imageName, pid=pid, mem=mem, user=user,
+                        time=time)
+                for (imageName, pid, mem, user, time) in zip(
+                    columns['imageName'].tolist(), columns['pid'].tolist(),
+                    columns['mem'].tolist(), columns['user'].tolist(),
+                    columns['time'].tolist())]
+
+    def __len__(self):
+        return len(self.rows)
+
+
 class Comp_Snapshot:
 
     def __init__(self, date, tasks, memUsage, cpuUsage=None):
+        """
+        Arguments:
+            date (datetime) -- When the snapshot was taken.
+            tasks (ProcessTable or list(Process)) -- The running processes.
+            memUsage (dict(str=float)) -- Memory used by each user.
+
+        Keyword Arguments:
+            cpuUsage (dict(str=float)) -- CPU used by each user since the
+                previous snapshot. (default: {None})
+        """
         self.date = date
-        self.tasks = tasks
+        if not isinstance(tasks, ProcessTable):
+            tasks = ProcessTable.fromProcesses(tasks)
+        self.table = tasks
         self.memUsage = memUsage
         self.cpuUsage = cpuUsage
 
+    @property
+    def tasks(self):
+        """
+        list(Process) -- The processes, built from 'table' on each access.
+        """
+        return self.table.toProcesses()
+
     @classmethod
     def fromFile(cls, directory, fName):
+        tasks = importTable(directory, fName)
+        return cls.fromTasks(fName, tasks)
+
+    @classmethod
+    def fromTasks(cls, fName, tasks):
         date = extractDateFromFileName(fName)
-        tasks = importFile(directory, fName)
         memUsage = buildMemUsage(tasks)
         return cls(date, tasks, memUsage)
 
     def computeCPUUsage(self, older):
-        self.cpuUsage = buildCPUUsage(self.tasks, older.tasks)
+        self.cpuUsage = buildCPUUsage(self.table, older.table)
 
     def getSnapshot(self):
-        return {'time': self.date, 'mem': self.memUsage, 'cpu': cpuUsage}
+        return {'time': self.date, 'mem': self.memUsage, 'cpu': self.cpuUsage}
 
     def __repr__(self):
         reprList = []
@@ -66,40 +171,78 @@ def extractDateFromFileName(fName):
 
 
 def importFile(targetDir, fName):
+    """
+    Same as importTable, but returns a list of Processes.
+    """
+    return importTable(targetDir, fName).toProcesses()
+
+
+def importTable(targetDir, fName):
     """
     fname generated with windows cmd 'tasklist /nh /v /fo csv > fname.txt'
     typical output looks like:
         "System Idle Process","0","Services","0","24 K","Unknown","NT AUTHORITY\SYSTEM","3751:56:47","N/A"
         "System","4","Services","0","26,376 K","Unknown","N/A","1:30:10","N/A"
         "smss.exe","392","Services","0","1,836 K","Unknown","NT AUTHORITY\SYSTEM","0:00:00","N/A"
+
+    Returns:
+        (ProcessTable) -- The processes of the file.
     """
-    processes = list()
-    # print("os.getcwd:", os.getcwd())
-    # print("Opening ", fName)
     fPath = os.path.join(targetDir, fName)
     file = open(fPath, "r")
-    textBlock = file.read().lower()
-    lines = textBlock.split('\n')
-    slice(1, -1, 2)
-    for line in lines:
+    textBlock = file.read()
+    file.close()
+    return parseTasklistText(textBlock)
+
+
+def parseTasklistText(textBlock):
+    """
+    Parses the output of 'tasklist /nh /v /fo csv' (see importTable).
+
+    Returns:
+        (ProcessTable) -- The processes.
+    """
+    textBlock = textBlock.lower()
+    pids = list()
+    mems = list()
+    times = list()
+    userCodes = list()
+    imageCodes = list()
+    users = dict()
+    images = dict()
+    for line in textBlock.split('\n'):
         if line == '':  # blank lines
             continue
         parts = line.split(r'"')[slice(1, -1, 2)]
         imageName = parts[0]  # str
-        # if imageName == "System Idle Process":
-        #     continue
-        pid = int(parts[1])
-        mem = float(parts[4].replace("k", "").replace(",", "").strip())
+        pids.append(int(parts[1]))
+        mems.append(float(parts[4].replace("k", "").replace(",", "").strip()))
         # FW7\\name, n/a, nt authority\\system
         user = (parts[6].split("\\"))[-1]  # str
         (h, m, s) = parts[7].split(":")
-        time = float(h) * 360 + float(m) * 60 + float(s)
-        process = Process(
-            imageName=imageName, pid=pid,
-            user=user, mem=mem, time=time)
-        processes.append(process)
-    file.close()
-    return processes
+        times.append(float(h) * 360 + float(m) * 60 + float(s))
+        userCodes.append(users.setdefault(user, len(users)))
+        imageCodes.append(images.setdefault(imageName, len(images)))
+    rows = np.zeros(len(pids), dtype=_processDtype)
+    rows['pid'] = pids
+    rows['mem'] = mems
+    rows['time'] = times
+    rows['user'] = userCodes
+    rows['image'] = imageCodes
+    return ProcessTable(rows, np.array(list(users), dtype=str),
+                        np.array(list(images), dtype=str))
+
+
+def processColumns(table):
+    """
+    Converts a ProcessTable into a dict of arrays, one per Process field, for
+    storage in a SnapshotCache.
+    """
+    return table.toColumns()
+
+
+def processesFromColumns(columns):
+    return ProcessTable.fromColumns(columns)
 
 
 def computeTotTime(tasks):
@@ -120,56 +263,111 @@ def buildMemUsage(processes):
     """
     Computes the total memory being used by each human user and the system
     and returns a dictionary with this information.
+
+    Arguments:
+        processes (ProcessTable or list(Process)) -- The running processes.
+
+    Returns:
+        (dict(str=float)) -- The memory of each user, in order of first
+        appearance.
     """
-    memUsage = dict()
-    for process in processes:
-        user = process.user
-        if user in _systemUsers:
-            user = 'system'
-        mem = process.mem
-        if user in memUsage:
-            memUsage[user] += mem
-        else:
-            memUsage[user] = mem
-    return memUsage
+    table = _asTable(processes)
+    (names, codes) = attributeUsers(table)
+    memSums = np.bincount(codes, weights=table.rows['mem'],
+                          minlength=len(names))
+    return _usageDict(names, codes, memSums)
 
 
 def buildCPUUsage(processesNew, processesOld):
     """
     Totals the processor seconds for each user between this snapshot and a previous one.
+
+    Processes are joined on pid.  A process counts as the same one if its
+    user and image name are unchanged and its time has not decreased; its
+    usage is then the difference in time.  Otherwise all of its time is new.
+
+    Arguments:
+        processesNew (ProcessTable or list(Process)) -- The newer snapshot.
+        processesOld (ProcessTable or list(Process)) -- The older snapshot.
+
+    Returns:
+        (dict(str=float)) -- The fraction of the total processor time used by
+        each user, in order of first appearance.
     """
-    cpuUsage = dict()
-    timeDiff = computeTotTime(processesNew) - computeTotTime(processesOld)
+    new = _asTable(processesNew)
+    old = _asTable(processesOld)
+    newRows = new.rows
+    oldRows = old.rows
+    timeDiff = newRows['time'].sum() - oldRows['time'].sum()
     if timeDiff <= 0.:  # Computer Reboot likely
-        return cpuUsage
-    pDictOld = buildProcessDict(processesOld)
-    for pNew in processesNew:
-        pid = pNew.pid
-        if pid == 0:  # Don't count 'System Idle Process' toward System use
-            continue
-        if pid in pDictOld:
-            pOld = pDictOld[pid]
-            sameProcess = sameProcQ(pNew, pOld)
-            if not sameProcess:
-                pOld = None
-        else:
-            pOld = None
-        attribUser = pNew.user
-        if pNew.user in _systemUsers:
-            attribUser = 'system'
-        else:
-            attribUser = pNew.user
-        if pOld is None:
-            timeChange = pNew.time
-        else:
-            timeChange = pNew.time - pOld.time
-        if attribUser in cpuUsage:
-            cpuUsage[attribUser] += timeChange
-        else:
-            cpuUsage[attribUser] = timeChange
-    for attribUser in cpuUsage.keys():
-        cpuUsage[attribUser] = cpuUsage[attribUser] / timeDiff
-    return cpuUsage
+        return dict()
+    if len(oldRows) == 0:
+        timeChange = newRows['time']
+    else:
+        # Last occurrence wins for repeated pids, as with a dict.
+        order = np.argsort(oldRows['pid'], kind='stable')
+        match = np.searchsorted(oldRows['pid'][order], newRows['pid'],
+                                side='right') - 1
+        found = match >= 0
+        oldMatch = oldRows[order[np.maximum(match, 0)]]
+        sameUser = (_recode(old.users, new.users)[oldMatch['user']] ==
+                    newRows['user'])
+        sameImage = (_recode(old.images, new.images)[oldMatch['image']] ==
+                     newRows['image'])
+        sameProcess = (found & (oldMatch['pid'] == newRows['pid']) &
+                       sameUser & sameImage &
+                       (newRows['time'] >= oldMatch['time']))
+        timeChange = np.where(sameProcess,
+                              newRows['time'] - oldMatch['time'],
+                              newRows['time'])
+    # Don't count 'System Idle Process' toward System use
+    counted = newRows['pid'] != 0
+    (names, codes) = attributeUsers(new)
+    codes = codes[counted]
+    cpuSums = np.bincount(codes, weights=timeChange[counted],
+                          minlength=len(names))
+    return _usageDict(names, codes, cpuSums / timeDiff)
+
+
+def attributeUsers(table):
+    """
+    Pools all system users of a table under 'system'.
+
+    Returns:
+        (tuple(ndarray(str), ndarray(int))) -- The attributed user names and
+        the index into them of each process.
+    """
+    attributed = ['system' if user in _systemUsers else user
+                  for user in table.users.tolist()]
+    (names, remap) = np.unique(np.array(attributed, dtype=str),
+                               return_inverse=True)
+    return (names, remap[table.rows['user']])
+
+
+def _usageDict(names, codes, values):
+    """
+    Builds {name: value} for the codes present, ordered by first appearance
+    like the dictionaries built by looping over the processes.
+    """
+    (present, firstIndex) = np.unique(codes, return_index=True)
+    present = present[np.argsort(firstIndex)]
+    return dict(zip(names[present].tolist(), values[present].tolist()))
+
+
+def _recode(fromNames, toNames):
+    """
+    Maps the codes of one table's names onto another's.  Names missing from
+    'toNames' map to -1.
+    """
+    toIndex = {name: i for (i, name) in enumerate(toNames.tolist())}
+    return np.array([toIndex.get(name, -1) for name in fromNames.tolist()],
+                    dtype=np.int64)
+
+
+def _asTable(processes):
+    if isinstance(processes, ProcessTable):
+        return processes
+    return ProcessTable.fromProcesses(processes)
 
 
 def buildProcessDict(processList):
@@ -0,0 +1,312 @@
+"""
+Decimation of long time series before they are handed to Plotly.
+
+A year of five minute samples is around a hundred thousand points per user,
+which makes the HTML figures many megabytes and stalls the browser.  The
+functions here pick a subset of sample indices that still looks the same when
+plotted: either the minimum and maximum of every time bucket, which keeps the
+peaks, or Largest-Triangle-Three-Buckets (LTTB).  The age tiers of a
+Decimation show recent data at full resolution and older data coarsely.  A
+TracePyramid keeps the selections of a trace at the width of every tier
+between renders, each covering only the samples which have aged into its
+tier, and extends them as samples are appended and age.
+"""
+import datetime
+import numpy as np
+
+
+def minMaxIndices(t, y, width):
+    """
+    Selects the minimum and maximum sample of every time bucket, along with
+    the first and last samples.
+
+    Arguments:
+        t (ndarray(float)) -- Sample times in seconds, in increasing order.
+        y (ndarray(float)) -- Sample values.
+        width (float) -- The bucket width in seconds.  Buckets are aligned to
+            multiples of the width, so buckets of nested widths line up.
+
+    Returns:
+        (ndarray(int)) -- The selected indices in increasing order.
+    """
+    n = len(t)
+    if n <= 2:
+        return np.arange(n)
+    return np.unique(np.concatenate([bucketExtremes(t, y, width), [0, n - 1]]))
+
+
+def bucketExtremes(t, y, width):
+    """
+    The indices of the minimum and maximum sample of every time bucket (see
+    minMaxIndices), in increasing order.
+    """
+    if len(t) == 0:
+        return np.arange(0)
+    buckets = np.floor(t / width).astype(np.int64)
+    # Within a bucket the samples are sorted by value, so the first of each
+    # bucket is its minimum and the last its maximum.
+    order = np.lexsort((y, buckets))
+    sortedBuckets = buckets[order]
+    firsts = np.flatnonzero(np.r_[True, sortedBuckets[1:] !=
+                                  sortedBuckets[:-1]])
+    lasts = np.r_[firsts[1:], len(t)] - 1
+    return np.unique(np.concatenate([order[firsts], order[lasts]]))
+
+
+def lttbIndices(t, y, nOut):
+    """
+    Selects 'nOut' samples with the Largest-Triangle-Three-Buckets algorithm
+    (Steinarsson, 2013).  The first and last samples are always kept and one
+    sample is chosen from each of the 'nOut' - 2 buckets in between: the one
+    forming the largest triangle with the previously chosen sample and the
+    mean of the next bucket.
+
+    Arguments:
+        t (ndarray(float)) -- Sample times in seconds, in increasing order.
+        y (ndarray(float)) -- Sample values.
+        nOut (int) -- The number of samples to keep.
+
+    Returns:
+        (ndarray(int)) -- The selected indices in increasing order.
+    """
+    n = len(t)
+    if nOut >= n or nOut < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, nOut - 1).astype(np.intp)
+    edges = np.r_[edges, n]
+    indices = np.empty(nOut, dtype=np.intp)
+    indices[0] = 0
+    indices[-1] = n - 1
+    a = 0
+    for i in range(nOut - 2):
+        (lo, hi) = (edges[i], edges[i + 1])
+        (nextLo, nextHi) = (edges[i + 1], edges[i + 2])
+        tNext = t[nextLo:nextHi].mean()
+        yNext = y[nextLo:nextHi].mean()
+        areas = np.abs((t[a] - tNext) * (y[lo:hi] - y[a]) -
+                       (t[a] - t[lo:hi]) * (yNext - y[a]))
+        a = lo + int(np.argmax(areas))
+        indices[i + 1] = a
+    return indices
+
+
+def decimateIndices(t, y, width, method='minmax'):
+    """
+    Selects samples at a resolution of about two per 'width' seconds.
+
+    Arguments:
+        t (ndarray(float)) -- Sample times in seconds, in increasing order.
+        y (ndarray(float)) -- Sample values.
+        width (float) -- The bucket width in seconds, or None to keep every
+            sample.
+
+    Keyword Arguments:
+        method (str) -- 'minmax' or 'lttb'. (default: {'minmax'})
+
+    Returns:
+        (ndarray(int)) -- The selected indices in increasing order.
+    """
+    if width is None or len(t) == 0:
+        return np.arange(len(t))
+    if method == 'minmax':
+        return minMaxIndices(t, y, width)
+    if method == 'lttb':
+        nBuckets = int(np.floor(t[-1] / width) - np.floor(t[0] / width)) + 1
+        return lttbIndices(t, y, 2 * nBuckets + 2)
+    raise ValueError("Unknown decimation method: " + repr(method))
+
+
+def toSeconds(x):
+    """
+    Converts datetime64 values to float seconds since the epoch.
+    """
+    return np.asarray(x, dtype='datetime64[s]').astype(np.int64).astype(
+        np.float64)
+
+
+# LTTB levels are computed in blocks of this many buckets, aligned like the
+# buckets, so that appending samples only recomputes the last block.
+lttbBlock = 64
+
+
+def levelIndices(t, y, width, method):
+    """
+    Selects samples at a resolution of about two per 'width' seconds, one
+    aligned unit (see Decimation.unit) at a time, so that the selection of a
+    unit does not depend on the samples outside it.
+
+    Returns:
+        (ndarray(int)) -- The selected indices in increasing order.
+    """
+    if method == 'minmax':
+        return bucketExtremes(t, y, width)
+    blocks = np.floor(t / (width * lttbBlock)).astype(np.int64)
+    edges = np.r_[0, np.flatnonzero(blocks[1:] != blocks[:-1]) + 1, len(t)]
+    return np.concatenate(
+        [np.arange(0)] +
+        [lo + decimateIndices(t[lo:hi], y[lo:hi], width, method)
+         for (lo, hi) in zip(edges[:-1], edges[1:])])
+
+
+class TracePyramid:
+    """
+    The decimated indices of one trace at the width of every tier of a
+    Decimation, kept between renders of a growing trace.
+
+    A level covers the samples from the start of its tier when the level was
+    first needed up to the end of its tier, and is extended as samples are
+    appended and age into the tier, recomputing only its last unit (see
+    Decimation.unit).  A render of an unchanged trace computes nothing.
+    """
+
+    def __init__(self, decimation):
+        """
+        Arguments:
+            decimation (Decimation) -- The tiers and method of the levels.
+        """
+        self.decimation = decimation
+        self.t = np.empty(0)
+        # (lo, hi, indices) of each tier: the indices selected in t[lo:hi].
+        self.levels = [None] * len(decimation.tiers)
+
+    def select(self, x, y, now):
+        """
+        Picks the samples of each tier from its level, extending the levels
+        to cover the samples appended since the last call.
+
+        Arguments:
+            x (ndarray(datetime64)) -- Sample times in increasing order, the
+                times of the last call followed by any appended since.
+            y (ndarray(float)) -- Sample values.
+            now (datetime64 or datetime) -- The time ages are counted from.
+
+        Returns:
+            (ndarray(int)) -- The selected indices in increasing order.
+        """
+        n = len(x)
+        if n < len(self.t):
+            self.__init__(self.decimation)
+        if n > len(self.t):
+            self.t = np.concatenate([self.t, toSeconds(x[len(self.t):])])
+        selected = [np.unique([0, n - 1]) if n else np.arange(0)]
+        for (i, (start, end, width)) in enumerate(self.decimation.bands(now)):
+            (lo, hi) = np.searchsorted(self.t, [start, end])
+            if width is None:
+                selected.append(np.arange(lo, hi))
+            else:
+                indices = self.extendLevel(i, y, lo, hi, width)
+                selected.append(indices[indices >= lo])
+        return np.unique(np.concatenate(selected))
+
+    def extendLevel(self, i, y, lo, hi, width):
+        """
+        Extends level 'i' to cover t[lo:hi] and returns its indices.  The
+        level is rebuilt if it does not start at or before 'lo' or ends after
+        'hi', ie if ages were counted from an earlier time, or if the tier has
+        moved past all of it.
+        """
+        level = self.levels[i]
+        if (level is None or lo < level[0] or hi < level[1] or
+                lo >= level[1]):
+            level = (lo, lo, np.arange(0))
+        (levelLo, levelHi, indices) = level
+        if hi > levelHi:
+            # The last unit of the level may have been cut by the end of the
+            # tier, so it is recomputed with the samples which aged into it.
+            redo = levelLo
+            if levelHi > levelLo:
+                unit = self.decimation.unit(width)
+                redo = max(levelLo, int(np.searchsorted(
+                    self.t, np.floor(self.t[levelHi - 1] / unit) * unit)))
+            seconds = width.total_seconds()
+            indices = np.concatenate([
+                indices[indices < redo],
+                redo + levelIndices(self.t[redo:hi], y[redo:hi], seconds,
+                                    self.decimation.method)])
+        self.levels[i] = (levelLo, hi, indices)
+        return indices
+
+
+# Full resolution for two weeks, then half hour buckets up to three months and
+# four hour buckets beyond.
+defaultTiers = [
+    (datetime.timedelta(days=14), None),
+    (datetime.timedelta(days=90), datetime.timedelta(minutes=30)),
+    (None, datetime.timedelta(hours=4))]
+
+
+class Decimation:
+    """
+    A configurable decimation stage: samples are kept at a resolution which
+    depends on their age.
+    """
+
+    def __init__(self, method='minmax', tiers=defaultTiers):
+        """
+        Keyword Arguments:
+            method (str) -- 'minmax' keeps the extremes of every bucket, so
+                peaks are never lost; 'lttb' keeps the visual shape.
+                (default: {'minmax'})
+            tiers (list(tuple(timedelta, timedelta))) -- (maxAge, width) in
+                order of increasing age.  Samples younger than 'maxAge' (and
+                older than the previous tier) are kept at about two per
+                'width'.  A None 'maxAge' covers everything older and a None
+                'width' keeps every sample. (default: {defaultTiers})
+        """
+        if method not in ('minmax', 'lttb'):
+            raise ValueError("Unknown decimation method: " + repr(method))
+        self.method = method
+        self.tiers = tiers
+
+    def apply(self, x, y, now, pyramid=None):
+        """
+        Decimates one trace.
+
+        Arguments:
+            x (ndarray(datetime64)) -- Sample times in increasing order.
+            y (ndarray(float)) -- Sample values.
+            now (datetime64 or datetime) -- The time ages are counted from.
+
+        Keyword Arguments:
+            pyramid (TracePyramid) -- The pyramid of the trace, kept by the
+                caller between renders.  A new one is built if None.
+                (default: {None})
+
+        Returns:
+            (tuple(ndarray, ndarray)) -- The kept x and y values.
+        """
+        if pyramid is None:
+            pyramid = TracePyramid(self)
+        indices = pyramid.select(x, y, now)
+        return (x[indices], y[indices])
+
+    def unit(self, width):
+        """
+        The span in seconds whose selection at 'width' depends only on its
+        own samples: a bucket for 'minmax' and a block of buckets for 'lttb'.
+        """
+        if self.method == 'lttb':
+            return width.total_seconds() * lttbBlock
+        return width.total_seconds()
+
+    def bands(self, now):
+        """
+        The time bands of the tiers as (start, end, width), where start and
+        end are in seconds since the epoch (end exclusive).  The start of a
+        decimated tier is moved back to the start of its unit, so that a
+        level never begins part way through one.
+        """
+        end = np.inf
+        bands = list()
+        for (maxAge, width) in self.tiers:
+            if maxAge is None:
+                start = -np.inf
+            else:
+                start = float(toSeconds(np.datetime64(now, 's') -
+                                        np.timedelta64(maxAge)))
+                if width is not None:
+                    unit = self.unit(width)
+                    start = np.floor(start / unit) * unit
+            bands.append((start, end, width))
+            end = start
+        return bands
@@ -0,0 +1,50 @@
+import os
+
+
+class DumpIndex:
+    """
+    A single listing of the dump directory, partitioned by file name prefix.
+
+    The dump scripts name their files [prefix]_[YYYY]_[MM]_[DD]..., where the
+    prefix is a program (ie 'COMSOL') or a computer (ie 'FW7'), so the
+    canonical order of each partition is chronological.
+    """
+
+    def __init__(self, dataDirectory):
+        """
+        Lists dataDirectory once with os.scandir.  A missing directory
+        gives an empty index.
+
+        Arguments:
+            dataDirectory (str) -- The directory where the raw data files
+                are being dumped.
+        """
+        self.dataDirectory = dataDirectory
+        self.byPrefix = dict()
+        try:
+            entries = os.scandir(dataDirectory)
+        except FileNotFoundError:
+            print("Warning:", dataDirectory, "does not exist.")
+            return
+        with entries:
+            for entry in entries:
+                name = entry.name
+                if not name.endswith('.txt') or not entry.is_file():
+                    continue
+                prefix = name.split('_', 1)[0]
+                if prefix in self.byPrefix:
+                    self.byPrefix[prefix].append(name)
+                else:
+                    self.byPrefix[prefix] = [name]
+        for names in self.byPrefix.values():
+            names.sort()
+
+    def fileNames(self, prefix):
+        """
+        Returns:
+            list(str) -- The sorted names of the files with this prefix.
+        """
+        return list(self.byPrefix.get(prefix, []))
+
+    def prefixes(self):
+        return sorted(self.byPrefix.keys())
@@ -0,0 +1,301 @@
+"""
+Keeps chart histories in memory and folds dump files into them as they land,
+re-rendering each chart once its files stop arriving.
+
+The dump directory is polled with a single os.scandir per interval, which is
+cheap next to parsing and works the same on the Windows dump server as on
+Linux.
+"""
+import os
+import sys
+import time
+import queue
+import traceback
+
+
+class DumpWatcher:
+    """
+    Finds dump files which have appeared since the last poll, and the latest
+    file of each prefix if it has changed since it was reported.
+
+    The dump scripts write their files while they run, so a file is only
+    reported once it is settled: its size and modification time must be
+    unchanged between two consecutive polls.  A script stalling for longer
+    than that leaves a truncated file reported, so the latest file of each
+    prefix keeps being checked, as SnapshotCache checks its entries, and is
+    reported again in 'changed' once it has settled with a new size or
+    modification time.  Older files are final.
+    """
+
+    def __init__(self, dataDirectory, known=()):
+        """
+        The latest known file of each prefix is stamped here, so a watcher
+        made before the histories are built from the known files also sees
+        the changes made while they are built.
+
+        Arguments:
+            dataDirectory (str) -- The directory where the raw data files
+                are being dumped.
+
+        Keyword Arguments:
+            known (iterable(str)) -- Names of the files already folded, ie
+                those of the DumpIndex the histories were built from.
+                (default: {()})
+        """
+        self.dataDirectory = dataDirectory
+        self.known = set(known)
+        self.pending = dict()
+        # prefix -> the name of its latest known file, and name -> its
+        # (size, mtime) stamp when it was last reported.
+        self.latest = dict()
+        self.stamps = dict()
+        self.changed = dict()
+        for name in self.known:
+            prefix = name.split('_', 1)[0]
+            if name > self.latest.get(prefix, ''):
+                self.latest[prefix] = name
+        for name in self.latest.values():
+            try:
+                stat = os.stat(os.path.join(dataDirectory, name))
+            except OSError:
+                continue
+            self.stamps[name] = (stat.st_size, stat.st_mtime_ns)
+
+    def poll(self):
+        """
+        Lists the data directory once.  The files which changed after they
+        were reported are put in 'changed', by prefix.
+
+        Returns:
+            dict(str=list(str)) -- The sorted names of the newly settled files
+            by prefix (see DumpIndex).
+        """
+        self.changed = dict()
+        seen = dict()
+        try:
+            entries = os.scandir(self.dataDirectory)
+        except FileNotFoundError:
+            return dict()
+        with entries:
+            for entry in entries:
+                name = entry.name
+                if (not name.endswith('.txt') or
+                        name in self.known and name not in self.stamps or
+                        not entry.is_file()):
+                    continue
+                stat = entry.stat()
+                key = (stat.st_size, stat.st_mtime_ns)
+                if self.stamps.get(name) != key:
+                    seen[name] = key
+        settled = dict()
+        for (name, key) in seen.items():
+            if self.pending.get(name) != key:
+                continue
+            prefix = name.split('_', 1)[0]
+            if name in self.known:
+                self.changed.setdefault(prefix, list()).append(name)
+            else:
+                self.known.add(name)
+                settled.setdefault(prefix, list()).append(name)
+            latest = self.latest.get(prefix)
+            if latest is None or name >= latest:
+                self.stamps.pop(latest, None)
+                self.latest[prefix] = name
+                self.stamps[name] = key
+        # Files which vanished or were reported are dropped.
+        self.pending = {name: key for (name, key) in seen.items()
+                        if self.pending.get(name) != key}
+        for names in settled.values():
+            names.sort()
+        return settled
+
+
+class WatchedChart:
+    """
+    A chart history kept in memory along with how to render it.
+    """
+
+    def __init__(self, name, history, render, rebuild=None):
+        """
+        Arguments:
+            name (str) -- Chart name used in messages.
+            history (FlexNetHistory or CompHistory) -- The history, already
+                built from the files present when watching started.
+            render (callable) -- Writes the charts of 'history'.
+
+        Keyword Arguments:
+            rebuild (callable) -- Returns a new history built from the files
+                of the history it is given (see reload).  The history cannot
+                be rebuilt if None. (default: {None})
+        """
+        self.name = name
+        self.history = history
+        self.render = render
+        self.rebuild = rebuild
+        self.changedAt = None
+
+    def append(self, fileNames, now):
+        """
+        Folds the new files into the history and restarts the debounce timer.
+        """
+        self.history.appendFiles(fileNames)
+        self.changedAt = now
+
+    def reload(self, fileNames, now):
+        """
+        Rebuilds the history after files already folded into it have changed,
+        ie because they were still being written when they were read, and
+        restarts the debounce timer.
+        """
+        if self.rebuild is None:
+            raise RuntimeError(
+                ", ".join(fileNames) + " changed after being folded, and the "
+                "history cannot be rebuilt.")
+        self.history = self.rebuild(self.history)
+        self.changedAt = now
+
+    def appendSnapshot(self, snapshot, fName, now):
+        """
+        Folds a snapshot taken in process (see collector) into the history
+        and restarts the debounce timer.
+        """
+        self.history.appendSnapshot(snapshot, fName)
+        self.changedAt = now
+
+    def isDue(self, now, debounce):
+        """
+        Returns:
+            (bool) -- True if files were folded and none have arrived for
+            'debounce' seconds.
+        """
+        return self.changedAt is not None and now - self.changedAt >= debounce
+
+    def renderNow(self):
+        self.changedAt = None
+        # Each render rewrites the same files.
+        self.history.outputFiles = list()
+        self.render(self.history)
+
+
+def watch(charts, dataDirectory, known=(), pollInterval=5., debounce=10.,
+          maxPolls=None, clock=time.monotonic, sleep=time.sleep,
+          watcher=None):
+    """
+    Polls the dump directory, folds every new file into the chart of its
+    prefix and re-renders a chart once no files have arrived for it for
+    'debounce' seconds, so a dump cycle writing several files of a prefix
+    renders it once.  A chart whose latest file changed after it was folded
+    is rebuilt first (see WatchedChart.reload).  A chart whose files fail to
+    fold or render is reported and watching goes on.
+
+    Arguments:
+        charts (dict(str=WatchedChart)) -- The charts by file name prefix,
+            ie 'COMSOL' or 'FW7'.  Files of other prefixes are ignored.
+        dataDirectory (str) -- The directory where the raw data files are
+            being dumped.
+
+    Keyword Arguments:
+        known (iterable(str)) -- Names of the files the charts were built
+            from. (default: {()})
+        pollInterval (float) -- Seconds between polls. (default: {5.})
+        debounce (float) -- Seconds without new files before a chart is
+            rendered. (default: {10.})
+        maxPolls (int) -- Stop after this many polls.  Runs forever if None.
+            (default: {None})
+        clock (callable) -- Returns the current time in seconds.
+            (default: {time.monotonic})
+        sleep (callable) -- Waits for the given number of seconds.
+            (default: {time.sleep})
+        watcher (DumpWatcher) -- What to poll, ie one made before the charts
+            were built.  Made from 'dataDirectory' and 'known' if None.
+            (default: {None})
+    """
+    if watcher is None:
+        watcher = DumpWatcher(dataDirectory, known)
+    nPolls = 0
+    while maxPolls is None or nPolls < maxPolls:
+        settled = watcher.poll()
+        for (prefix, fileNames) in sorted(watcher.changed.items()):
+            chart = charts.get(prefix)
+            if chart is None:
+                continue
+            _report(chart, 'reload', chart.reload, fileNames, clock())
+        for (prefix, fileNames) in sorted(settled.items()):
+            chart = charts.get(prefix)
+            if chart is None:
+                continue
+            _report(chart, 'fold', chart.append, fileNames, clock())
+        renderDue(charts, debounce, clock)
+        nPolls += 1
+        if maxPolls is None or nPolls < maxPolls:
+            sleep(pollInterval)
+
+
+def watchSnapshots(charts, snapshots, pollInterval=5., debounce=10.,
+                   stop=None, clock=time.monotonic):
+    """
+    Folds the snapshots taken in process (see collector) into their charts
+    and re-renders the charts as watch does.  It is meant to run in a thread
+    of its own, so that rendering does not hold up the asyncio loop running
+    the commands; the charts are only touched from this thread.
+
+    Arguments:
+        charts (dict(str=WatchedChart)) -- The charts by source name.
+        snapshots (queue.Queue) -- Of tuples (name, snapshot, fName), as
+            handed over by collector.collect.
+
+    Keyword Arguments:
+        pollInterval (float) -- Longest wait in seconds for a snapshot
+            before the charts due are rendered. (default: {5.})
+        debounce (float) -- Seconds without new snapshots before a chart is
+            rendered. (default: {10.})
+        stop (threading.Event) -- Returns once set.  Runs forever if None.
+            (default: {None})
+        clock (callable) -- Returns the current time in seconds.
+            (default: {time.monotonic})
+    """
+    while stop is None or not stop.is_set():
+        try:
+            item = snapshots.get(timeout=pollInterval)
+        except queue.Empty:
+            item = None
+        while item is not None:
+            (name, snapshot, fName) = item
+            chart = charts.get(name)
+            if chart is not None:
+                _report(chart, 'fold', chart.appendSnapshot, snapshot, fName,
+                        clock())
+            try:
+                item = snapshots.get_nowait()
+            except queue.Empty:
+                item = None
+        renderDue(charts, debounce, clock)
+
+
+def renderDue(charts, debounce, clock=time.monotonic):
+    """
+    Renders the charts which have had no new files for 'debounce' seconds.
+    """
+    now = clock()
+    for chart in charts.values():
+        if chart.isDue(now, debounce):
+            t0 = clock()
+            if _report(chart, 'render', chart.renderNow):
+                print(chart.name, "Chart Updated",
+                      "({0:.1f} s)".format(clock() - t0))
+
+
+def _report(chart, action, func, *args):
+    """
+    Calls func(*args), printing the traceback if it raises.
+
+    Returns:
+        (bool) -- True if func returned.
+    """
+    try:
+        func(*args)
+    except Exception:
+        print(chart.name, "Chart Failed to", action, file=sys.stderr)
+        traceback.print_exc()
+        return False
+    return True
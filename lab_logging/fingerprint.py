@@ -0,0 +1,73 @@
+"""
+Fingerprints of the inputs of a chart, so that a chart whose dump files,
+settings and code have not changed since its last build can be skipped.
+
+The fingerprint is stored next to the chart, along with every file the charts
+need, as '[name].fingerprint.json': the figures, the viewer pages showing
+them, whether or not the build rewrote them, and the lease index.
+"""
+import os
+import json
+import hashlib
+from functools import lru_cache
+from chart_output import writeAtomic
+
+
+@lru_cache(maxsize=None)
+def codeVersion():
+    """
+    A hash of the lab_logging sources, so that any code change rebuilds every
+    chart.
+    """
+    digest = hashlib.sha256()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for name in sorted(os.listdir(directory)):
+        if name.endswith('.py'):
+            with open(os.path.join(directory, name), 'rb') as file:
+                digest.update(name.encode('utf-8') + b'\0')
+                digest.update(file.read())
+    return digest.hexdigest()
+
+
+def inputFingerprint(directory, fileNames, settings):
+    """
+    Hashes the code version, the settings and the name, size and
+    modification time of every input file.
+
+    Arguments:
+        directory (str) -- The directory 'fileNames' are relative to.
+        fileNames (list(str)) -- The input files.
+        settings (tuple) -- Anything else the output depends on, ie the module
+            list.  Hashed through its repr.
+
+    Returns:
+        (str) -- The fingerprint as a hex string.
+    """
+    digest = hashlib.sha256()
+    digest.update(codeVersion().encode('utf-8'))
+    digest.update(repr(settings).encode('utf-8'))
+    for fName in fileNames:
+        stat = os.stat(os.path.join(directory, fName))
+        digest.update('{0}\0{1}\0{2}\n'.format(
+            fName, stat.st_size, stat.st_mtime_ns).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def isUpToDate(path, fingerprint):
+    """
+    Returns:
+        (bool) -- True if the fingerprint saved at 'path' matches and every
+        output file of that build still exists.
+    """
+    try:
+        with open(path) as file:
+            state = json.load(file)
+    except (OSError, ValueError):
+        return False
+    return (state.get('fingerprint') == fingerprint and
+            all(os.path.exists(outPath) for outPath in state['outputFiles']))
+
+
+def saveFingerprint(path, fingerprint, outputFiles):
+    state = dict(fingerprint=fingerprint, outputFiles=sorted(set(outputFiles)))
+    writeAtomic(path, json.dumps(state, indent=1).encode('utf-8'))
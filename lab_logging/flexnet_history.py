@@ -1,14 +1,25 @@
 import os
 import sys
-import glob
-from flexnet_scraper import readFlexNetFile
-from sorter_allocator import SorterAllocator
+import pickle
+from collections import deque
+from functools import partial
+from flexnet_scraper import readLeaseLines, readLeaseLinesMapped
+from flexnet_scraper import parseLeaseLine
+from flexnet_scraper import leaseLineColumns, leaseLinesFromColumns
+from snapshot_cache import SnapshotCache
+from dump_index import DumpIndex
+from chart_output import writeFigure, writeAtomic
+from fingerprint import inputFingerprint
+from ordered_pool import orderedPoolMap
+from sorter_allocator import SorterAllocator, PlaceInFreeSlots
+from seat_usage import recordSeatSeries, periodStats
+from lease_index import LeaseIndex
 import datetime
-from math import floor, ceil
+from math import floor
+import numpy as np
 
 import plotly
 plotly.__version__
-from plotly.offline import download_plotlyjs, init_notebook_mode, plot, iplot
 import plotly.graph_objs as go
 import plotly.figure_factory as ff
 
@@ -27,7 +38,9 @@ class FlexNetHistory:
         [type] -- [description]
     """
 
-    def __init__(self, dataDirectory, outDirectory, targetProgram, modules):
+    def __init__(self, dataDirectory, outDirectory, targetProgram, modules,
+                 nWorkers=1, cacheDirectory=None, fileNames=None,
+                 outputMode='html', mappedReads=False, store=None):
         """
         Standard initialization.  Simply saves the arguments as instance
         variables.
@@ -40,24 +53,251 @@ class FlexNetHistory:
             targetProgram {[type]} -- The program for which the raw data
                 files were generated. (ie 'CST' or 'COMSOL')
             modules {[type]} -- A list of the modules
+
+        Keyword Arguments:
+            nWorkers {int} -- The number of processes used to parse the raw
+                data files.  Files are parsed serially if 1. (default: {1})
+            cacheDirectory {string} -- Where parsed files are cached between
+                runs (see SnapshotCache).  Nothing is cached if None.
+                (default: {None})
+            fileNames {list(string)} -- The sorted names of the raw data
+                files, ie from a shared DumpIndex.  The data directory is
+                listed if None. (default: {None})
+            outputMode {string} -- 'html' for self-contained Plotly pages, or
+                'json' / 'json.gz' for data files shown by a shared viewer
+                page (see chart_output). (default: {'html'})
+            mappedReads {bool} -- Read the raw data files with
+                readLeaseLinesMapped, which keeps a '.idx' section index
+                next to each file. (default: {False})
+            store {LeaseStore} -- Where the numbered leases are written by
+                assignLicenseNumbers.  Nothing is stored if None.
+                (default: {None})
         """
 
         self.dataDirectory = dataDirectory
         self.outDirectory = outDirectory
         self.targetProgram = targetProgram  # 'COMSOL'
         self.modules = modules
+        self.nWorkers = nWorkers
+        self.cacheDirectory = cacheDirectory
+        self.fileNames = fileNames
+        self.outputMode = outputMode
+        self.mappedReads = mappedReads
+        self.store = store
+        self.nFilesParsed = 0
+        self.outputFiles = list()
         self.openLicenses = list()
         self.closedLicenses = list()
         self.licByModule = dict()
+        self.lastFile = None
+        self.slotEnds = dict()
+        self.nNumbered = 0
+        # module -> raw lease line -> open records with that line, and
+        # id(record) -> (module, line) for the open records (see appendLines).
+        self.openLines = dict()
+        self.lineKeys = dict()
+        # The (start, end) of the store window loaded by loadWindow, if any.
+        self.window = None
 
-    def buildAllHistory(self):
+    def buildAllHistory(self, incremental=False):
         """ Obtains an ordered list of all of the filenames and uses them to
         generate snapshots of license usage
+
+        The files are read as raw lease lines, through the cache if there is
+        a 'cacheDirectory', and only the lines not seen in the previous
+        snapshot are parsed (see appendLines).
+
+        Keyword Arguments:
+            incremental (bool) -- If True, resume from the checkpoint left by
+                the previous run and only parse files newer than it.  Falls
+                back to a full rebuild if there is no usable checkpoint.
+                (default: {False})
         """
         fileNames = self.gatherFileNames()
-        for fName in fileNames:
-            recordList = readFlexNetFile(fName, self.modules)
-            self.appendHistory(recordList)
+        if incremental and self.loadCheckpoint():
+            fileNames = [fName for fName in fileNames
+                         if os.path.basename(fName) > self.lastFile]
+        self.foldFiles(fileNames)
+        if incremental:
+            self.saveCheckpoint()
+
+    def appendFiles(self, fileNames):
+        """
+        Folds newly dumped files into the history, ie as they are found by a
+        DumpWatcher.  Files not newer than the last one folded are ignored.
+
+        Arguments:
+            fileNames (list(str)) -- The sorted names of the new files,
+                relative to the data directory.
+        """
+        fileNames = [fName for fName in fileNames
+                     if self.lastFile is None or fName > self.lastFile]
+        if self.fileNames is not None:
+            self.fileNames.extend(fileNames)
+        self.foldFiles([os.path.join(self.dataDirectory, fName)
+                        for fName in fileNames])
+
+    def appendSnapshot(self, snapshot, fName=None):
+        """
+        Folds a snapshot taken in process (see collector) into the history.
+
+        Arguments:
+            snapshot (tuple(datetime, list)) -- The read time and lease lines
+                of the lmstat output, as given by parseLeaseLines.
+
+        Keyword Arguments:
+            fName (str) -- The name of the file the output was archived to,
+                relative to the data directory, or None if it was not
+                archived. (default: {None})
+        """
+        self.checkNotWindow()
+        self.appendLines(*snapshot)
+        if fName is not None:
+            self.lastFile = fName
+            if self.fileNames is not None:
+                self.fileNames.append(fName)
+
+    def foldFiles(self, fileNames):
+        """
+        Reads the files, in order, and appends their snapshots to the history.
+
+        Arguments:
+            fileNames (list(str)) -- The sorted paths of the files.
+        """
+        self.checkNotWindow()
+        for (fName, snapshot) in zip(fileNames, self.readLines(fileNames)):
+            self.appendLines(*snapshot)
+            self.lastFile = os.path.basename(fName)
+            self.nFilesParsed += 1
+
+    def readLines(self, fileNames):
+        """
+        Reads the raw lease lines of the data files, in a process pool if
+        'nWorkers' > 1, and through the SnapshotCache if there is a
+        'cacheDirectory'.
+
+        Returns:
+            (iterator(tuple(datetime, list))) -- The snapshot of each file as
+            given by parseLeaseLines, in the order of 'fileNames'.
+        """
+        read = readLeaseLinesMapped if self.mappedReads else readLeaseLines
+        if self.cacheDirectory is None:
+            return self.mapFiles(partial(read, moduleList=self.modules),
+                                 fileNames)
+        # Cache entries hold every module so that they survive changes to
+        # the module list.  They are kept apart from the parsed records
+        # cached by earlier versions.
+        cache = SnapshotCache(os.path.join(self.cacheDirectory, 'leaseLines'))
+        return cache.mapCached(
+            read, fileNames, leaseLineColumns,
+            partial(leaseLinesFromColumns, moduleList=self.modules),
+            mapFunc=self.mapFiles)
+
+    def mapFiles(self, parse, fileNames):
+        if self.nWorkers > 1:
+            return orderedPoolMap(parse, fileNames, self.nWorkers)
+        return map(parse, fileNames)
+
+    def inputFingerprint(self, settings=()):
+        """
+        Fingerprints the raw data files, the module list and the output mode
+        (see fingerprint.inputFingerprint).
+
+        Keyword Arguments:
+            settings {tuple} -- Anything else the charts depend on.
+                (default: {()})
+        """
+        settings = (self.targetProgram, list(self.modules),
+                    self.outputMode) + tuple(settings)
+        return inputFingerprint('', self.gatherFileNames(), settings)
+
+    def fingerprintPath(self):
+        return os.path.join(self.outDirectory,
+                            self.targetProgram + '.fingerprint.json')
+
+    def checkpointPath(self):
+        """
+        The checkpoint lives in the cache directory, ie 'COMSOL.pkl', out of
+        reach of the web server.  There is none without a cache directory.
+        """
+        if self.cacheDirectory is None:
+            return None
+        return os.path.join(self.cacheDirectory, self.targetProgram + '.pkl')
+
+    def saveCheckpoint(self):
+        """
+        Persists the open and closed licenses along with the name, size and
+        modification time of the last file processed and the license slots
+        already handed out to closed licenses so that a later run can resume
+        from this point.  The file is replaced atomically, so a run killed
+        while saving leaves the previous checkpoint in place.
+        """
+        self.checkNotWindow()
+        path = self.checkpointPath()
+        if path is None:
+            return
+        state = dict(
+            modules=list(self.modules),
+            lastFile=self.lastFile,
+            lastFileStat=self.lastFileStat(),
+            openLicenses=self.openLicenses,
+            closedLicenses=self.closedLicenses,
+            slotEnds=self.slotEnds,
+            nNumbered=self.nNumbered)
+        writeAtomic(path, pickle.dumps(state))
+
+    def loadCheckpoint(self):
+        """
+        Restores the state saved by saveCheckpoint.
+
+        The checkpoint is ignored if it is missing, unreadable, was taken
+        before any file was processed, was built for a different module list
+        or if the last file processed has changed since, ie because it was
+        still being written when it was read.
+
+        Returns:
+            (bool) -- True if the checkpoint was restored; False otherwise.
+        """
+        path = self.checkpointPath()
+        if path is None:
+            return False
+        try:
+            with open(path, 'rb') as file:
+                state = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return False
+        if state['modules'] != list(self.modules):
+            print("Warning: module list changed, rebuilding",
+                  self.targetProgram, "from scratch.")
+            return False
+        if state['lastFile'] is None:
+            return False
+        self.lastFile = state['lastFile']
+        if state.get('lastFileStat') != self.lastFileStat():
+            print("Warning:", self.lastFile, "changed since it was read, "
+                  "rebuilding", self.targetProgram, "from scratch.")
+            self.lastFile = None
+            return False
+        self.openLicenses = state['openLicenses']
+        self.closedLicenses = state['closedLicenses']
+        # Checkpoints from before slots were kept renumber every license.
+        self.slotEnds = state.get('slotEnds', dict())
+        self.nNumbered = state.get('nNumbered', 0)
+        return True
+
+    def lastFileStat(self):
+        """
+        Returns:
+            (tuple(int, int)) -- The size and modification time in ns of the
+            last file processed, or None if there is none.
+        """
+        if self.lastFile is None:
+            return None
+        try:
+            stat = os.stat(os.path.join(self.dataDirectory, self.lastFile))
+        except OSError:
+            return None
+        return (stat.st_size, stat.st_mtime_ns)
 
     def appendHistory(self, recordList):
         """ Takes a new snap shot (recordList) of open licenses and compares it
@@ -70,16 +310,106 @@ class FlexNetHistory:
         Record objects at some point in the near future from those in both the
         'openRecords' and 'closedRecords' attributes.
         """
-        currentLics = recordList.copy()
-        openLics = self.openLicenses
-        recentlyClosed = listDifference(openLics, currentLics)
+        (stillOpen, recentlyClosed, recentlyOpened) = reconcileSnapshot(
+            self.openLicenses, recordList)
         self.closedLicenses.extend(recentlyClosed)
-        recentlyOpened = listDifference(currentLics, openLics)
-        newOpenLics = listDifference(openLics, recentlyClosed)
-        newOpenLics = listDifference(newOpenLics, recentlyOpened)
-        listUpdate(newOpenLics, currentLics, {'lastSeen'})
-        newOpenLics.extend(recentlyOpened)
-        self.openLicenses = newOpenLics
+        stillOpen.extend(recentlyOpened)
+        self.openLicenses = stillOpen
+        # The records no longer correspond to known lines.
+        self.openLines = dict()
+        self.lineKeys = dict()
+
+    def appendLines(self, readTime, sections):
+        """
+        Takes a new snapshot as raw lease lines (see parseLeaseLines) and
+        updates the open and closed licenses as appendHistory would.
+
+        Nearly every line of a snapshot is identical to a line of the previous
+        one, so the open records are looked up by their line and only get
+        their 'lastSeen' updated.  Only lines without an open record are
+        parsed, and the new records are reconciled with the open records whose
+        line is gone (see matchSnapshot).  When several open records share a
+        signature, the one whose line is still listed is the one kept open,
+        where appendHistory pairs them by start time and then in order.  The
+        same number of seats is open either way.
+
+        The lines are not checkpointed, so the first snapshot after
+        loadCheckpoint is reconciled as a whole.
+
+        Arguments:
+            readTime (datetime) -- The time of the snapshot.
+            sections (list(tuple(str, list(str)))) -- The lease lines of each
+                module.
+        """
+        openLines = self.openLines
+        lineKeys = self.lineKeys
+        seen = set()
+        newKeys = list()
+        for (module, lines) in sections:
+            table = openLines.get(module)
+            if table is None:
+                newKeys.extend((module, line) for line in lines)
+                continue
+            for line in lines:
+                records = table.get(line)
+                if records is not None:
+                    for rec in records:
+                        if id(rec) not in seen:
+                            seen.add(id(rec))
+                            rec.lastSeen = readTime
+                            break
+                    else:
+                        newKeys.append((module, line))
+                else:
+                    newKeys.append((module, line))
+        if not newKeys and len(seen) == len(self.openLicenses):
+            return
+
+        unseen = [rec for rec in self.openLicenses if id(rec) not in seen]
+        currentLics = list()
+        currentKeys = list()
+        for (module, line) in newKeys:
+            rec = parseLeaseLine(line, module, readTime)
+            if rec is not None:
+                currentLics.append(rec)
+                currentKeys.append((module, line))
+        matches = matchSnapshot(unseen, currentLics)
+        taken = [False] * len(currentLics)
+        closed = set()
+        for (rec, i) in zip(unseen, matches):
+            self.forgetLine(rec)
+            if i is None:
+                closed.add(id(rec))
+                self.closedLicenses.append(rec)
+            else:
+                taken[i] = True
+                rec.lastSeen = currentLics[i].lastSeen
+                self.rememberLine(rec, *currentKeys[i])
+        stillOpen = [rec for rec in self.openLicenses
+                     if id(rec) not in closed]
+        for (i, rec) in enumerate(currentLics):
+            if not taken[i]:
+                self.rememberLine(rec, *currentKeys[i])
+                stillOpen.append(rec)
+        self.openLicenses = stillOpen
+
+    def rememberLine(self, record, module, line):
+        table = self.openLines.setdefault(module, dict())
+        table.setdefault(line, list()).append(record)
+        self.lineKeys[id(record)] = (module, line)
+
+    def forgetLine(self, record):
+        key = self.lineKeys.pop(id(record), None)
+        if key is None:
+            return
+        (module, line) = key
+        records = self.openLines[module][line]
+        # Records with the same signature compare equal, so remove by
+        # identity.
+        del records[next(i for (i, rec) in enumerate(records)
+                         if rec is record)]
+        if not records:
+            del self.openLines[module][line]
 
     def sortLicsByModule(self):
         self.licByModule = dict()
@@ -104,15 +434,17 @@ class FlexNetHistory:
         and therefore, the canonical order will be equal to the chronological
         one.
         """
-        targetPath = os.path.join(
-            self.dataDirectory, self.targetProgram + "*.txt")
-        fileList = glob.glob(targetPath)
-        if len(fileList) == 0:
-            print("Warning:", targetPath, "does not match any files.")
-        fileList.sort
-        return fileList
+        fileNames = self.fileNames
+        if fileNames is None:
+            fileNames = DumpIndex(self.dataDirectory).fileNames(
+                self.targetProgram)
+        if len(fileNames) == 0:
+            print("Warning: no", self.targetProgram, "files in",
+                  self.dataDirectory)
+        return [os.path.join(self.dataDirectory, fName)
+                for fName in fileNames]
 
-    def assignLicenseNumbers(self):
+    def assignLicenseNumbers(self, incremental=False):
         """
         Assigns a number to each record so that records can be paritioned into
         non-overlapping groups.
@@ -122,13 +454,44 @@ class FlexNetHistory:
         number so that they can be partitioned for display purposes.  The
         license server does not have such a concept, but it is neccessary to
         implement a Gannt chart.
+
+        The numbered records are written to the 'store', if any.
+
+        Keyword Arguments:
+            incremental (bool) -- If True, closed licenses keep the numbers
+                given to them by previous runs.  Only licenses closed since
+                the checkpoint are numbered, after the end of each slot, and
+                the open licenses are numbered after them, keeping their
+                previous numbers where possible.  The slots are saved to the
+                checkpoint.  If False, every record is renumbered.
+                (default: {False})
         """
+        if self.window is not None:
+            # The leases keep the numbers they were stored with.
+            return
 
-        records = self.closedLicenses.copy()
-        records.extend(self.openLicenses)
         fModule = lambda record: record.module
         fStart = lambda record: record.start
         fEnd = lambda record: record.lastSeen
+        fPrevious = lambda record: record.licNumber
+        if incremental:
+            newlyClosed = self.closedLicenses[self.nNumbered:]
+            for (module, records) in groupByModule(newlyClosed):
+                slotEnds = self.slotEnds.setdefault(module, list())
+                placeRecords(slotEnds, records, fStart, fEnd, fPrevious)
+            self.nNumbered = len(self.closedLicenses)
+            for (module, records) in groupByModule(
+                    self.openLicenses):
+                slotEnds = list(self.slotEnds.get(module, list()))
+                placeRecords(slotEnds, records, fStart, fEnd, fPrevious)
+            if self.store is not None:
+                self.store.upsertLeases(self.targetProgram, newlyClosed,
+                                        self.openLicenses)
+            self.saveCheckpoint()
+            return
+
+        records = self.closedLicenses.copy()
+        records.extend(self.openLicenses)
         sa = SorterAllocator(fModule, fStart, fEnd, records)
         sa.partition()
         sa.allocate()
@@ -139,6 +502,60 @@ class FlexNetHistory:
                 for (slotIndex, slot) in enumerate(slotBank):
                     for record in slot:
                         record.licNumber = slotIndex
+        if self.store is not None:
+            self.store.upsertLeases(self.targetProgram, self.closedLicenses,
+                                    self.openLicenses)
+
+    def loadWindow(self, start, end):
+        """
+        Replaces the open and closed licenses with the numbered leases of the
+        store which were checked out at some point of the window [start, end),
+        so that the charts of the window are built without reading the data
+        files.
+
+        The history is then only fit for rendering: the leases keep their
+        stored numbers, and folding files or saving a checkpoint raises a
+        RuntimeError, since the window is not the whole history.
+        """
+        (self.closedLicenses, self.openLicenses) = self.store.leases(
+            self.targetProgram, self.modules, start, end)
+        self.window = (start, end)
+        self.lastFile = None
+        self.slotEnds = dict()
+        self.nNumbered = len(self.closedLicenses)
+        self.openLines = dict()
+        self.lineKeys = dict()
+
+    def checkNotWindow(self):
+        if self.window is not None:
+            raise RuntimeError(
+                "The " + self.targetProgram + " history holds a window of "
+                "the store and can only be rendered.")
+
+    def leaseIndexPath(self):
+        """
+        The lease index lives next to the checkpoint in the cache directory,
+        ie 'COMSOL_leases.npz'.  There is none without a cache directory, or
+        for a window of the store, which is not the whole history.
+        """
+        if self.cacheDirectory is None or self.window is not None:
+            return None
+        return os.path.join(self.cacheDirectory,
+                            self.targetProgram + '_leases.npz')
+
+    def saveLeaseIndex(self):
+        """
+        Saves a LeaseIndex of the open and closed licenses, so that the leases
+        held at a time can be looked up without rebuilding the history (see
+        lease_index).  It is listed in 'outputFiles', so that a build is not
+        skipped while it is missing.
+        """
+        path = self.leaseIndexPath()
+        if path is None:
+            return
+        LeaseIndex.fromRecords(self.closedLicenses + self.openLicenses).save(
+            path)
+        self.outputFiles.append(path)
 
     def makeLicString(self, record):
         r = record
@@ -214,79 +631,194 @@ class FlexNetHistory:
         # fig['layout']['xaxis']['rangeslider'] = dict()
         fig['layout']['yaxis']['showgrid'] = True
         fig['layout'].update(margin=dict(l=200))
-        outPath = os.path.join(self.outDirectory, self.targetProgram + '.html')
-        # The 'plot' command generates a file at 'outPath'
-        plot(fig, filename=outPath, auto_open=False,
-             include_plotlyjs=False)
-        addPlotlyScriptCall(outPath)
+        self.outputFiles.extend(writeFigure(
+            fig, self.outDirectory, self.targetProgram, 'gantt',
+            self.outputMode))
+
+    def buildSeatChart(self):
+        """
+        Builds a chart of the exact number of seats of each module held over
+        time, with markers at the daily peaks giving the peak, 95th
+        percentile and seat-hours of each day (see seat_usage).
+        """
+        records = self.closedLicenses + self.openLicenses
+        data = []
+        for (module, (times, seats)) in recordSeatSeries(
+                records, self.modules).items():
+            data.append(go.Scatter(
+                name=module, legendgroup=module, mode='lines',
+                line=dict(shape='hv'), x=times.tolist(), y=seats.tolist()))
+            daily = periodStats(times, seats, 'day')
+            text = ['peak {0}, p95 {1}, {2:.1f} seat-hours'.format(*day)
+                    for day in zip(daily['peak'].tolist(),
+                                   daily['percentile'].tolist(),
+                                   daily['seatHours'].tolist())]
+            # Each marker sits at noon of its day.
+            noon = daily['start'] + np.timedelta64(12, 'h')
+            data.append(go.Scatter(
+                name=module + ' daily peak', legendgroup=module,
+                mode='markers', x=noon.tolist(),
+                y=daily['peak'].tolist(), text=text, hoverinfo='x+text'))
+        layout = go.Layout(title=self.targetProgram + ' seats in use',
+                           yaxis=dict(title='Seats', rangemode='tozero'))
+        fig = go.Figure(data=data, layout=layout)
+        self.outputFiles.extend(writeFigure(
+            fig, self.outDirectory, self.targetProgram + '_seats', 'seats',
+            self.outputMode))
 
     def buildVBarGraphs(self):
+        """
+        Builds a stacked bar chart per module of the weekly usage of each
+        user, in weeks counted back from today.
+        """
+        now = datetime.datetime.today()
+        records = list()
         for module in self.modules:
-            now = datetime.datetime.today()
-            moduleDict = dict() # {-16: {'Nasim': 0.22, 'yasaman': 0.45}, -15: {'Nasim': 0.8, ...}}
-            for lic in self.licByModule[module]:
-                user = lic.user.lower()
-                # print(lic)
-                if user not in moduleDict:
-                    moduleDict[user] = dict() #{week: value, week: value}
-                licAllocDict = weekAllocDict(lic.start, lic.lastSeen, now)
-                userModuleDict = moduleDict[user]
-                for week, value in licAllocDict.items():
-                    if week not in userModuleDict:
-                        userModuleDict[week] = 0.
-                    userModuleDict[week] += value
+            records.extend(self.licByModule.get(module, list()))
+        (users, firstWeek, usage) = weeklyUsage(records, self.modules, now)
+        moduleCodes = np.array([self.modules.index(record.module)
+                                for record in records], dtype=np.intp)
+        userIndices = {user: i for (i, user) in enumerate(users)}
+        userCodes = np.array([userIndices[record.user.lower()]
+                              for record in records], dtype=np.intp)
+        for (moduleIndex, module) in enumerate(self.modules):
+            # Users are stacked in order of their first license.
+            moduleUsers = userCodes[moduleCodes == moduleIndex]
+            (userSet, firstIndex) = np.unique(moduleUsers, return_index=True)
             data = []
-            for user, usage in moduleDict.items():
+            for userIndex in userSet[np.argsort(firstIndex)]:
+                userUsage = usage[userIndex, :, moduleIndex]
+                weeks = np.flatnonzero(userUsage)
                 bar = go.Bar(
-                    name=user,
-                    x=list(usage.keys()),
-                    y=list(usage.values())
+                    name=users[userIndex],
+                    x=(weeks + firstWeek).tolist(),
+                    y=userUsage[weeks].tolist()
                 )
                 data.append(bar)
             layout = go.Layout(barmode='stack', title=module)
             fig = go.Figure(data=data, layout=layout)
-            outPath = os.path.join(self.outDirectory, self.targetProgram +
-                                    '_' + module + '.html')
-            # The 'plot' command generates a file at 'outPath'
-            plot(fig, filename=outPath, auto_open=False,
-                include_plotlyjs=False)
-            addPlotlyScriptCall(outPath)
-
-def addPlotlyScriptCall(fName):
-    str1 = open(fName, mode='r')
-    text = str1.read()
-    str1.close()
-    pHeadEnd = text.find("</head>") + 7
-    scriptCall = '<script src="https://cdn.plot.ly/plotly-latest.min.js"></script>'
-    textSequence = (text[0:pHeadEnd], scriptCall, text[pHeadEnd:])
-    newHTML = "".join(textSequence)
-    str2 = open(fName,mode='w')
-    str2.write(newHTML)
-    str2.close()
-
-def listDifference(aList, bList):
+            self.outputFiles.extend(writeFigure(
+                fig, self.outDirectory, self.targetProgram + '_' + module,
+                'bars', self.outputMode))
+
+    def getStats(self):
+        """
+        Summarizes the work done by this history for run reports.
+
+        Returns:
+            dict -- The number of files parsed, of records produced and the
+            total size in bytes of the generated figures.
+        """
+        return dict(
+            filesParsed=self.nFilesParsed,
+            recordsProduced=len(self.closedLicenses) + len(self.openLicenses),
+            outputBytes=sum(os.path.getsize(outPath)
+                            for outPath in set(self.outputFiles)))
+
+def reconcileSnapshot(openLics, currentLics):
     """
-    Returns the set difference between aList and bList
+    Matches the records of a new snapshot against the currently open records
+    (see matchSnapshot).
+
+    The 'lastSeen' attribute of every matched open record is updated from its
+    counterpart in the new snapshot.
+
+    Arguments:
+        openLics (list(LeaseRecord)) -- The currently open records.
+        currentLics (list(LeaseRecord)) -- The records of the new snapshot.
 
-    Creates a copy of aList.  Looks for each element of bList in aList and removes it from aList. 
+    Returns:
+        (tuple(list, list, list)) -- The open records that are still open,
+        the open records that have been closed (both in 'openLics' order) and
+        the new records that were not previously open (in 'currentLics'
+        order).
+    """
+    matches = matchSnapshot(openLics, currentLics)
+    taken = [False] * len(currentLics)
+    stillOpen = list()
+    recentlyClosed = list()
+    for (rec, i) in zip(openLics, matches):
+        if i is None:
+            recentlyClosed.append(rec)
+        else:
+            rec.lastSeen = currentLics[i].lastSeen
+            taken[i] = True
+            stillOpen.append(rec)
+    recentlyOpened = [rec for (i, rec) in enumerate(currentLics)
+                      if not taken[i]]
+    return (stillOpen, recentlyClosed, recentlyOpened)
+
+
+def matchSnapshot(openLics, currentLics):
+    """
+    Pairs the currently open records with the records of a new snapshot.
+
+    Records are matched on their signature (see LeaseRecord.getSig) using
+    dictionaries, so the cost is linear in the size of both lists.  The same
+    user may hold several seats of a module on one server, in which case
+    several records share a signature.  Within such a group, records with the
+    same start time are paired first and the remainder are paired in order.
+
+    Arguments:
+        openLics (list(LeaseRecord)) -- The currently open records.
+        currentLics (list(LeaseRecord)) -- The records of the new snapshot.
+
+    Returns:
+        (list) -- For each record of 'openLics', the index of its counterpart
+        in 'currentLics', or None if it has been closed.
     """
-    aCopy = aList.copy()
-    for bElem in bList:
-        if bElem in aCopy:
-            aCopy.remove(bElem)
-    return aCopy
-
-
-def listUpdate(aList, bList, attributes):
-    virginIndices = set(range(len(aList)))
-    for bElem in bList:
-        for i in virginIndices:
-            aElem = aList[i]
-            if aElem == bElem:
-                for att in attributes:
-                    aElem.__setattr__(att, bElem.__getattribute__(att))
-                virginIndices.remove(i)
-                break
+    byStart = dict()
+    for (i, rec) in enumerate(currentLics):
+        key = (rec.getSig(), rec.start)
+        if key in byStart:
+            byStart[key].append(i)
+        else:
+            byStart[key] = deque([i])
+    matches = [None] * len(openLics)
+    taken = [False] * len(currentLics)
+    for (j, rec) in enumerate(openLics):
+        indices = byStart.get((rec.getSig(), rec.start))
+        if indices:
+            i = indices.popleft()
+            matches[j] = i
+            taken[i] = True
+    bySig = dict()
+    for (i, rec) in enumerate(currentLics):
+        if taken[i]:
+            continue
+        sig = rec.getSig()
+        if sig in bySig:
+            bySig[sig].append(i)
+        else:
+            bySig[sig] = deque([i])
+    for (j, rec) in enumerate(openLics):
+        if matches[j] is not None:
+            continue
+        indices = bySig.get(rec.getSig())
+        if indices:
+            matches[j] = indices.popleft()
+    return matches
+
+
+def groupByModule(records):
+    """
+    Returns (module, list(LeaseRecord)) pairs in order of first appearance.
+    """
+    byModule = dict()
+    for record in records:
+        byModule.setdefault(record.module, list()).append(record)
+    return byModule.items()
+
+
+def placeRecords(slotEnds, records, fStart, fEnd, fPrevious):
+    """
+    Numbers the records of one module after the slots in 'slotEnds' (see
+    sorter_allocator.PlaceInFreeSlots), updating 'slotEnds'.
+    """
+    indices = PlaceInFreeSlots(slotEnds, records, fStart, fEnd, fPrevious)
+    for (record, index) in zip(records, indices):
+        record.licNumber = index
+
 
 def weeksPast(then, now):
     delta = (now - then)
@@ -302,5 +834,63 @@ def weekAllocDict(startDate, endDate, now):
         allocDict[bucket] = 1
     # print(allocDict)
     allocDict[floor(weeksStart)] -= weeksStart - floor(weeksStart)
-    allocDict[floor(weeksEnd)] -= ceil(weeksEnd) - weeksEnd
-    return allocDict
\ No newline at end of file
+    # The last week is covered up to the end; an end exactly on a week
+    # boundary covers none of it.
+    allocDict[floor(weeksEnd)] -= 1 - (weeksEnd - floor(weeksEnd))
+    return allocDict
+
+
+def weeklyUsage(records, modules, now):
+    """
+    Sums, for every user and module, the fraction of each week that the
+    records were checked out.  Weeks are counted back from 'now' as in
+    weekAllocDict, so week -1 is the seven days before 'now'.
+
+    Arguments:
+        records (list(LeaseRecord)) -- The records of all modules.
+        modules (list(str)) -- The modules, giving the order of the last axis.
+        now (datetime) -- The end of week -1.
+
+    Returns:
+        (list(str), int, ndarray) -- The lower case user names in order of
+        first appearance, the number of the first week and the usage indexed
+        by (user, week - first week, module).
+    """
+    users = dict()
+    userCodes = np.array([users.setdefault(record.user.lower(), len(users))
+                          for record in records], dtype=np.intp)
+    moduleCodes = np.array([modules.index(record.module)
+                            for record in records], dtype=np.intp)
+    if len(records) == 0:
+        return (list(users), 0, np.zeros((0, 0, len(modules))))
+    now = np.datetime64(now, 'us')
+    week = np.timedelta64(7, 'D')
+    starts = (np.array([record.start for record in records],
+                       dtype='datetime64[us]') - now) / week
+    ends = (np.array([record.lastSeen for record in records],
+                     dtype='datetime64[us]') - now) / week
+    firstWeeks = np.floor(starts)
+    lastWeeks = np.floor(ends)
+    firstWeek = int(firstWeeks.min())
+    nWeeks = int(lastWeeks.max()) - firstWeek + 1
+    first = firstWeeks.astype(np.intp) - firstWeek
+    last = lastWeeks.astype(np.intp) - firstWeek
+    shape = (len(users), nWeeks + 1, len(modules))
+
+    # Partial coverage of the first and last week of each record.
+    usage = np.zeros(shape)
+    sameWeek = (first == last)
+    np.add.at(usage, (userCodes, first, moduleCodes),
+              np.where(sameWeek, ends - starts, 1 - (starts - firstWeeks)))
+    spans = ~sameWeek
+    np.add.at(usage, (userCodes[spans], last[spans], moduleCodes[spans]),
+              ends[spans] - lastWeeks[spans])
+
+    # Whole weeks in between are summed from a difference array.
+    steps = np.zeros(shape)
+    np.add.at(steps, (userCodes[spans], first[spans] + 1,
+                      moduleCodes[spans]), 1.)
+    np.add.at(steps, (userCodes[spans], last[spans], moduleCodes[spans]),
+              -1.)
+    usage += np.cumsum(steps, axis=1)
+    return (list(users), firstWeek, usage[:, :nWeeks, :])
@@ -1,17 +1,40 @@
 import os
 import re
+import mmap
+import locale
+import numpy as np
 from datetime import datetime
 from collections import Counter
+from functools import lru_cache
 from lease_record import LeaseRecord
+from chart_output import writeAtomic
 
 
-def readFlexNetFile(fName, moduleList):
+#   mencagli FW6 FW76 (v5.31) (FW90/1718 3504), start Fri 6/22 10:21
+_leaseRegex = re.compile(
+    r'(?:[\s]*)(?P<user>[\S]*) (?P<server>[\S]*) (?P<terminal>[\S]*) ' +
+    r'\((?P<version>[\w\W]*?)\) \((?P<licServer>[\w\W]*?)\), ' +
+    r'start (?P<dayOfWeek>[\w\W]*?) (?P<partialStartTime>[\w\W]*)')
+_sectionHeader = 'Users of '
+# What open(fName, 'r') decodes with.
+_textEncoding = locale.getpreferredencoding(False)
+# The header line of a section, up to the start of the next line.
+_sectionRegex = re.compile(
+    rb'^Users of (?P<module>[^:\r\n]*)[^\n]*\n?', re.MULTILINE)
+_readTimeRegex = re.compile(
+    r'status on (?P<dayOfWeek>[\S]*) (?P<datetime>.*)\n')
+
+
+def readFlexNetFile(fName, moduleList=None):
     """
     Parses a FlexNet file into a list of LeaseRecords
 
     Arguments:
         fName (path or string) -- The file to be read.
-        moduleList (list(str)) -- The modules for which to find user usage data
+
+    Keyword Arguments:
+        moduleList (list(str)) -- The modules for which to find user usage
+            data.  All modules in the file are used if None. (default: {None})
 
     Returns:
         list(LeaseRecord)-- The LeaseRecords for the read file.
@@ -20,16 +43,310 @@ def readFlexNetFile(fName, moduleList):
     file = open(fName, "r")
     textBlock = file.read()
     file.close()
-    readTime = extractReadTime(textBlock)
-    leaseRecords = []
     # if lmgrdNotRunning(textBlock):
     #     return []
-    for moduleName in moduleList:
-        moreRecords = extractX(textBlock, moduleName, readTime)
-        leaseRecords.extend(moreRecords)
+    return parseFlexNetText(textBlock, moduleList)
+
+
+def leaseLineColumns(snapshot):
+    """
+    Converts the read time and lease lines of a file (see parseLeaseLines)
+    into a dict of arrays for storage in a SnapshotCache.  The first row
+    holds the read time, so that a file without leases keeps it, and each
+    module starts with an empty line, so that modules without leases are
+    kept.
+    """
+    (readTime, sections) = snapshot
+    modules = ['']
+    lines = [readTime.isoformat(' ')]
+    for (module, moduleLines) in sections:
+        modules.extend([module] * (len(moduleLines) + 1))
+        lines.append('')
+        lines.extend(moduleLines)
+    return dict(module=np.array(modules, dtype=str),
+                line=np.array(lines, dtype=str))
+
+
+def leaseLinesFromColumns(columns, moduleList=None):
+    """
+    Rebuilds the snapshot stored by leaseLineColumns, with the lines of
+    moduleList in its order as parseLeaseLines gives them.
+    """
+    modules = columns['module']
+    lines = columns['line']
+    readTime = datetime.fromisoformat(str(lines[0]))
+    if moduleList is None:
+        moduleList = list(dict.fromkeys(modules[1:].tolist()))
+    return (readTime, [(module, lines[modules == module].tolist()[1:])
+                       for module in moduleList])
+
+
+def parseFlexNetText(textBlock, moduleList=None):
+    """
+    Parses the text of a FlexNet file in a single pass.
+
+    Every 'Users of <module>' section is recognized as the lines are walked
+    and lease lines are only parsed for the requested modules.
+
+    Arguments:
+        textBlock (str) -- The file contents as a giant string.
+
+    Keyword Arguments:
+        moduleList (list(str)) -- The modules for which to find user usage
+            data.  All modules in the file are used if None. (default: {None})
+
+    Returns:
+        list(LeaseRecord) -- The LeaseRecords, grouped by module in the order
+        of 'moduleList' (or of the file if moduleList is None).
+    """
+
+    return recordsFromLines(*parseLeaseLines(textBlock, moduleList))
+
+
+def readLeaseLines(fName, moduleList=None):
+    """
+    Reads the raw lease lines of a FlexNet file (see parseLeaseLines).
+    """
+    with open(fName, "r") as file:
+        textBlock = file.read()
+    return parseLeaseLines(textBlock, moduleList)
+
+
+def parseLeaseLines(textBlock, moduleList=None):
+    """
+    Splits the text of a FlexNet file into its lease lines without parsing
+    them, so that lines already seen in a previous snapshot need not be
+    turned into LeaseRecords again (see parseLeaseLine).
+
+    Arguments:
+        textBlock (str) -- The file contents as a giant string.
+
+    Keyword Arguments:
+        moduleList (list(str)) -- The modules for which to find user usage
+            data.  All modules in the file are used if None. (default: {None})
+
+    Returns:
+        (tuple(datetime, list)) -- The read time of the file and a
+        (module, list(str)) pair per module, in the order of 'moduleList'
+        (or of the file if moduleList is None).
+    """
+
+    readTime = extractReadTime(textBlock)
+    byModule = dict()
+    if moduleList is not None:
+        for moduleName in moduleList:
+            byModule[moduleName] = list()
+    lines = None
+    for line in textBlock.split('\n'):
+        if line.startswith(_sectionHeader):
+            module = line[len(_sectionHeader):].split(':', 1)[0]
+            if moduleList is None and module not in byModule:
+                byModule[module] = list()
+            lines = byModule.get(module)
+            continue
+        if lines is not None and ', start ' in line:
+            lines.append(line)
+    return (readTime, list(byModule.items()))
+
+
+def parseLeaseLine(line, module, readTime):
+    """
+    Parses a single lease line.
+
+    Returns:
+        (LeaseRecord) -- The lease, last seen at 'readTime', or None if
+        'line' is not a lease line.
+    """
+    lineResults = _leaseRegex.search(line)
+    if lineResults is None:
+        return None
+    return _recordFromMatch(lineResults, module, readTime)
+
+
+def recordsFromLines(readTime, sections):
+    """
+    Parses the lease lines given by parseLeaseLines into LeaseRecords.
+    """
+    leaseRecords = []
+    for (module, lines) in sections:
+        for line in lines:
+            _parseLeaseLine(line, module, readTime, leaseRecords)
     return leaseRecords
 
 
+def _parseLeaseLine(line, module, readTime, records):
+    """
+    Appends the LeaseRecord of 'line' to 'records' if it is a lease line.
+    """
+    if ', start ' not in line:
+        return
+    lineResults = _leaseRegex.search(line)
+    if lineResults is not None:
+        records.append(_recordFromMatch(lineResults, module, readTime))
+
+
+def readFlexNetFileMapped(fName, moduleList=None, cacheIndex=True):
+    """
+    Parses a FlexNet file into a list of LeaseRecords like readFlexNetFile,
+    but memory maps the file and decodes only the header and the sections of
+    the requested modules (see readLeaseLinesMapped).
+
+    Arguments:
+        fName (path or string) -- The file to be read.
+
+    Keyword Arguments:
+        moduleList (list(str)) -- The modules for which to find user usage
+            data.  All modules in the file are used if None. (default: {None})
+        cacheIndex (bool) -- Whether to read and write the sidecar index.
+            (default: {True})
+
+    Returns:
+        list(LeaseRecord)-- The LeaseRecords for the read file, grouped by
+        module as by parseFlexNetText.
+    """
+    return recordsFromLines(
+        *readLeaseLinesMapped(fName, moduleList, cacheIndex))
+
+
+def readLeaseLinesMapped(fName, moduleList=None, cacheIndex=True):
+    """
+    Reads the raw lease lines of a FlexNet file like readLeaseLines, but
+    memory maps the file and decodes only the header and the sections of the
+    requested modules.
+
+    The byte offsets of the 'Users of' sections are found once (see
+    sectionIndex) and kept in a sidecar file, '[fName].idx', which is reused
+    while the size and modification time of the file are unchanged.  Only
+    the entries of the requested modules are looked up in it.
+
+    Arguments:
+        fName (path or string) -- The file to be read.
+
+    Keyword Arguments:
+        moduleList (list(str)) -- The modules for which to find user usage
+            data.  All modules in the file are used if None. (default: {None})
+        cacheIndex (bool) -- Whether to read and write the sidecar index.
+            (default: {True})
+
+    Returns:
+        (tuple(datetime, list)) -- As parseLeaseLines.
+    """
+    with open(fName, 'rb') as file:
+        stat = os.fstat(file.fileno())
+        if stat.st_size == 0:
+            return parseLeaseLines('', moduleList)
+        key = [stat.st_size, stat.st_mtime_ns]
+        index = None
+        if cacheIndex:
+            index = _loadSectionIndex(fName, key, moduleList)
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if index is None:
+                index = sectionIndex(buffer)
+                if cacheIndex:
+                    _saveSectionIndex(fName, key, index)
+            (headerEnd, sections) = index
+            readTime = extractReadTime(_decode(buffer[:headerEnd]))
+            if moduleList is None:
+                moduleList = list(sections)
+            leaseLines = []
+            for module in moduleList:
+                lines = []
+                for (start, end) in sections.get(module, []):
+                    lines.extend(
+                        line for line in _decode(buffer[start:end]).split('\n')
+                        if ', start ' in line)
+                leaseLines.append((module, lines))
+    return (readTime, leaseLines)
+
+
+def sectionIndex(buffer):
+    """
+    Finds the 'Users of <module>' sections of the bytes of a FlexNet file.
+
+    Arguments:
+        buffer (bytes or mmap) -- The file contents.
+
+    Returns:
+        (tuple(int, dict(str=list(list(int))))) -- The end of the header
+        (where the first section starts) and, for every module in order of
+        appearance, the [start, end) byte offsets of the lines following its
+        header line.  A module may have several sections, ie one per vendor.
+    """
+    size = len(buffer)
+    headers = list(_sectionRegex.finditer(buffer))
+    sections = dict()
+    for (i, match) in enumerate(headers):
+        end = headers[i + 1].start() if i + 1 < len(headers) else size
+        module = _decode(match.group('module'))
+        sections.setdefault(module, []).append([match.end(), end])
+    headerEnd = headers[0].start() if headers else size
+    return (headerEnd, sections)
+
+
+def _decode(data):
+    """
+    Decodes bytes as reading the file in text mode would.
+    """
+    text = data.decode(_textEncoding, errors='replace')
+    return text.replace('\r\n', '\n')
+
+
+def _indexPath(fName):
+    return fName + '.idx'
+
+
+def _loadSectionIndex(fName, key, moduleList):
+    """
+    Reads the sidecar index, with one '<module>\t<start>\t<end>' line per
+    section, and looks up only the sections of 'moduleList' (all if None).
+
+    Returns:
+        (tuple) -- As sectionIndex, or None if the sidecar is missing or
+        was written for another version of the file.
+    """
+    try:
+        with open(_indexPath(fName), encoding='utf-8') as file:
+            text = file.read()
+    except (OSError, ValueError):
+        return None
+    (first, _, body) = text.partition('\n')
+    fields = first.split()
+    if fields[:2] != [str(k) for k in key] or len(fields) != 3:
+        return None
+    headerEnd = int(fields[2])
+    sections = dict()
+    if moduleList is None:
+        for line in body.splitlines():
+            (module, start, end) = line.split('\t')
+            sections.setdefault(module, []).append([int(start), int(end)])
+        return (headerEnd, sections)
+    body = '\n' + body
+    for module in moduleList:
+        needle = '\n' + module + '\t'
+        position = body.find(needle)
+        while position != -1:
+            lineEnd = body.find('\n', position + 1)
+            line = body[position + 1:lineEnd if lineEnd != -1 else None]
+            (_, start, end) = line.split('\t')
+            sections.setdefault(module, []).append([int(start), int(end)])
+            position = body.find(needle, position + 1)
+    return (headerEnd, sections)
+
+
+def _saveSectionIndex(fName, key, index):
+    (headerEnd, sections) = index
+    lines = ['{0} {1} {2}'.format(key[0], key[1], headerEnd)]
+    for (module, spans) in sections.items():
+        for (start, end) in spans:
+            lines.append('{0}\t{1}\t{2}'.format(module, start, end))
+    try:
+        writeAtomic(_indexPath(fName),
+                    ('\n'.join(lines) + '\n').encode('utf-8'))
+    except OSError:
+        # A read only dump directory only costs re-indexing next time.
+        pass
+
+
 def extractReadTime(textBlock):
     """
     Extracts the generation date from the FlexNet file block text.
@@ -40,13 +357,61 @@ def extractReadTime(textBlock):
     Returns:
         (datetime) -- The datetime of which the file was generated.
     """
-    m = re.search(
-        r'status on (?P<dayOfWeek>[\S]*) (?P<datetime>.*)\n', textBlock)
+    m = _readTimeRegex.search(textBlock)
     fileDateTime = m.group('datetime')
-    datetimeObject = datetime.strptime(fileDateTime, '%m/%d/%Y %H:%M')
+    # '6/22/2018 10:25', equivalent to strptime(..., '%m/%d/%Y %H:%M')
+    (date, clock) = fileDateTime.split()
+    (month, day, year) = date.split('/')
+    (hour, minute) = clock.split(':')
+    datetimeObject = datetime(
+        int(year), int(month), int(day), int(hour), int(minute))
     return datetimeObject
 
 
+def parseStartTime(partialStartTimeStr, readTime):
+    """
+    Converts the year-less start time of a lease line (ie '6/22 10:21') to a
+    datetime.
+
+    The year is guessed to be the one in which the file was written, unless
+    that would put the start after the read time, which happens around NYE.
+
+    Arguments:
+        partialStartTimeStr (str) -- The start time as printed by lmstat.
+        readTime (datetime) -- The time the file was created.
+
+    Returns:
+        (datetime) -- The start time of the lease.
+    """
+    year = readTime.year
+    startTime = _startTimeInYear(partialStartTimeStr, year)
+    if startTime is None or startTime > readTime:
+        startTime = _startTimeInYear(partialStartTimeStr, year - 1)
+    return startTime
+
+
+@lru_cache(maxsize=4096)
+def _startTimeInYear(partialStartTimeStr, year):
+    """
+    Splits '6/22 10:21' by hand rather than with strptime.  Long running
+    leases repeat the same string in hundreds of consecutive snapshots, so the
+    results are memoized.
+
+    Returns:
+        (datetime) -- The start time in 'year', or None if the date does not
+        exist in that year (ie 2/29).
+    """
+    (date, clock) = partialStartTimeStr.split()
+    (month, day) = date.split('/')
+    (hour, minute) = clock.split(':')
+    try:
+        return datetime(year, int(month), int(day), int(hour), int(minute))
+    except ValueError:
+        if (int(month), int(day)) == (2, 29):
+            return None
+        raise
+
+
 # def lmgrdNotRunning(textBlock):
 #     m = re.search(r'lmgrd is not running', textBlock)
 #     return m == NoneType
@@ -90,19 +455,29 @@ def extractX(textBlock, module, readTime):
     for i in range(moduleHeaderLineCount, nLines - moduleTailLineCount):
         line = lines[i]
         lineResults = regexC.search(line)
-        user = lineResults.group('user')
-        server = lineResults.group('server')
-        terminal = lineResults.group('terminal')
-        version = lineResults.group('version')
-        licServer = lineResults.group('licServer')
-        partialStartTimeStr = lineResults.group('partialStartTime')
-        # partialStartTime doesn't supply a year
-        startTime = datetime.strptime(partialStartTimeStr, '%m/%d %H:%M')
-        # So we guess that it will be the same as the year the file was written
-        startTime = startTime.replace(year=readTime.year)
-        if startTime > readTime:  # However, this may not be true around NYE.
-            startTime = startTime.replace(year=(startTime.year - 1))
-        leaseRec = LeaseRecord(user, module, server, terminal, version,
-                               licServer, startTime, readTime, True)
+        leaseRec = _recordFromMatch(lineResults, module, readTime)
         records.append(leaseRec)
     return records
+
+
+def _recordFromMatch(lineResults, module, readTime):
+    """
+    Builds a LeaseRecord from a match of a single lease line.
+
+    Arguments:
+        lineResults (re.Match) -- The match of the lease line regex.
+        module (str) -- The module whose section contained the line.
+        readTime (datetime) -- The time the file was created.
+
+    Returns:
+        (LeaseRecord) -- The lease, last seen at 'readTime'.
+    """
+    user = lineResults.group('user')
+    server = lineResults.group('server')
+    terminal = lineResults.group('terminal')
+    version = lineResults.group('version')
+    licServer = lineResults.group('licServer')
+    partialStartTimeStr = lineResults.group('partialStartTime')
+    startTime = parseStartTime(partialStartTimeStr, readTime)
+    return LeaseRecord(user, module, server, terminal, version,
+                       licServer, startTime, readTime, True)
@@ -1,97 +1,414 @@
 import sys
 import os
 import glob
+import argparse
+import traceback
+import queue
+import asyncio
+import threading
+from functools import partial
 from flexnet_history import FlexNetHistory
 from comp_history import CompHistory
+from decimation import Decimation
+from dump_index import DumpIndex
+from chart_scheduler import ChartJob, runJobs
+from dump_watcher import DumpWatcher, WatchedChart, watch, watchSnapshots
+from collector import collect, lmstatSource, tasklistSource
+from fingerprint import isUpToDate, saveFingerprint
+from lease_store import LeaseStore
 import datetime
-import traceback
 
 dataDir = "C:\\lab_logging\\dump\\"
 outDir = "C:\\xampp\\htdocs\\plotly_depot"
 outDir = "C:\\Bitnami\\dokuwiki-20180422b-3\\apache2\\htdocs\\plotly_depot"
+cacheDir = "C:\\lab_logging\\cache\\"
+nWorkers = 4
+# Processes each chart job parses its dump files with, so a rebuild from
+# scratch uses up to nWorkers * parseWorkers cores (see ordered_pool).
+parseWorkers = 2
+jobTimeout = 3600.
+summaryPath = os.path.join(outDir, "lab_logging_summary.json")
+decimationMethod = 'minmax'  # or 'lttb'; see decimation.Decimation
+outputMode = 'html'  # or 'json' / 'json.gz'; see chart_output
+# Keep a section index next to each lmstat dump (see readLeaseLinesMapped).
+mappedReads = False
+compNames = ["FW7", "FW6", "FW5", "FW4", "FW3"]
+# Keep the leases and usage samples in an SQLite database (see LeaseStore),
+# ie os.path.join(cacheDir, "lab_logging.sqlite").  Nothing is stored if None.
+storePath = None
+# Where --window writes the charts of a window of time, drawn from the store.
+windowDir = os.path.join(outDir, "window")
+# Seconds between polls of the dump directory, and without new files before
+# a chart is re-rendered, in --watch mode.
+watchInterval = 5.
+watchDebounce = 10.
+# The commands run by --collect in place of the dump scripts, by dump file
+# prefix.  The tasklist of each computer in 'compNames' is taken remotely.
+lmstatCommands = {
+    "COMSOL": ["lmutil", "lmstat", "-a", "-c", "1718@FW90"]}
+tasklistCommand = ["tasklist", "/nh", "/v", "/fo", "csv"]
+collectInterval = 300.
+collectTimeout = 60.
+collectArchive = True
+
+
+def LUMHistory(fileNames=None):
+    moduleList = [
+        'FDTD_Solutions_design', 'MODE_Solutions_design']
+    return FlexNetHistory(dataDir, outDir, "LUM", moduleList,
+                          nWorkers=parseWorkers, cacheDirectory=cacheDir,
+                          fileNames=fileNames, outputMode=outputMode,
+                          mappedReads=mappedReads,
+                          store=openStore())
+
+
+def COMSOLHistory(fileNames=None):
+    moduleList = [
+        'COMSOLGUI', 'WAVEOPTICS', 'RF', 'HEATTRANSFER', 'ACOUSTICS',
+        'LLMATLAB', 'CADIMPORT', 'OPTIMIZATION']
+    return FlexNetHistory(dataDir, outDir, "COMSOL", moduleList,
+                          nWorkers=parseWorkers, cacheDirectory=cacheDir,
+                          fileNames=fileNames, outputMode=outputMode,
+                          mappedReads=mappedReads,
+                          store=openStore())
+
+
+def CSTHistory(fileNames=None):
+    moduleList = [
+    'frontend', 'Solver_TimeDomain', 'Solver_FrequencyDomain',
+        'Solver_Eigenmode', 'Solver_IntegralEquation',
+        'Solver_PrintedCircuitBoard']
+    return FlexNetHistory(dataDir, outDir, "CST", moduleList,
+                          nWorkers=parseWorkers, cacheDirectory=cacheDir,
+                          fileNames=fileNames, outputMode=outputMode,
+                          mappedReads=mappedReads,
+                          store=openStore())
+
+
+def compHistory(compName, fileNames=None):
+    return CompHistory(dataDir, outDir, compName, nWorkers=parseWorkers,
+                       cacheDirectory=cacheDir, fileNames=fileNames,
+                       decimation=Decimation(decimationMethod),
+                       outputMode=outputMode, store=openStore())
+
+
+def openStore():
+    if storePath is None:
+        return None
+    return LeaseStore(storePath)
+
+
+def closeStore(history):
+    if history.store is not None:
+        history.store.close()
+
+
+def renderGannt(history):
+    history.assignLicenseNumbers(incremental=True)
+    history.buildGannt()
+    history.buildSeatChart()
+    history.saveLeaseIndex()
+
+
+def renderCOMSOL(history):
+    renderGannt(history)
+    history.sortLicsByModule()
+    history.buildVBarGraphs()
+
+
+def renderComp(cHist):
+    cHist.buildScatterPlot()
 
 
-def buildLUMChart():
+def buildLUMChart(fileNames=None):
     """
     Builds the Lumerical usage chart and places it in the designated directory.
+    Returns the statistics of the build (see FlexNetHistory.getStats).
+
+    Keyword Arguments: fileNames {list(str)} -- The sorted dump file names,
+    ie from a DumpIndex.  The dump directory is listed if None.
     """
-    try:
-        moduleList = [
-            'FDTD_Solutions_design', 'MODE_Solutions_design']
-        history = FlexNetHistory(dataDir, outDir, "LUM", moduleList)
-        history.buildAllHistory()
-        history.assignLicenseNumbers()
-        history.buildGannt()
-        print("LUM Chart Success")
-    except:
-        traceback.print_exc()
-        print("LUM Chart Failed")
+    history = LUMHistory(fileNames)
 
-def buildCOMSOLChart():
+    def build():
+        history.buildAllHistory(incremental=True)
+        renderGannt(history)
+    return buildUnlessUnchanged(history, build)
+
+def buildCOMSOLChart(fileNames=None):
     """
     Builds the COMSOL usage chart and places it in the designated directory.
+    Returns the statistics of the build (see FlexNetHistory.getStats).
+
+    Keyword Arguments: fileNames {list(str)} -- The sorted dump file names,
+    ie from a DumpIndex.  The dump directory is listed if None.
     """
-    try:
-        moduleList = [
-            'COMSOLGUI', 'WAVEOPTICS', 'RF', 'HEATTRANSFER', 'ACOUSTICS',
-            'LLMATLAB', 'CADIMPORT', 'OPTIMIZATION']
-        history = FlexNetHistory(dataDir, outDir, "COMSOL", moduleList)
-        history.buildAllHistory()
-        history.assignLicenseNumbers()
-        history.buildGannt()
-        history.sortLicsByModule()
-        history.buildVBarGraphs()
-        print("COMSOL Chart Success")
-    except:
-        traceback.print_exc()
-        print("COMSOL Chart Failed")
+    history = COMSOLHistory(fileNames)
+
+    def build():
+        history.buildAllHistory(incremental=True)
+        renderCOMSOL(history)
+    # The bar graphs count weeks back from today.
+    return buildUnlessUnchanged(history, build,
+                                settings=(datetime.date.today(),))
 
 
-def buildCSTChart():
+def buildCSTChart(fileNames=None):
     """
     Builds the CST usage chart and places it in the designated directory.
+    Returns the statistics of the build (see FlexNetHistory.getStats).
+
+    Keyword Arguments: fileNames {list(str)} -- The sorted dump file names,
+    ie from a DumpIndex.  The dump directory is listed if None.
     """
-    try:
-        moduleList = [
-        'frontend', 'Solver_TimeDomain', 'Solver_FrequencyDomain',
-            'Solver_Eigenmode', 'Solver_IntegralEquation',
-            'Solver_PrintedCircuitBoard']
-        history = FlexNetHistory(dataDir, outDir, "CST", moduleList)
-        history.buildAllHistory()
-        history.assignLicenseNumbers()
-        history.buildGannt()
-        print("CST Chart Success")
-    except:
-        traceback.print_exc()
-        print("CST Chart Failed")
+    history = CSTHistory(fileNames)
+
+    def build():
+        history.buildAllHistory(incremental=True)
+        renderGannt(history)
+    return buildUnlessUnchanged(history, build)
 
 
-def buildCompChart(compName):
+def buildCompChart(compName, fileNames=None):
     """
     Generates a computer usage chart and places it in the designated directory.
+    Returns the statistics of the build (see CompHistory.getStats).
 
     Arguments: compName {str} -- The computer name as it would appear in the
     log files.
+
+    Keyword Arguments: fileNames {list(str)} -- The sorted dump file names,
+    ie from a DumpIndex.  The dump directory is listed if None.
     """
-    try:
-        cHist = CompHistory(dataDir, outDir, compName)
+    cHist = compHistory(compName, fileNames)
+
+    def build():
         cHist.buildAllHistory()
-        cHist.buildScatterPlot()
-        print("Comp Chart Success: "+compName)
-    except:
-        traceback.print_exc()
-        print("Comp Chart Failed: "+compName)
+        renderComp(cHist)
+    return buildUnlessUnchanged(cHist, build)
+
+
+def buildUnlessUnchanged(history, build, settings=()):
+    """
+    Runs 'build' unless the inputs of 'history' have the same fingerprint
+    as when its charts were last built (see fingerprint.inputFingerprint).
+
+    Arguments: history {FlexNetHistory or CompHistory} -- The chart builder.
+    build {function} -- Parses the files and writes the charts.
+
+    Keyword Arguments: settings {tuple} -- Anything else the charts depend
+    on. (default: {()})
+
+    Returns: dict -- The statistics of the build, with 'skipped' set if
+    nothing was done.
+    """
+    try:
+        fingerprint = history.inputFingerprint(settings)
+        if isUpToDate(history.fingerprintPath(), fingerprint):
+            return dict(history.getStats(), skipped=True)
+        build()
+        saveFingerprint(history.fingerprintPath(), fingerprint,
+                        history.outputFiles)
+        return history.getStats()
+    finally:
+        closeStore(history)
 
 
 def main():
-    buildCOMSOLChart()
-    buildCSTChart()
-    buildLUMChart()
-    buildCompChart("FW7")
-    buildCompChart("FW6")
-    buildCompChart("FW5")
-    buildCompChart("FW4")
-    buildCompChart("FW3")
+    """
+    Builds every chart from a single listing of the dump directory.  The
+    charts are independent, so they are built concurrently by runJobs, which
+    writes a summary of the run to 'summaryPath'.
+    """
+    index = DumpIndex(dataDir)
+    jobs = [
+        ChartJob("COMSOL", buildCOMSOLChart, (index.fileNames("COMSOL"),)),
+        ChartJob("CST", buildCSTChart, (index.fileNames("CST"),)),
+        ChartJob("LUM", buildLUMChart, (index.fileNames("LUM"),))]
+    for compName in compNames:
+        jobs.append(ChartJob(compName, buildCompChart,
+                             (compName, index.fileNames(compName))))
+    runJobs(jobs, nWorkers=nWorkers, timeout=jobTimeout,
+            summaryPath=summaryPath)
+
+
+def buildWindowCharts(start, end):
+    """
+    Builds every chart for the window [start, end) from the leases and usage
+    samples in the store, rather than from the dump files, and places them in
+    'windowDir'.  The store is filled by the regular builds.
+
+    Arguments: start, end {datetime} -- The window.
+    """
+    if storePath is None:
+        raise ValueError("Set storePath to build charts of a window.")
+    os.makedirs(windowDir, exist_ok=True)
+    charts = [("COMSOL", COMSOLHistory, renderCOMSOL),
+              ("CST", CSTHistory, renderGannt),
+              ("LUM", LUMHistory, renderGannt)]
+    for compName in compNames:
+        charts.append((compName, partial(compHistory, compName), renderComp))
+    for (name, makeHistory, render) in charts:
+        history = makeHistory([])
+        history.outDirectory = windowDir
+        try:
+            history.loadWindow(start, end)
+            render(history)
+        except Exception:
+            traceback.print_exc()
+            print(name, "Chart Failed")
+            continue
+        finally:
+            closeStore(history)
+        print(name, "Chart Built")
+
+
+def watchedCharts(index):
+    """
+    Builds every chart from the files of 'index' and keeps its history in
+    memory, to be updated by watchDumps or collectDumps.  A chart which fails
+    to build is reported and retried when its next file lands.
+
+    Returns: dict(str=WatchedChart) -- The charts by dump file prefix.
+    """
+    charts = dict()
+    for (prefix, makeHistory, render) in [
+            ("COMSOL", COMSOLHistory, renderCOMSOL),
+            ("CST", CSTHistory, renderGannt),
+            ("LUM", LUMHistory, renderGannt)]:
+        history = makeHistory(index.fileNames(prefix))
+        charts[prefix] = WatchedChart(prefix, history, render,
+                                      partial(rebuildHistory, makeHistory))
+    for compName in compNames:
+        makeHistory = partial(compHistory, compName)
+        cHist = makeHistory(index.fileNames(compName))
+        charts[compName] = WatchedChart(compName, cHist, renderComp,
+                                        partial(rebuildHistory, makeHistory))
+    for chart in charts.values():
+        try:
+            buildHistory(chart.history)
+            chart.renderNow()
+        except Exception:
+            traceback.print_exc()
+            print(chart.name, "Chart Failed")
+            continue
+        print(chart.name, "Chart Built")
+    # The few files folded at a time from here on are parsed in process.
+    for chart in charts.values():
+        chart.history.nWorkers = 1
+    return charts
+
+
+def buildHistory(history):
+    if isinstance(history, FlexNetHistory):
+        history.buildAllHistory(incremental=True)
+    else:
+        history.buildAllHistory()
+
+
+def rebuildHistory(makeHistory, history):
+    """
+    Builds a new history from the files of 'history', ie after one of them
+    changed once it was folded, and closes the store of the old one.
+
+    Arguments: makeHistory {function} -- Makes a history from a list of file
+    names.  history {FlexNetHistory or CompHistory} -- The history replaced.
+
+    Returns: FlexNetHistory or CompHistory -- The new history.
+    """
+    rebuilt = makeHistory(list(history.fileNames))
+    buildHistory(rebuilt)
+    rebuilt.nWorkers = 1
+    closeStore(history)
+    return rebuilt
+
+
+def watchDumps():
+    """
+    Builds every chart once, then keeps the histories in memory and folds
+    each dump file into its chart as it lands, re-rendering the charts whose
+    files have settled (see dump_watcher.watch).  A chart whose latest file
+    was still being written when it was read is rebuilt once the file
+    settles.  Runs until interrupted.
+    """
+    index = DumpIndex(dataDir)
+    known = [fName for prefix in index.prefixes()
+             for fName in index.fileNames(prefix)]
+    # Made before the charts are built, so it also sees the files which
+    # change while they are read.
+    watcher = DumpWatcher(dataDir, known)
+    charts = watchedCharts(index)
+    try:
+        watch(charts, dataDir, pollInterval=watchInterval,
+              debounce=watchDebounce, watcher=watcher)
+    finally:
+        for chart in charts.values():
+            closeStore(chart.history)
+
+
+def collectDumps():
+    """
+    Builds every chart once, then runs the lmstat and tasklist commands
+    itself (see collector) and folds their output straight into the charts,
+    re-rendering them as in watchDumps.  The output is archived to the dump
+    directory if 'collectArchive' is set.  Runs until interrupted.
+    """
+    charts = watchedCharts(DumpIndex(dataDir))
+    sources = list()
+    for (prefix, command) in lmstatCommands.items():
+        sources.append(lmstatSource(
+            prefix, command, charts[prefix].history.modules,
+            collectInterval, collectTimeout))
+    for compName in compNames:
+        sources.append(tasklistSource(
+            compName, tasklistCommand + ["/s", compName],
+            collectInterval, collectTimeout))
+
+    # The charts are folded and rendered in a thread of their own, so the
+    # commands are read and timed out on schedule while a chart renders.
+    snapshots = queue.Queue()
+    stop = threading.Event()
+    worker = threading.Thread(
+        target=watchSnapshots, args=(charts, snapshots),
+        kwargs=dict(pollInterval=watchInterval, debounce=watchDebounce,
+                    stop=stop),
+        daemon=True)
+
+    def handle(source, snapshot, fName):
+        snapshots.put((source.name, snapshot, fName))
+
+    worker.start()
+    try:
+        asyncio.run(collect(sources, handle,
+                            dataDir if collectArchive else None))
+    finally:
+        stop.set()
+        worker.join()
+        for chart in charts.values():
+            closeStore(chart.history)
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(
+        description="Builds the license and computer usage charts.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--watch", action="store_true",
+        help="keep running and update the charts as dump files land")
+    mode.add_argument(
+        "--collect", action="store_true",
+        help="keep running, collect the dumps in process and update the "
+             "charts as they are taken")
+    mode.add_argument(
+        "--window", nargs=2, metavar=("START", "END"),
+        type=datetime.datetime.fromisoformat,
+        help="build the charts of a window of time, ie '2018-06-01' "
+             "'2018-07-01', from the store into windowDir")
+    args = parser.parse_args()
+    if args.watch:
+        watchDumps()
+    elif args.collect:
+        collectDumps()
+    elif args.window:
+        buildWindowCharts(*args.window)
+    else:
+        main()
@@ -0,0 +1,245 @@
+"""
+An index of the leases of a FlexNetHistory answering "who held RF at 14:00
+on Tuesday" without opening the Gantt chart or rebuilding the history.
+
+The leases are kept in NumPy arrays sorted by module and start time, over
+which an implicit binary tree holds the latest end of every subtree.  The
+leases of a module that started by time b form a contiguous run found by
+binary search, and the tree skips every subtree of that run which ended
+before time a.  Each of the k leases found is reached by a descent of at most
+log n levels, so a query of a module costs O((k + 1) log n), and one of every
+module O((m + k) log n).  The user and server filters are applied to those
+leases.
+
+The index is saved as an .npz file, which the command line below queries:
+
+    python lease_index.py COMSOL_leases.npz --at "2018-06-26 14:00" --module RF
+"""
+import io
+import sys
+import argparse
+import datetime
+import numpy as np
+from collections import namedtuple
+from chart_output import writeAtomic
+
+Lease = namedtuple('Lease', ['user', 'module', 'server', 'start', 'lastSeen',
+                             'licNumber'])
+
+_arrayNames = ['starts', 'ends', 'modules', 'users', 'servers', 'licNumbers',
+               'moduleNames', 'userNames', 'serverNames']
+# Padding of the tree leaves, earlier than any time.
+_never = np.iinfo(np.int64).min
+
+
+class LeaseIndex:
+
+    def __init__(self, starts, ends, modules, users, servers, licNumbers,
+                 moduleNames, userNames, serverNames):
+        """
+        Builds the index from its arrays, one entry per lease, sorted by
+        module and start time (see fromRecords and load).
+
+        Arguments:
+            starts, ends (ndarray(int64)) -- The start and last seen times in
+                seconds since the epoch.
+            modules, users, servers (ndarray(int)) -- Codes into the names.
+            licNumbers (ndarray(int)) -- The license numbers, -1 if none.
+            moduleNames, userNames, serverNames (ndarray(str)) -- The names,
+                the module names in sorted order.
+        """
+        self.starts = starts
+        self.ends = ends
+        self.modules = modules
+        self.users = users
+        self.servers = servers
+        self.licNumbers = licNumbers
+        self.moduleNames = moduleNames
+        self.userNames = userNames
+        self.serverNames = serverNames
+        self.moduleBounds = np.searchsorted(
+            modules, np.arange(len(moduleNames) + 1))
+        size = 1
+        while size < len(starts):
+            size *= 2
+        tree = np.full(2 * size, _never, dtype=np.int64)
+        tree[size:size + len(ends)] = ends
+        level = size
+        while level > 1:
+            tree[level // 2:level] = np.maximum(tree[level:2 * level:2],
+                                                tree[level + 1:2 * level:2])
+            level //= 2
+        self.size = size
+        self.tree = tree
+
+    @classmethod
+    def fromRecords(cls, records):
+        """
+        Arguments:
+            records (list(LeaseRecord)) -- ie the open and closed licenses of
+                a FlexNetHistory.
+        """
+        (moduleNames, modules) = _codes([r.module for r in records])
+        (userNames, users) = _codes([r.user for r in records])
+        (serverNames, servers) = _codes([r.server for r in records])
+        starts = _seconds([r.start for r in records])
+        ends = _seconds([r.lastSeen for r in records])
+        licNumbers = np.array([-1 if r.licNumber is None else r.licNumber
+                               for r in records], dtype=np.int64)
+        order = np.lexsort((starts, modules))
+        return cls(starts[order], ends[order], modules[order], users[order],
+                   servers[order], licNumbers[order], moduleNames, userNames,
+                   serverNames)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(*[arrays[name] for name in _arrayNames])
+
+    def save(self, path):
+        """
+        Writes the index to 'path' as an .npz file, atomically.
+        """
+        buffer = io.BytesIO()
+        np.savez(buffer, **{name: getattr(self, name)
+                            for name in _arrayNames})
+        writeAtomic(path, buffer.getvalue())
+
+    def __len__(self):
+        return len(self.starts)
+
+    def at(self, time, module=None, user=None, server=None):
+        """
+        The leases held at 'time' (see between).
+        """
+        return self.between(time, time, module, user, server)
+
+    def between(self, first, last, module=None, user=None, server=None):
+        """
+        The leases held at some point from 'first' to 'last', ends included.
+
+        Arguments:
+            first, last (datetime) -- The window.
+
+        Keyword Arguments:
+            module, user, server (str) -- Only the leases of this module, user
+                or server, if given. (default: {None})
+
+        Returns:
+            (list(Lease)) -- In order of module and start time.
+        """
+        if module is None:
+            codes = range(len(self.moduleNames))
+        else:
+            code = _find(self.moduleNames, module)
+            if code is None:
+                return []
+            codes = [code]
+        (first, last) = _seconds([first, last])
+        hits = [np.array([], dtype=np.int64)]
+        for code in codes:
+            (lo, hi) = self.moduleBounds[code:code + 2]
+            hi = lo + np.searchsorted(self.starts[lo:hi], last, side='right')
+            hits.append(self.endingAfter(lo, hi, first))
+        hits = np.concatenate(hits)
+        for (names, codes, name) in ((self.userNames, self.users, user),
+                                     (self.serverNames, self.servers, server)):
+            if name is not None:
+                hits = hits[codes[hits] == _find(names, name)]
+        return [self.lease(i) for i in hits.tolist()]
+
+    def endingAfter(self, lo, hi, time):
+        """
+        The positions in [lo, hi) of the leases last seen at or after 'time',
+        in increasing order.
+        """
+        # The O(log n) subtrees covering [lo, hi), then every subtree below
+        # them which ends after 'time', one level at a time.
+        nodes = list()
+        (left, right) = (lo + self.size, hi + self.size)
+        while left < right:
+            if left & 1:
+                nodes.append(left)
+                left += 1
+            if right & 1:
+                right -= 1
+                nodes.append(right)
+            left //= 2
+            right //= 2
+        frontier = np.array(nodes, dtype=np.int64)
+        hits = list()
+        while len(frontier):
+            frontier = frontier[self.tree[frontier] >= time]
+            leaves = frontier >= self.size
+            hits.append(frontier[leaves] - self.size)
+            inner = frontier[~leaves]
+            frontier = np.concatenate([2 * inner, 2 * inner + 1])
+        if not hits:
+            return np.array([], dtype=np.int64)
+        return np.sort(np.concatenate(hits))
+
+    def lease(self, i):
+        licNumber = int(self.licNumbers[i])
+        return Lease(
+            str(self.userNames[self.users[i]]),
+            str(self.moduleNames[self.modules[i]]),
+            str(self.serverNames[self.servers[i]]),
+            _datetime(self.starts[i]), _datetime(self.ends[i]),
+            None if licNumber < 0 else licNumber)
+
+
+def _codes(values):
+    """
+    Returns:
+        (tuple(ndarray(str), ndarray(int))) -- The sorted distinct values and
+        the code of each value.
+    """
+    (names, codes) = np.unique(np.array(values, dtype=str),
+                               return_inverse=True)
+    return (names, codes.astype(np.int64).reshape(-1))
+
+
+def _find(names, name):
+    i = int(np.searchsorted(names, name))
+    if i < len(names) and names[i] == name:
+        return i
+    return None
+
+
+def _seconds(times):
+    return np.array(times, dtype='datetime64[s]').astype(np.int64)
+
+
+def _datetime(seconds):
+    return np.datetime64(int(seconds), 's').astype(datetime.datetime)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Lists the leases held at a time or during a window.")
+    parser.add_argument("index", help="a lease index, ie COMSOL_leases.npz")
+    parser.add_argument("--at", required=True,
+                        type=datetime.datetime.fromisoformat,
+                        help="the time, ie '2018-06-26 14:00'")
+    parser.add_argument("--until", type=datetime.datetime.fromisoformat,
+                        help="the end of the window starting at --at")
+    parser.add_argument("--module")
+    parser.add_argument("--user")
+    parser.add_argument("--server")
+    args = parser.parse_args(argv)
+    index = LeaseIndex.load(args.index)
+    until = args.at if args.until is None else args.until
+    leases = index.between(args.at, until, args.module, args.user,
+                           args.server)
+    for lease in leases:
+        licNumber = '' if lease.licNumber is None else lease.licNumber
+        print('{0:24s} {1:12s} {2:10s} {3:%Y-%m-%d %H:%M} - '
+              '{4:%Y-%m-%d %H:%M} {5}'.format(
+                  lease.module, lease.user, lease.server, lease.start,
+                  lease.lastSeen, licNumber))
+    if not leases:
+        print("No leases found.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
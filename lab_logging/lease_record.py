@@ -1,3 +1,6 @@
+import sys
+
+
 class LeaseRecord:
     """
     An object for storing a single record of usage in a FlexNet license manager
@@ -5,8 +8,16 @@ class LeaseRecord:
 
     The hash is defined on the immutable attributes of the record.  This is
     useful for finding overlap between two different license usage snapshots.
+
+    Millions of records are kept across snapshots, so the record has no
+    instance dict and its strings are interned.  The signature tuple and its
+    hash are computed once per distinct signature and shared by every record
+    with that signature (see _sharedSig).
     """
 
+    __slots__ = ('_sig', '_hash', 'terminal', 'version', 'licServer',
+                 'start', 'lastSeen', 'licNumber')
+
     def __init__(self, user, module, server, terminal, version,
                  licServer, start, lastSeen=None, checkedOut=True):
         """
@@ -26,20 +37,59 @@ class LeaseRecord:
             checkedOut (bool) -- If the module is still checked out. (default: {True})
         """
 
-        self.user = user
-        self.module = module
-        self.server = server
-        self.terminal = terminal
-        self.version = version
-        self.licServer = licServer
+        shared = _signatures.get((user, module, server, checkedOut))
+        if shared is None:
+            shared = _sharedSig(user, module, server, checkedOut)
+        (self._sig, self._hash) = shared
+        self.terminal = _intern(terminal)
+        self.version = _intern(version)
+        self.licServer = _intern(licServer)
         self.start = start
         if lastSeen is None:
             self.lastSeen = start
         else:
             self.lastSeen = lastSeen
-        self.checkedOut = checkedOut
         self.licNumber = None
 
+    # The signature attributes are read from the shared signature.  Setting
+    # one switches the record to the signature with the new value.
+
+    @property
+    def user(self):
+        return self._sig[0]
+
+    @user.setter
+    def user(self, user):
+        (_, module, server, checkedOut) = self._sig
+        (self._sig, self._hash) = _sharedSig(user, module, server, checkedOut)
+
+    @property
+    def module(self):
+        return self._sig[1]
+
+    @module.setter
+    def module(self, module):
+        (user, _, server, checkedOut) = self._sig
+        (self._sig, self._hash) = _sharedSig(user, module, server, checkedOut)
+
+    @property
+    def server(self):
+        return self._sig[2]
+
+    @server.setter
+    def server(self, server):
+        (user, module, _, checkedOut) = self._sig
+        (self._sig, self._hash) = _sharedSig(user, module, server, checkedOut)
+
+    @property
+    def checkedOut(self):
+        return self._sig[3]
+
+    @checkedOut.setter
+    def checkedOut(self, checkedOut):
+        (user, module, server, _) = self._sig
+        (self._sig, self._hash) = _sharedSig(user, module, server, checkedOut)
+
     def getSig(self):
         """
         Creates a signature based on all immuatble aspects of the record.
@@ -52,7 +102,7 @@ class LeaseRecord:
         # are considered mutable.
         # return (self.user, self.module, self.server, self.terminal,
         #         self.version, self.licServer, self.start)
-        return (self.user, self.module, self.server, self.checkedOut)
+        return self._sig
 
     def equiv(self, other):
         '''
@@ -71,13 +121,55 @@ class LeaseRecord:
         return (selfSig == otherSig)
 
     def __hash__(self):
-        return hash(self.getSig())
+        return self._hash
 
     def __eq__(self, other):
-        return hash(self) == hash(other)
+        if not isinstance(other, LeaseRecord):
+            return NotImplemented
+        # Shared signatures make the identity test the common case.
+        return self._sig is other._sig or self._sig == other._sig
+
+    def __getstate__(self):
+        # String hashes differ between processes, so the hash is not pickled.
+        return (self._sig, self.terminal, self.version, self.licServer,
+                self.start, self.lastSeen, self.licNumber)
+
+    def __setstate__(self, state):
+        if isinstance(state, dict):
+            # Records pickled before LeaseRecord had __slots__.
+            state = ((state['user'], state['module'], state['server'],
+                      state['checkedOut']), state['terminal'],
+                     state['version'], state['licServer'], state['start'],
+                     state['lastSeen'], state['licNumber'])
+        (sig, terminal, version, licServer, self.start, self.lastSeen,
+         self.licNumber) = state
+        (self._sig, self._hash) = _sharedSig(*sig)
+        self.terminal = _intern(terminal)
+        self.version = _intern(version)
+        self.licServer = _intern(licServer)
 
     def __repr__(self):
         outTuple = (self.user, self.module, self.server,
                     self.terminal, self.version, self.licServer, self.start,
                     self.lastSeen, self.checkedOut)
         return 'LeaseRecord' + repr(outTuple)
+
+
+_intern = sys.intern
+
+# signature -> (signature, hash); one entry per user, module, server and
+# checkedOut combination seen by this process.
+_signatures = dict()
+
+
+def _sharedSig(user, module, server, checkedOut):
+    """
+    Returns the shared signature tuple with these values and its hash,
+    creating it with interned strings on first use.
+    """
+    sig = (user, module, server, checkedOut)
+    shared = _signatures.get(sig)
+    if shared is None:
+        sig = (_intern(user), _intern(module), _intern(server), checkedOut)
+        shared = _signatures.setdefault(sig, (sig, hash(sig)))
+    return shared
@@ -0,0 +1,267 @@
+"""
+An SQLite store of the license leases and computer usage samples, so that the
+history outlives a run and a chart can be built from a window of time without
+replaying every dump file.
+
+Times are stored as ISO 8601 text ('2018-06-22 10:21:00'), which sorts
+chronologically, so windows are plain text comparisons served by the indexes.
+"""
+import sqlite3
+import datetime
+from lease_record import LeaseRecord
+
+_schema = """
+CREATE TABLE IF NOT EXISTS leases (
+    program TEXT NOT NULL,
+    module TEXT NOT NULL,
+    user TEXT NOT NULL,
+    server TEXT NOT NULL,
+    terminal TEXT NOT NULL,
+    start TEXT NOT NULL,
+    seat INTEGER NOT NULL,
+    version TEXT NOT NULL,
+    licServer TEXT NOT NULL,
+    lastSeen TEXT NOT NULL,
+    licNumber INTEGER,
+    checkedOut INTEGER NOT NULL,
+    PRIMARY KEY (program, module, user, server, terminal, start, seat));
+CREATE INDEX IF NOT EXISTS leasesByTime
+    ON leases (program, module, start, lastSeen);
+CREATE TABLE IF NOT EXISTS usage (
+    host TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    user TEXT NOT NULL,
+    time TEXT NOT NULL,
+    value REAL NOT NULL,
+    PRIMARY KEY (host, kind, time, user));
+CREATE INDEX IF NOT EXISTS usageByTime ON usage (host, time);
+"""
+
+_upsertLease = """
+INSERT INTO leases (program, module, user, server, terminal, start, seat,
+                    version, licServer, lastSeen, licNumber, checkedOut)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (program, module, user, server, terminal, start, seat)
+DO UPDATE SET
+    lastSeen = max(leases.lastSeen, excluded.lastSeen),
+    licNumber = excluded.licNumber,
+    checkedOut = excluded.checkedOut
+"""
+
+_selectLeases = """
+SELECT user, module, server, terminal, version, licServer, start, lastSeen,
+       licNumber, checkedOut
+FROM leases
+WHERE program = ? AND module = ? AND start < ? AND lastSeen >= ?
+ORDER BY start, seat
+"""
+
+_selectSeats = """
+SELECT seat, lastSeen, checkedOut
+FROM leases
+WHERE program = ? AND module = ? AND user = ? AND server = ? AND terminal = ?
+    AND start = ?
+ORDER BY seat
+"""
+
+
+class LeaseStore:
+    """
+    The leases of every program and the usage samples of every computer.
+
+    A lease is identified by its program, module, user, server, terminal and
+    start time, and a seat number telling apart the seats one user checked
+    out on one terminal in the same minute (see upsertLeases).  Storing a
+    record again updates its seat.
+    """
+
+    def __init__(self, path):
+        """
+        Opens the store at 'path', creating it if needed.  Chart jobs run in
+        separate processes, so the database is put in WAL mode, which lets
+        them read while another one writes.  In --collect mode the store is
+        opened by the main thread and used by the render thread, one at a
+        time, so the connection is not tied to a thread.
+
+        Arguments:
+            path (str) -- The database file, or ':memory:'.
+        """
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=60.,
+                                          check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        with self.connection:
+            self.connection.executescript(_schema)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def upsertLeases(self, program, closedRecords=(), openRecords=()):
+        """
+        Inserts or updates leases in a single transaction.  'lastSeen' never
+        moves back.
+
+        lmstat reports start times to the minute, so several seats may share
+        the rest of a lease's key.  A record updates the stored seat with the
+        same lastSeen and state, or else a seat still checked out, since an
+        open seat is only ever continued or closed.  Otherwise it is a new
+        seat.
+
+        Arguments:
+            program (str) -- The program the leases are for, ie 'COMSOL'.
+
+        Keyword Arguments:
+            closedRecords (iterable(LeaseRecord)) -- Leases no longer checked
+                out. (default: {()})
+            openRecords (iterable(LeaseRecord)) -- Leases still checked out.
+                (default: {()})
+        """
+        byKey = dict()
+        for (records, checkedOut) in ((closedRecords, 0), (openRecords, 1)):
+            for record in records:
+                key = (program, record.module, record.user, record.server,
+                       record.terminal, _isoTime(record.start))
+                byKey.setdefault(key, list()).append((record, checkedOut))
+        with self.connection:
+            rows = list()
+            for (key, records) in byKey.items():
+                seats = self.assignSeats(key, records)
+                rows.extend(key + (seat,) + _leaseValues(record, checkedOut)
+                            for (seat, (record, checkedOut))
+                            in zip(seats, records))
+            self.connection.executemany(_upsertLease, rows)
+
+    def assignSeats(self, key, records):
+        """
+        The seats of the records sharing a lease key (see upsertLeases).
+
+        Arguments:
+            key (tuple) -- (program, module, user, server, terminal, start).
+            records (list(tuple(LeaseRecord, int))) -- Each record and whether
+                it is checked out.
+
+        Returns:
+            (list(int)) -- The seat of each record.
+        """
+        stored = self.connection.execute(_selectSeats, key).fetchall()
+        free = list(stored)
+        seats = [None] * len(records)
+        for (i, (record, checkedOut)) in enumerate(records):
+            state = (_isoTime(record.lastSeen), checkedOut)
+            for row in free:
+                if row[1:] == state:
+                    seats[i] = row[0]
+                    free.remove(row)
+                    break
+        for i in range(len(records)):
+            if seats[i] is None:
+                for row in free:
+                    if row[2]:
+                        seats[i] = row[0]
+                        free.remove(row)
+                        break
+        nextSeat = max([row[0] + 1 for row in stored], default=0)
+        for i in range(len(records)):
+            if seats[i] is None:
+                seats[i] = nextSeat
+                nextSeat += 1
+        return seats
+
+    def leases(self, program, modules, start, end):
+        """
+        The leases of 'modules' of 'program' which were checked out at some
+        point of the window [start, end).
+
+        Returns:
+            (tuple(list, list)) -- The closed and the open LeaseRecords, each
+            in order of start time within each module.
+        """
+        closedRecords = list()
+        openRecords = list()
+        window = (_isoTime(end), _isoTime(start))
+        for module in modules:
+            for row in self.connection.execute(_selectLeases,
+                                               (program, module) + window):
+                (user, module, server, terminal, version, licServer, begin,
+                 lastSeen, licNumber, checkedOut) = row
+                record = LeaseRecord(
+                    user, module, server, terminal, version, licServer,
+                    _parseTime(begin), _parseTime(lastSeen))
+                record.licNumber = licNumber
+                if checkedOut:
+                    openRecords.append(record)
+                else:
+                    closedRecords.append(record)
+        return (closedRecords, openRecords)
+
+    def addUsage(self, host, samples):
+        """
+        Inserts usage samples in a single transaction, replacing any taken at
+        the same time.
+
+        Arguments:
+            host (str) -- The computer name, ie 'FW7'.
+            samples (iterable(tuple(datetime, dict, dict))) -- The time, CPU
+                usage and memory usage by user of each sample (see
+                comp_history.iterUsage).
+        """
+        rows = list()
+        for (time, cpuUsage, memUsage) in samples:
+            time = _isoTime(time)
+            for (kind, usage) in (('cpu', cpuUsage), ('mem', memUsage)):
+                rows.extend((host, kind, user, time, float(value))
+                            for (user, value) in usage.items())
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO usage VALUES (?, ?, ?, ?, ?)', rows)
+
+    def usage(self, host, start, end):
+        """
+        The usage samples of 'host' taken in the window [start, end).
+
+        Returns:
+            (list(tuple(datetime, dict, dict))) -- As taken by addUsage, in
+            chronological order.
+        """
+        samples = list()
+        byTime = dict()
+        cursor = self.connection.execute(
+            'SELECT time, kind, user, value FROM usage '
+            'WHERE host = ? AND time >= ? AND time < ? ORDER BY time',
+            (host, _isoTime(start), _isoTime(end)))
+        for (time, kind, user, value) in cursor:
+            sample = byTime.get(time)
+            if sample is None:
+                sample = (_parseTime(time), dict(), dict())
+                byTime[time] = sample
+                samples.append(sample)
+            sample[1 if kind == 'cpu' else 2][user] = value
+        return samples
+
+    def lastUsageTime(self, host):
+        """
+        Returns:
+            (datetime) -- The time of the latest sample of 'host', or None.
+        """
+        (time,) = self.connection.execute(
+            'SELECT max(time) FROM usage WHERE host = ?', (host,)).fetchone()
+        return None if time is None else _parseTime(time)
+
+
+def _leaseValues(record, checkedOut):
+    return (record.version, record.licServer, _isoTime(record.lastSeen),
+            record.licNumber, checkedOut)
+
+
+def _isoTime(time):
+    return time.isoformat(' ')
+
+
+def _parseTime(text):
+    return datetime.datetime.fromisoformat(text)
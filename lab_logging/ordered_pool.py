@@ -0,0 +1,54 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def orderedPoolMap(func, items, nWorkers, chunkSize=8, maxInFlight=None):
+    """
+    Applies func to every item in a process pool and yields the results in
+    the order of 'items'.
+
+    Items are sent to the workers in chunks, and at most 'maxInFlight' chunks
+    are submitted ahead of the one being consumed, so the memory held by
+    finished but unconsumed results stays bounded however long 'items' is.
+
+    Arguments:
+        func (callable) -- A picklable function of one argument (ie a module
+            level function or a functools.partial of one).
+        items (iterable) -- The arguments to func.
+        nWorkers (int) -- The number of worker processes.
+
+    Keyword Arguments:
+        chunkSize (int) -- Items sent to a worker at a time. (default: {8})
+        maxInFlight (int) -- Chunks submitted but not yet consumed.
+            (default: {2 * nWorkers})
+
+    Yields:
+        The value of func(item) for each item, in order.
+    """
+    if maxInFlight is None:
+        maxInFlight = 2 * nWorkers
+    with ProcessPoolExecutor(max_workers=nWorkers) as pool:
+        inFlight = deque()
+        for chunk in _chunks(items, chunkSize):
+            if len(inFlight) >= maxInFlight:
+                for result in inFlight.popleft().result():
+                    yield result
+            inFlight.append(pool.submit(_mapChunk, func, chunk))
+        while inFlight:
+            for result in inFlight.popleft().result():
+                yield result
+
+
+def _mapChunk(func, chunk):
+    return [func(item) for item in chunk]
+
+
+def _chunks(items, chunkSize):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) == chunkSize:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
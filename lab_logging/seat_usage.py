@@ -0,0 +1,158 @@
+"""
+Exact concurrent seat counts of the license modules, and their daily or
+weekly peak, 95th percentile and seat-hours, for sizing license purchases.
+
+The counts are found with a sweep line over the lease start and end events:
+the events are sorted once, O(n log n), and a cumulative sum gives the number
+of seats held after each event.  The license numbers of the Gantt chart only
+bound the overall peak from above, since they are kept stable between runs
+(see FlexNetHistory.assignLicenseNumbers).
+
+Times are NumPy datetime64[s] arrays.  A count holds from its time up to the
+next one, and a lease holds its seat from 'start' up to 'lastSeen', so a
+lease ending when another starts does not add to the peak.  A lease seen in a
+single snapshot has 'lastSeen' equal to 'start', and would hold no seat, so
+every lease holds its seat for at least one 'snapshotInterval'.
+"""
+import numpy as np
+
+_periodDays = {'day': 1, 'week': 7}
+
+# The interval between two snapshots, of the dump scripts and of collector
+# runs.
+snapshotInterval = np.timedelta64(300, 's')
+
+
+def seatSeries(starts, ends, minHold=snapshotInterval):
+    """
+    The number of seats held over time by a set of leases.
+
+    Arguments:
+        starts (ndarray(datetime64)) -- When each lease was checked out.
+        ends (ndarray(datetime64)) -- When each lease was last seen.
+
+    Keyword Arguments:
+        minHold (timedelta64) -- How long a lease holds its seat at least,
+            so that a lease seen once is counted. (default: {snapshotInterval})
+
+    Returns:
+        (tuple(ndarray(datetime64[s]), ndarray(int))) -- The times at which
+        the count changes, in increasing order, and the count from each time
+        until the next.  The last count is 0.
+    """
+    starts = np.asarray(starts, dtype='datetime64[s]')
+    ends = np.maximum(np.asarray(ends, dtype='datetime64[s]'),
+                      starts + minHold)
+    times = np.concatenate([starts, ends])
+    deltas = np.concatenate([np.ones(len(starts), dtype=np.int64),
+                             -np.ones(len(ends), dtype=np.int64)])
+    # Ends sort before starts at equal times.
+    order = np.lexsort((deltas, times))
+    times = times[order]
+    seats = np.cumsum(deltas[order])
+    # The count after the last event at each time holds from that time.
+    lasts = np.flatnonzero(np.r_[times[1:] != times[:-1], True])
+    return (times[lasts], seats[lasts])
+
+
+def recordSeatSeries(records, modules, minHold=snapshotInterval):
+    """
+    The seat series of each module (see seatSeries).
+
+    Arguments:
+        records (list(LeaseRecord)) -- Open and closed licenses.
+        modules (list(str)) -- The modules wanted.
+
+    Keyword Arguments:
+        minHold (timedelta64) -- As taken by seatSeries.
+            (default: {snapshotInterval})
+
+    Returns:
+        (dict(str=tuple)) -- The times and counts of each module with leases.
+    """
+    byModule = dict()
+    for record in records:
+        byModule.setdefault(record.module, list()).append(record)
+    series = dict()
+    for module in modules:
+        moduleRecords = byModule.get(module)
+        if not moduleRecords:
+            continue
+        starts = np.array([r.start for r in moduleRecords],
+                          dtype='datetime64[s]')
+        ends = np.array([r.lastSeen for r in moduleRecords],
+                        dtype='datetime64[s]')
+        series[module] = seatSeries(starts, ends, minHold)
+    return series
+
+
+def periodStarts(times, period='day'):
+    """
+    The start of the period containing each time.  Weeks start on Monday.
+    """
+    days = times.astype('datetime64[D]')
+    if period == 'week':
+        # 1970-01-01 was a Thursday.
+        days = days - (days.astype(np.int64) + 3) % 7
+    elif period != 'day':
+        raise ValueError("Unknown period: " + repr(period))
+    return days.astype('datetime64[s]')
+
+
+def periodStats(times, seats, period='day', percentile=95.):
+    """
+    The peak, percentile and seat-hours of a seat series in each day or week
+    from the one of its first change to the one of its last.
+
+    The percentile is weighted by time: it is the count the seats stayed at or
+    below for 'percentile' % of the period.
+
+    Arguments:
+        times (ndarray(datetime64[s])) -- As given by seatSeries.
+        seats (ndarray(int)) -- As given by seatSeries.
+
+    Keyword Arguments:
+        period (str) -- 'day' or 'week'. (default: {'day'})
+        percentile (float) -- The percentile reported. (default: {95.})
+
+    Returns:
+        (dict(str=ndarray)) -- 'start', the start of each period, and its
+        'peak', 'percentile' and 'seatHours'.
+    """
+    if len(times) == 0:
+        empty = np.array([], dtype='datetime64[s]')
+        return dict(start=empty, peak=np.array([], dtype=np.int64),
+                    percentile=np.array([], dtype=np.int64),
+                    seatHours=np.array([]))
+    length = np.timedelta64(_periodDays[period], 'D')
+    first = periodStarts(times[:1], period)[0]
+    last = periodStarts(times[-1:], period)[0]
+    edges = np.arange(first, last + length, length).astype('datetime64[s]')
+    # Split the steps at the period edges, so each step lies in one period.
+    held = np.searchsorted(times, edges, side='right') - 1
+    edgeSeats = np.where(held >= 0, seats[np.maximum(held, 0)], 0)
+    stepTimes = np.concatenate([times, edges])
+    stepSeats = np.concatenate([seats, edgeSeats])
+    order = np.argsort(stepTimes, kind='stable')
+    (stepTimes, stepSeats) = (stepTimes[order], stepSeats[order])
+    keep = np.r_[stepTimes[1:] != stepTimes[:-1], True]
+    (stepTimes, stepSeats) = (stepTimes[keep], stepSeats[keep])
+    periodEnd = edges[-1] + length
+    hours = (np.diff(np.r_[stepTimes, periodEnd]).astype(np.float64) /
+             3600.)
+    periods = np.searchsorted(edges, stepTimes, side='right') - 1
+    firsts = np.searchsorted(periods, np.arange(len(edges)))
+    peak = np.maximum.reduceat(stepSeats, firsts)
+    seatHours = np.add.reduceat(stepSeats * hours, firsts)
+    # Time weighted percentile: sort the steps by count within each period
+    # and find where the cumulative hours pass the percentile.
+    order = np.lexsort((stepSeats, periods))
+    cumHours = np.cumsum(hours[order])
+    periodHours = np.add.reduceat(hours, firsts)
+    before = np.r_[0., np.cumsum(periodHours)[:-1]]
+    index = np.searchsorted(cumHours, before + periodHours * percentile / 100.)
+    # Rounding must not carry the search into a neighbouring period.
+    lasts = np.r_[firsts[1:], len(order)] - 1
+    index = np.clip(index, firsts, lasts)
+    return dict(start=edges, peak=peak,
+                percentile=stepSeats[order][index], seatHours=seatHours)
@@ -0,0 +1,175 @@
+import io
+import os
+import numpy as np
+from chart_output import writeAtomic
+
+
+class SnapshotCache:
+    """
+    An on-disk cache of parsed dump files, stored as compressed NPZ columns.
+
+    Dump files are grouped into shards of one program (or computer) and one
+    day, ie 'COMSOL_2018_06_22.npz' holds every 'COMSOL_2018_06_22_*.txt'
+    file.  A shard concatenates the columns of its files and keeps an index
+    of the file names, sizes, modification times and row offsets.  Loading a
+    day of snapshots is then a single read instead of hundreds.
+
+    An indexed file whose size or modification time has changed is parsed
+    again, and its shard is rewritten.  Entries of files which have been
+    deleted are dropped from their shard when it is loaded.
+    """
+
+    def __init__(self, cacheDirectory):
+        """
+        Standard initialization.  Creates the cache directory if needed.
+
+        Arguments:
+            cacheDirectory (str) -- Where the shards live.
+        """
+        self.cacheDirectory = cacheDirectory
+        os.makedirs(cacheDirectory, exist_ok=True)
+
+    def mapCached(self, parse, fNames, toColumns, fromColumns, directory='',
+                  mapFunc=map):
+        """
+        Yields the parsed form of each file, parsing only the files that are
+        missing from the cache or have changed.
+
+        Arguments:
+            parse (callable) -- Parses a file name into a snapshot.
+            fNames (list(str)) -- The files, in chronological order.
+            toColumns (callable) -- Converts a snapshot into a dict of 1D
+                arrays of equal length.
+            fromColumns (callable) -- Converts such a dict into the value to
+                be yielded.
+
+        Keyword Arguments:
+            directory (str) -- The directory the file names are relative to.
+                (default: {''})
+            mapFunc (callable) -- Used as mapFunc(parse, fNames) to parse the
+                files that are not cached.  Must yield results in order, as
+                map and orderedPoolMap do. (default: {map})
+
+        Yields:
+            fromColumns(columns) for each file, in order.
+        """
+        shards = list()
+        for fName in fNames:
+            key = shardKey(fName)
+            if len(shards) == 0 or shards[-1][0] != key:
+                shards.append((key, list()))
+            path = os.path.join(directory, fName)
+            stat = os.stat(path)
+            shards[-1][1].append(
+                (fName, (stat.st_mtime_ns, stat.st_size)))
+        misses = list()
+        for (key, entries) in shards:
+            index = self.loadIndex(key)
+            for (fName, stamp) in entries:
+                if index.get(os.path.basename(fName)) != stamp:
+                    misses.append(fName)
+        parsed = iter(mapFunc(parse, misses))
+        missSet = set(misses)
+        for (key, entries) in shards:
+            shard = self.loadShard(key)
+            dirty = self.pruneShard(shard, entries, directory)
+            for (fName, stamp) in entries:
+                if fName in missSet:
+                    name = os.path.basename(fName)
+                    shard[name] = (stamp, toColumns(next(parsed)))
+                    dirty = True
+            # Saved before yielding, as consumers such as zip may never
+            # resume the generator after the last item.
+            if dirty:
+                self.saveShard(key, shard)
+            for (fName, stamp) in entries:
+                yield fromColumns(shard[os.path.basename(fName)][1])
+
+    def pruneShard(self, shard, entries, directory):
+        """
+        Drops the files of 'shard' which no longer exist.  Only the files not
+        among 'entries' are checked, since those were just found.  They are
+        kept if they exist, as appending a few files of a day requests only
+        those.
+
+        Returns:
+            (bool) -- True if any file was dropped.
+        """
+        requested = {os.path.basename(fName) for (fName, _) in entries}
+        fileDirectory = os.path.dirname(os.path.join(directory, entries[0][0]))
+        stale = [name for name in shard if name not in requested and
+                 not os.path.exists(os.path.join(fileDirectory, name))]
+        for name in stale:
+            del shard[name]
+        return len(stale) > 0
+
+    def shardPath(self, key):
+        return os.path.join(self.cacheDirectory, key + '.npz')
+
+    def loadIndex(self, key):
+        """
+        Returns:
+            (dict(str=tuple)) -- The (mtime, size) stamp of each file in the
+            shard when it was parsed.  Empty if there is no usable shard.
+        """
+        try:
+            with np.load(self.shardPath(key)) as npz:
+                return dict(zip(npz['_names'].tolist(),
+                                zip(npz['_mtimes'].tolist(),
+                                    npz['_sizes'].tolist())))
+        except (OSError, ValueError, KeyError):
+            return dict()
+
+    def loadShard(self, key):
+        """
+        Returns:
+            (dict(str=tuple)) -- (stamp, columns) of each file in the shard.
+        """
+        try:
+            with np.load(self.shardPath(key)) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        except (OSError, ValueError, KeyError):
+            return dict()
+        offsets = arrays.pop('_offsets').tolist()
+        names = arrays.pop('_names').tolist()
+        stamps = zip(arrays.pop('_mtimes').tolist(),
+                     arrays.pop('_sizes').tolist())
+        shard = dict()
+        for (i, (name, stamp)) in enumerate(zip(names, stamps)):
+            rows = slice(offsets[i], offsets[i + 1])
+            columns = {field: values[rows]
+                       for (field, values) in arrays.items()}
+            shard[name] = (stamp, columns)
+        return shard
+
+    def saveShard(self, key, shard):
+        """
+        Writes the shard atomically (see chart_output.writeAtomic), so that
+        readers never see a partial shard.
+        """
+        names = sorted(shard.keys())
+        stamps = [shard[name][0] for name in names]
+        columnsList = [shard[name][1] for name in names]
+        lengths = [len(next(iter(columns.values()))) if columns else 0
+                   for columns in columnsList]
+        arrays = dict(
+            _names=np.array(names, dtype=str),
+            _mtimes=np.array([stamp[0] for stamp in stamps], dtype=np.int64),
+            _sizes=np.array([stamp[1] for stamp in stamps], dtype=np.int64),
+            _offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(
+                np.int64))
+        for field in columnsList[0].keys():
+            arrays[field] = np.concatenate(
+                [columns[field] for columns in columnsList])
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer, **arrays)
+        writeAtomic(self.shardPath(key), buffer.getvalue())
+
+
+def shardKey(fName):
+    """
+    The shard of a dump file: its prefix and date, ie 'FW7_2018_06_26' for
+    'FW7_2018_06_26_20_05_00.txt'.
+    """
+    parts = os.path.splitext(os.path.basename(fName))[0].split('_')
+    return '_'.join(parts[:4])
@@ -1,3 +1,6 @@
+import heapq
+
+
 class SorterAllocator:
     """
     A class which partitions bounded objects (has a start and stop) by some
@@ -41,11 +44,13 @@ class SorterAllocator:
 
     def allocate(self):
         """
-
+        Places the items of each category into a slot bank, giving every item
+        the lowest slot index free at its start.  Slot banks are stored in a
+        dictionary keyed by category.
         """
         self.slotBanks.clear()
         for (cat, itemsHolding) in self.catsHolding.items():
-            slotBank = PlaceAllInAvailableSlots(
+            slotBank = PlaceAllInFreeSlots(
                 itemsHolding, self.fStart, self.fEnd)
             self.slotBanks[cat] = slotBank
 
@@ -99,3 +104,88 @@ def PlaceAllInAvailableSlots(items, fStart, fEnd):
     for item in items:
         PlaceInAvailableSlot(slotBank, item, fStart, fEnd)
     return slotBank
+
+
+def PlaceAllInFreeSlots(items, fStart, fEnd):
+    """
+    Places all the items into the same slots as PlaceAllInAvailableSlots, but
+    in O(n log n) using classic interval partitioning.  Busy slots are kept in
+    a heap keyed on the end of their last item and released slot indices in a
+    second heap, so each item goes to the lowest index slot that is free at
+    its start.
+
+    Arguments:
+    items (list(LeaseRecord)) -- Items to be placed
+    fStart (lambda func -> comparable) -- function to obtain start value from
+    item
+    fEnd (lambda func -> comparable) -- function to obtain end value from item
+
+    Returns:
+        (list(list(item))) -- A populated slotBank for a given category.
+    """
+    items.sort(key=fStart)
+    slotBank = []
+    busySlots = []  # (end of last item, slot index)
+    freeSlots = []  # slot index
+    for item in items:
+        start = fStart(item)
+        while busySlots and busySlots[0][0] <= start:
+            heapq.heappush(freeSlots, heapq.heappop(busySlots)[1])
+        if freeSlots:
+            index = heapq.heappop(freeSlots)
+            slotBank[index].append(item)
+        else:
+            index = len(slotBank)
+            slotBank.append([item])
+        heapq.heappush(busySlots, (fEnd(item), index))
+    return slotBank
+
+
+def PlaceInFreeSlots(slotEnds, items, fStart, fEnd, fPreferred=None):
+    """
+    Places items after those already in a slot bank, knowing only where each
+    slot currently ends.  Each item goes to the lowest index slot which is
+    free at its start, unless the slot given by 'fPreferred' is also free, in
+    which case it keeps that one.  Earlier gaps in a slot are not reused, so
+    items placed in earlier calls never move.
+
+    Arguments:
+    slotEnds (list(comparable)) -- The end of the last item in each slot.
+    Updated in place to include the new items.
+    items (list(item)) -- Items to be placed.  Sorted in place by start.
+    fStart (lambda func -> comparable) -- function to obtain start value from
+    item
+    fEnd (lambda func -> comparable) -- function to obtain end value from item
+
+    Keyword Arguments:
+    fPreferred (lambda func -> int) -- function to obtain the slot an item
+    would rather keep, ie from a previous placement, or None. (default: {None})
+
+    Returns:
+        (list(int)) -- The slot index of each item, in the sorted item order.
+    """
+    items.sort(key=fStart)
+    busySlots = [(end, index) for (index, end) in enumerate(slotEnds)]
+    heapq.heapify(busySlots)
+    freeSlots = []  # slot index, may hold stale entries not in freeSet
+    freeSet = set()
+    indices = []
+    for item in items:
+        start = fStart(item)
+        while busySlots and busySlots[0][0] <= start:
+            index = heapq.heappop(busySlots)[1]
+            heapq.heappush(freeSlots, index)
+            freeSet.add(index)
+        index = None if fPreferred is None else fPreferred(item)
+        if index not in freeSet:
+            while freeSlots and freeSlots[0] not in freeSet:
+                heapq.heappop(freeSlots)
+            index = heapq.heappop(freeSlots) if freeSlots else None
+        if index is None:
+            index = len(slotEnds)
+            slotEnds.append(None)
+        freeSet.discard(index)
+        slotEnds[index] = fEnd(item)
+        heapq.heappush(busySlots, (slotEnds[index], index))
+        indices.append(index)
+    return indices
@@ -0,0 +1,66 @@
+import os
+import sys
+import gzip
+import json
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+import plotly.graph_objs as go
+from chart_output import writeFigure, writeFigureData, viewerPath
+from chart_output import plotlyScriptCall
+
+
+class Test1(unittest.TestCase):
+
+    def testJSONAndViewer(self):
+        x = np.array(['2018-06-26T20:05:00', '2018-06-26T20:10:00'],
+                     dtype='datetime64[s]')
+        fig = dict(data=[go.Scatter(x=x, y=np.array([0.5, 0.25]),
+                                    name='nasim')],
+                   layout=dict(title='FW7'))
+        with tempfile.TemporaryDirectory() as tmp:
+            written = writeFigureData(fig, tmp, 'FW7', 'usage')
+            self.assertEqual(written, [os.path.join(tmp, 'FW7.json'),
+                                       viewerPath(tmp, 'usage')])
+            with open(written[0]) as file:
+                figure = json.load(file)
+            self.assertEqual(figure['layout'], dict(title='FW7'))
+            self.assertEqual(figure['data'][0]['x'],
+                             ['2018-06-26T20:05:00', '2018-06-26T20:10:00'])
+            self.assertEqual(figure['data'][0]['y'], [0.5, 0.25])
+            with open(written[1]) as file:
+                self.assertIn("'.json'", file.read())
+
+            # The viewer is only rewritten when it changes, but is always
+            # listed, as the figure needs it.
+            os.utime(written[1], ns=(0, 0))
+            self.assertEqual(writeFigureData(fig, tmp, 'FW7', 'usage'),
+                             written)
+            self.assertEqual(os.stat(written[1]).st_mtime_ns, 0)
+            written = writeFigureData(fig, tmp, 'FW7', 'usage', 'json.gz')
+            self.assertEqual(written, [os.path.join(tmp, 'FW7.json.gz'),
+                                       viewerPath(tmp, 'usage')])
+            with gzip.open(written[0], 'rt') as file:
+                self.assertEqual(json.load(file), figure)
+            self.assertEqual(sorted(os.listdir(tmp)),
+                             ['FW7.json', 'FW7.json.gz', 'usage_viewer.html'])
+
+    def testHTML(self):
+        fig = dict(data=[go.Scatter(x=[1, 2], y=[3, 4], name='nasim')],
+                   layout=dict(title='FW7'))
+        with tempfile.TemporaryDirectory() as tmp:
+            written = writeFigure(fig, tmp, 'FW7', 'usage')
+            self.assertEqual(written, [os.path.join(tmp, 'FW7.html')])
+            self.assertEqual(os.listdir(tmp), ['FW7.html'])
+            with open(written[0]) as file:
+                page = file.read()
+        head = page[:page.index('</head>')]
+        self.assertEqual(head.count(plotlyScriptCall), 1)
+        self.assertIn('plotly-graph-div', page)
+        self.assertIn('nasim', page)
+
+
+if __name__ == '__main__':
+    unittest.main()
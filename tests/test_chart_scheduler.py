@@ -0,0 +1,51 @@
+import os
+import sys
+import json
+import time
+import tempfile
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from chart_scheduler import ChartJob, runJobs
+
+
+def buildFine(nFiles):
+    return dict(filesParsed=nFiles, recordsProduced=2 * nFiles,
+                outputBytes=100)
+
+
+def buildBroken():
+    raise ValueError("no such module")
+
+
+def buildForever():
+    time.sleep(60)
+
+
+class Test1(unittest.TestCase):
+
+    def testSummary(self):
+        jobs = [ChartJob('COMSOL', buildFine, (3,)),
+                ChartJob('CST', buildBroken),
+                ChartJob('FW7', buildForever),
+                ChartJob('LUM', buildFine, (0,))]
+        with tempfile.TemporaryDirectory() as tmp:
+            summaryPath = os.path.join(tmp, 'summary.json')
+            t0 = time.perf_counter()
+            results = runJobs(jobs, nWorkers=2, timeout=1.,
+                              summaryPath=summaryPath)
+            self.assertLess(time.perf_counter() - t0, 30.)
+            with open(summaryPath) as file:
+                summary = json.load(file)
+        self.assertEqual(summary['jobs'], results)
+        self.assertEqual([r['name'] for r in results],
+                         ['COMSOL', 'CST', 'FW7', 'LUM'])
+        self.assertEqual([r['success'] for r in results],
+                         [True, False, False, True])
+        self.assertEqual(results[0]['recordsProduced'], 6)
+        self.assertIn('no such module', results[1]['error'])
+        self.assertIn('timed out', results[2]['error'])
+
+
+if __name__ == '__main__':
+    unittest.main()
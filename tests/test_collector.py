@@ -0,0 +1,136 @@
+import os
+import sys
+import time
+import queue
+import asyncio
+import threading
+import tempfile
+import subprocess
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from collector import lmstatSource, tasklistSource, runCommand, collect
+from flexnet_scraper import readLeaseLines
+from comp_snapshot import Comp_Snapshot
+from dump_watcher import WatchedChart, watchSnapshots
+
+_lmstatText = """lmstat - Copyright (c) 1989-2017 Flexera Software LLC. All Rights Reserved.
+Flexible License Manager status on Fri 6/22/2018 10:25
+
+Users of COMSOLGUI:  (Total of 2 licenses issued;  Total of 1 license in use)
+
+    mencagli FW6 FW76 (v5.31) (FW90/1718 3504), start Fri 6/22 10:21
+
+Users of RF:  (Total of 2 licenses issued;  Total of 1 license in use)
+
+    nasim FW7 FW7 (v5.31) (FW90/1718 3101), start Fri 6/22 9:02
+"""
+
+_tasklistText = (
+    '"System","4","Services","0","26,376 K","Unknown","N/A","1:30:10","N/A"\r\n'
+    '"comsol.exe","100","RDP-Tcp#0","2","5,000 K","Running","FW7\\nasim",'
+    '"0:05:00","COMSOL"\r\n')
+
+
+def printing(text):
+    """
+    A command that prints 'text' as is.
+    """
+    return [sys.executable, '-c',
+            'import sys; sys.stdout.buffer.write(%r)' % text.encode('ascii')]
+
+
+class Test1(unittest.TestCase):
+
+    def testCollect(self):
+        """
+        Each source's output is parsed in process and archived as the dump
+        scripts would have written it.
+        """
+        snapshots = dict()
+
+        def handle(source, snapshot, fName):
+            snapshots[source.name] = (snapshot, fName)
+
+        sources = [
+            lmstatSource('COMSOL', printing(_lmstatText), ['COMSOLGUI', 'RF'],
+                         interval=0.),
+            tasklistSource('FW7', printing(_tasklistText), interval=0.)]
+        with tempfile.TemporaryDirectory() as tmp:
+            asyncio.run(collect(sources, handle, tmp, nRuns=1))
+            (lines, fName) = snapshots['COMSOL']
+            self.assertTrue(fName.startswith('COMSOL_'))
+            self.assertEqual(lines, readLeaseLines(os.path.join(tmp, fName),
+                                                   ['COMSOLGUI', 'RF']))
+            self.assertEqual([len(moduleLines) for (_, moduleLines)
+                              in lines[1]], [1, 1])
+            (snapshot, fName) = snapshots['FW7']
+            self.assertIsInstance(snapshot, Comp_Snapshot)
+            self.assertEqual(dict(snapshot.memUsage),
+                             {'system': 26376., 'nasim': 5000.})
+            archived = Comp_Snapshot.fromFile(tmp, fName)
+            self.assertEqual(archived.date, snapshot.date)
+            self.assertEqual(archived.tasks, snapshot.tasks)
+
+    def testFailures(self):
+        """
+        Commands which time out or fail are reported, not handed on, and do
+        not stop the other runs.
+        """
+        with self.assertRaises(subprocess.TimeoutExpired):
+            asyncio.run(runCommand(
+                [sys.executable, '-c', 'import time; time.sleep(30)'], 0.5))
+        with self.assertRaises(subprocess.CalledProcessError):
+            asyncio.run(runCommand([sys.executable, '-c', 'exit(3)']))
+        handled = list()
+        sources = [
+            tasklistSource('FW6', [sys.executable, '-c', 'exit(1)'],
+                           interval=0.),
+            tasklistSource('FW7', printing(_tasklistText), interval=0.)]
+        asyncio.run(collect(sources, lambda source, *_: handled.append(
+            source.name), nRuns=2))
+        self.assertEqual(handled, ['FW7', 'FW7'])
+
+
+    def testSlowRender(self):
+        """
+        A chart rendering in the watchSnapshots thread does not make a quick
+        command time out.
+        """
+        class History:
+            def __init__(self):
+                self.outputFiles = list()
+                self.snapshots = list()
+
+            def appendSnapshot(self, snapshot, fName):
+                self.snapshots.append(snapshot)
+
+        history = History()
+        chart = WatchedChart('FW7', history, lambda h: time.sleep(2.))
+        snapshots = queue.Queue()
+        stop = threading.Event()
+        worker = threading.Thread(target=watchSnapshots,
+                                  args=({'FW7': chart}, snapshots),
+                                  kwargs=dict(pollInterval=0.05, debounce=0.,
+                                              stop=stop))
+        quick = [sys.executable, '-c', 'import time, sys; time.sleep(0.3); '
+                 'sys.stdout.write(%r)' % _tasklistText]
+        sources = [tasklistSource('FW7', quick, interval=0.5, timeout=1.)]
+        handled = list()
+
+        def handle(source, snapshot, fName):
+            handled.append(snapshot)
+            snapshots.put((source.name, snapshot, fName))
+
+        worker.start()
+        try:
+            asyncio.run(collect(sources, handle, nRuns=4))
+        finally:
+            stop.set()
+            worker.join()
+        self.assertEqual(len(handled), 4)
+        self.assertGreater(len(history.snapshots), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+import os
+import sys
+import random
+import datetime
+import tempfile
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from unittest import mock
+import comp_history
+from comp_history import CompHistory, Trace, TraceBank
+from lease_store import LeaseStore
+
+
+def writeTasklists(directory, compName, nFiles, seed=0):
+    """
+    Writes 'nFiles' tasklist dumps five minutes apart, with users logging in
+    and out, named as the dump scripts name them.
+
+    Returns:
+        (list(str)) -- The sorted file names.
+    """
+    rnd = random.Random(seed)
+    users = ['N/A', compName + '\\nasim', compName + '\\yasaman',
+             compName + '\\mencagli']
+    processes = [['system', 4, 26376, 'N/A', 0]]
+    t = datetime.datetime(2018, 6, 26, 20, 0)
+    fileNames = list()
+    for i in range(nFiles):
+        t += datetime.timedelta(minutes=5)
+        processes = [p for p in processes
+                     if p[1] == 4 or rnd.random() > 0.1]
+        for _ in range(rnd.randint(0, 2)):
+            processes.append(['app.exe', 8 + 4 * i, rnd.randint(1000, 10 ** 6),
+                              rnd.choice(users), 0])
+        for process in processes:
+            process[4] += rnd.randint(0, 300)
+        fName = t.strftime(compName + '_%Y_%m_%d_%H_%M_%S.txt')
+        with open(os.path.join(directory, fName), 'w') as file:
+            for (imageName, pid, mem, user, seconds) in processes:
+                file.write(
+                    '"{0}","{1}","Console","1","{2:,} K","Running","{3}",'
+                    '"{4}:{5:02d}:{6:02d}","N/A"\n'.format(
+                        imageName, pid, mem, user, seconds // 3600,
+                        seconds // 60 % 60, seconds % 60))
+        fileNames.append(fName)
+    return fileNames
+
+
+def traces(history):
+    return [[(trace.name, trace.x.tolist(), trace.y.tolist())
+             for trace in bank.getAllTraces()]
+            for bank in (history.cpuTraceBank, history.memTraceBank)]
+
+
+class Test1(unittest.TestCase):
+
+    def testPoolMatchesSerial(self):
+        """
+        Parsing the files in a process pool gives the same traces as parsing
+        them serially.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            fileNames = writeTasklists(tmp, 'FW7', 60)
+            serial = CompHistory(tmp, tmp, 'FW7', fileNames=fileNames)
+            serial.buildAllHistory()
+            pooled = CompHistory(tmp, tmp, 'FW7', nWorkers=2,
+                                 fileNames=fileNames)
+            pooled.buildAllHistory()
+            self.assertEqual(pooled.nFilesParsed, 60)
+            self.assertGreater(len(traces(serial)[0]), 3)
+            self.assertEqual(traces(pooled), traces(serial))
+
+    def testTraceBuffers(self):
+        """
+        Traces grow past their capacity and are trimmed to their length when
+        closed.
+        """
+        t0 = datetime.datetime(2018, 6, 26, 20, 0)
+        dates = [t0 + datetime.timedelta(minutes=5 * i) for i in range(40)]
+        trace = Trace('nasim', capacity=4)
+        for (i, date) in enumerate(dates):
+            trace.append(date, float(i))
+        self.assertEqual(trace.n, 40)
+        self.assertEqual(len(trace._x), 64)
+        self.assertEqual(trace.x.tolist(), dates)
+        self.assertEqual(trace.y.tolist(), [float(i) for i in range(40)])
+
+        bank = TraceBank()
+        for (i, date) in enumerate(dates[:30]):
+            usage = {'nasim': float(i)}
+            if 10 <= i < 20:
+                usage['yasaman'] = 1.
+            bank.addValues(usage, date)
+        (closed,) = bank.closedTraces
+        self.assertEqual(closed.name, 'yasaman')
+        self.assertEqual(len(closed._x), closed.n)
+        self.assertEqual(closed.x.tolist(), dates[10:20])
+        self.assertEqual([trace.name for trace in bank.getAllTraces()],
+                         ['yasaman', 'nasim'])
+        self.assertEqual(bank.openTraces['nasim'].n, 30)
+
+    def testAppendFiles(self):
+        """
+        Folding the files in chunks gives the same traces as building from all
+        of them, starting with the second file, the first CPU sample.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            fileNames = writeTasklists(tmp, 'FW7', 50, seed=1)
+            full = CompHistory(tmp, tmp, 'FW7', fileNames=list(fileNames))
+            full.buildAllHistory()
+            folded = CompHistory(tmp, tmp, 'FW7', fileNames=fileNames[:1])
+            folded.buildAllHistory()
+            for i in range(1, len(fileNames), 6):
+                folded.appendFiles(fileNames[i:i + 6])
+            folded.appendFiles(fileNames[:2])
+            self.assertEqual(folded.fileNames, fileNames)
+            self.assertEqual(traces(folded), traces(full))
+            second = datetime.datetime.strptime(
+                fileNames[1], 'FW7_%Y_%m_%d_%H_%M_%S.txt')
+            dates = sorted({x for trace in full.memTraceBank.getAllTraces()
+                            for x in trace.x.tolist()})
+            self.assertEqual(dates[0], second)
+            self.assertEqual(len(dates), len(fileNames) - 1)
+
+    def testStoreWindow(self):
+        """
+        The usage samples are stored in batches as they are folded, and a
+        window loaded back from the store can only be rendered.
+        """
+        with tempfile.TemporaryDirectory() as tmp, \
+                LeaseStore(':memory:') as store, \
+                mock.patch.object(comp_history, 'storeBatch', 7):
+            fileNames = writeTasklists(tmp, 'FW7', 40, seed=2)
+            history = CompHistory(tmp, tmp, 'FW7', fileNames=fileNames,
+                                  store=store)
+            with mock.patch.object(store, 'addUsage',
+                                   wraps=store.addUsage) as addUsage:
+                history.buildAllHistory()
+            self.assertEqual(addUsage.call_count, 6)
+            window = CompHistory(tmp, tmp, 'FW7', fileNames=[], store=store)
+            window.loadWindow(datetime.datetime(2018, 6, 26),
+                              datetime.datetime(2018, 6, 28))
+            self.assertEqual(traces(window), traces(history))
+            self.assertRaises(RuntimeError, window.appendFiles, fileNames)
+            self.assertRaises(RuntimeError, window.foldFiles, fileNames)
+            self.assertEqual(window.fileNames, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import sys
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from comp_snapshot import Process, ProcessTable, Comp_Snapshot
+from comp_snapshot import buildMemUsage, buildCPUUsage
+
+
+def P(imageName, pid, mem, user, time):
+    return Process(imageName=imageName, pid=pid, mem=mem, user=user,
+                   time=time)
+
+
+_older = [
+    P('system idle process', 0, 24., 'system', 1000.),
+    P('system', 4, 26376., 'n/a', 50.),
+    P('comsol.exe', 100, 5e6, 'nasim', 300.),
+    P('chrome.exe', 104, 2e5, 'nasim', 20.),
+    P('matlab.exe', 108, 1e6, 'mencagli', 80.),
+    P('python.exe', 112, 3e4, 'mencagli', 10.)]
+
+_newer = [
+    P('system idle process', 0, 24., 'system', 1200.),
+    P('system', 4, 26376., 'n/a', 55.),
+    P('comsol.exe', 100, 6e6, 'nasim', 420.),
+    P('svchost.exe', 104, 1e4, 'network service', 3.),  # pid reused
+    P('matlab.exe', 108, 1e6, 'mencagli', 70.),  # time went backwards
+    P('python.exe', 112, 3e4, 'mencagli', 15.),
+    P('explorer.exe', 116, 4e4, 'yasaman', 2.)]
+
+
+class Test1(unittest.TestCase):
+
+    def testMemUsage(self):
+        memUsage = buildMemUsage(ProcessTable.fromProcesses(_newer))
+        self.assertEqual(list(memUsage.items()), [
+            ('system', 24. + 26376. + 1e4), ('nasim', 6e6),
+            ('mencagli', 1e6 + 3e4), ('yasaman', 4e4)])
+
+    def testCPUUsage(self):
+        cs = Comp_Snapshot.fromTasks('FW7_2018_06_26_20_10_00.txt', _newer)
+        csOld = Comp_Snapshot.fromTasks('FW7_2018_06_26_20_05_00.txt',
+                                        _older)
+        cs.computeCPUUsage(csOld)
+        timeDiff = sum(p.time for p in _newer) - sum(p.time for p in _older)
+        expected = {'system': 5. + 3., 'nasim': 120., 'mencagli': 70. + 5.,
+                    'yasaman': 2.}
+        self.assertEqual(list(cs.cpuUsage), list(expected))
+        for (user, seconds) in expected.items():
+            self.assertAlmostEqual(cs.cpuUsage[user], seconds / timeDiff)
+
+    def testRebootAndTasks(self):
+        self.assertEqual(buildCPUUsage(_older, _newer), dict())
+        cs = Comp_Snapshot.fromTasks('FW7_2018_06_26_20_10_00.txt', _newer)
+        self.assertEqual(cs.tasks, _newer)
+
+
+if __name__ == '__main__':
+    unittest.main()
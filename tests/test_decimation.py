@@ -0,0 +1,87 @@
+import os
+import sys
+import datetime
+import numpy as np
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from unittest import mock
+import decimation
+from decimation import minMaxIndices, lttbIndices, Decimation, TracePyramid
+
+
+def fiveMinuteSeries(nDays, seed=0):
+    rnd = np.random.RandomState(seed)
+    n = nDays * 24 * 12
+    x = (np.datetime64('2018-01-01T00:00:00') +
+         np.arange(n) * np.timedelta64(300, 's'))
+    y = np.abs(np.cumsum(rnd.normal(size=n)))
+    return (x, y)
+
+
+class Test1(unittest.TestCase):
+
+    def testMinMaxKeepsPeaks(self):
+        (x, y) = fiveMinuteSeries(30)
+        t = x.astype(np.int64).astype(np.float64)
+        indices = minMaxIndices(t, y, 3600. * 4)
+        self.assertLessEqual(len(indices), 2 * 30 * 6 + 2)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertIn(np.argmax(y), indices)
+        self.assertIn(np.argmin(y), indices)
+        buckets = (t // (3600. * 4)).astype(np.int64)
+        for bucket in np.unique(buckets)[:20]:
+            kept = indices[buckets[indices] == bucket]
+            self.assertEqual(y[kept].max(), y[buckets == bucket].max())
+            self.assertEqual(y[kept].min(), y[buckets == bucket].min())
+
+    def testLTTB(self):
+        (x, y) = fiveMinuteSeries(10)
+        t = x.astype(np.int64).astype(np.float64)
+        indices = lttbIndices(t, y, 100)
+        self.assertEqual(len(indices), 100)
+        self.assertEqual((indices[0], indices[-1]), (0, len(t) - 1))
+        self.assertTrue(np.all(np.diff(indices) > 0))
+        self.assertEqual(lttbIndices(t[:50], y[:50], 100).tolist(),
+                         list(range(50)))
+
+    def testAgeTiers(self):
+        (x, y) = fiveMinuteSeries(365)
+        decimation = Decimation()
+        (xKept, yKept) = decimation.apply(x, y, x[-1])
+        self.assertLess(len(xKept), len(x) / 5)
+        self.assertEqual(y.max(), yKept.max())
+        recent = x > x[-1] - np.timedelta64(14, 'D')
+        self.assertEqual(xKept[xKept > x[-1] - np.timedelta64(14, 'D')]
+                         .tolist(), x[recent].tolist())
+        self.assertTrue(np.all(np.diff(xKept) > np.timedelta64(0, 's')))
+        lttb = Decimation('lttb', [(None, datetime.timedelta(hours=1))])
+        (xKept, yKept) = lttb.apply(x, y, x[-1])
+        self.assertLess(len(xKept), len(x) / 5)
+
+    def testPyramidReuse(self):
+        """
+        A pyramid extended as samples are appended selects what a new one
+        selects, and rendering an unchanged trace again computes nothing.
+        """
+        (x, y) = fiveMinuteSeries(200)
+        for method in ('minmax', 'lttb'):
+            stage = Decimation(method)
+            pyramid = TracePyramid(stage)
+            for n in range(len(x) // 2, len(x) + 1, 5000):
+                stage.apply(x[:n], y[:n], x[n - 1], pyramid)
+            (xKept, yKept) = stage.apply(x, y, x[-1], pyramid)
+            (xNew, yNew) = stage.apply(x, y, x[-1])
+            self.assertEqual(xKept.tolist(), xNew.tolist())
+            self.assertEqual(yKept.tolist(), yNew.tolist())
+            with mock.patch.object(decimation, 'levelIndices',
+                                   wraps=decimation.levelIndices) as levels:
+                (xAgain, _) = stage.apply(x, y, x[-1], pyramid)
+                self.assertEqual(levels.call_count, 0)
+                stage.apply(x[:-1], y[:-1], x[-2])
+                self.assertGreater(levels.call_count, 0)
+            self.assertEqual(xAgain.tolist(), xKept.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
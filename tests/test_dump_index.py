@@ -0,0 +1,51 @@
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from dump_index import DumpIndex
+
+
+class Test1(unittest.TestCase):
+
+    def testPartition(self):
+        """
+        Dump files are listed by prefix in sorted order.  Section indexes,
+        temporary files of atomic writes, other files and directories are
+        left out.
+        """
+        names = ['FW7_2018_06_22_10_05_00.txt', 'COMSOL_2018_06_22_10_05_00.txt',
+                 'COMSOL_2018_06_22_10_00_00.txt', 'FW7_2018_06_22_10_00_00.txt',
+                 'CST_2018_06_22_10_00_00.txt',
+                 'COMSOL_2018_06_22_10_00_00.txt.idx',
+                 'COMSOL_2018_06_22_10_10_00.txt.1234.tmp',
+                 'notes.log']
+        with tempfile.TemporaryDirectory() as tmp:
+            for name in names:
+                with open(os.path.join(tmp, name), 'w') as file:
+                    file.write('dump\n')
+            os.mkdir(os.path.join(tmp, 'FW7_old.txt'))
+            index = DumpIndex(tmp)
+            self.assertEqual(index.prefixes(), ['COMSOL', 'CST', 'FW7'])
+            self.assertEqual(index.fileNames('COMSOL'),
+                             ['COMSOL_2018_06_22_10_00_00.txt',
+                              'COMSOL_2018_06_22_10_05_00.txt'])
+            self.assertEqual(index.fileNames('FW7'),
+                             ['FW7_2018_06_22_10_00_00.txt',
+                              'FW7_2018_06_22_10_05_00.txt'])
+            self.assertEqual(index.fileNames('LUM'), [])
+            # The lists handed out are copies.
+            index.fileNames('CST').append('CST_x.txt')
+            self.assertEqual(index.fileNames('CST'),
+                             ['CST_2018_06_22_10_00_00.txt'])
+
+    def testMissingDirectory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            index = DumpIndex(os.path.join(tmp, 'dump'))
+            self.assertEqual(index.prefixes(), [])
+            self.assertEqual(index.fileNames('COMSOL'), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from dump_watcher import DumpWatcher, WatchedChart, watch
+
+
+def writeDump(directory, fName, text='dump\n'):
+    with open(os.path.join(directory, fName), 'a') as file:
+        file.write(text)
+
+
+class FakeHistory:
+
+    def __init__(self):
+        self.fileNames = list()
+        self.outputFiles = list()
+        self.renders = list()
+
+    def appendFiles(self, fileNames):
+        self.fileNames.extend(fileNames)
+
+
+class Test1(unittest.TestCase):
+
+    def testSettledFiles(self):
+        """
+        Files are reported once, after their size and modification time held
+        between two polls.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            writeDump(tmp, 'COMSOL_2018_06_22_10_00_00.txt')
+            watcher = DumpWatcher(tmp, known=['COMSOL_2018_06_22_10_00_00.txt'])
+            self.assertEqual(watcher.poll(), {})
+            writeDump(tmp, 'FW7_2018_06_22_10_05_00.txt')
+            writeDump(tmp, 'COMSOL_2018_06_22_10_05_00.txt')
+            writeDump(tmp, 'notes.log')
+            self.assertEqual(watcher.poll(), {})
+            writeDump(tmp, 'FW7_2018_06_22_10_05_00.txt', 'more\n')
+            self.assertEqual(watcher.poll(),
+                             {'COMSOL': ['COMSOL_2018_06_22_10_05_00.txt']})
+            self.assertEqual(watcher.poll(),
+                             {'FW7': ['FW7_2018_06_22_10_05_00.txt']})
+            self.assertEqual(watcher.poll(), {})
+
+    def testDebouncedRender(self):
+        """
+        A burst of files is folded as it lands and rendered once, 'debounce'
+        seconds after the last file.  A failing chart does not stop the
+        others.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            now = [0.]
+            landing = {1: ['COMSOL_1.txt', 'FW7_1.txt'], 2: ['COMSOL_2.txt'],
+                       3: ['COMSOL_3.txt']}
+            nPolls = [0]
+
+            def sleep(seconds):
+                now[0] += seconds
+                nPolls[0] += 1
+                for fName in landing.get(nPolls[0], []):
+                    writeDump(tmp, fName)
+
+            def failRender(history):
+                raise RuntimeError('no plotly')
+
+            comsol = FakeHistory()
+            charts = dict(
+                COMSOL=WatchedChart('COMSOL', comsol,
+                                    lambda h: h.renders.append(now[0])),
+                FW7=WatchedChart('FW7', FakeHistory(), failRender))
+            watch(charts, tmp, pollInterval=5., debounce=10., maxPolls=12,
+                  clock=lambda: now[0], sleep=sleep)
+            self.assertEqual(comsol.fileNames,
+                             ['COMSOL_1.txt', 'COMSOL_2.txt', 'COMSOL_3.txt'])
+            # COMSOL_3 lands before the 4th poll and settles on the 5th.
+            self.assertEqual(comsol.renders, [30.])
+            self.assertEqual(charts['FW7'].history.fileNames, ['FW7_1.txt'])
+
+    def testChangedFile(self):
+        """
+        The latest file of a prefix is reported again in 'changed' once it
+        settles with a new size, ie after a stall of the dump script, and
+        its chart is rebuilt.  Older files are final.
+        """
+        with tempfile.TemporaryDirectory() as tmp:
+            for fName in ['FW7_1.txt', 'FW7_2.txt', 'COMSOL_1.txt']:
+                writeDump(tmp, fName)
+            watcher = DumpWatcher(tmp, known=['FW7_1.txt', 'FW7_2.txt'])
+            writeDump(tmp, 'FW7_1.txt', 'late\n')
+            writeDump(tmp, 'FW7_2.txt', 'late\n')
+            self.assertEqual(watcher.poll(), {})
+            self.assertEqual(watcher.changed, {})
+            self.assertEqual(watcher.poll(), {'COMSOL': ['COMSOL_1.txt']})
+            self.assertEqual(watcher.changed, {'FW7': ['FW7_2.txt']})
+            self.assertEqual(watcher.poll(), {})
+            self.assertEqual(watcher.changed, {})
+            # A newer file makes the previous one final.
+            writeDump(tmp, 'FW7_3.txt')
+            watcher.poll()
+            self.assertEqual(watcher.poll(), {'FW7': ['FW7_3.txt']})
+            writeDump(tmp, 'FW7_2.txt', 'later\n')
+            watcher.poll()
+            watcher.poll()
+            self.assertEqual(watcher.changed, {})
+
+            now = [0.]
+            rebuilt = list()
+
+            def rebuild(history):
+                rebuilt.append(list(history.fileNames))
+                return FakeHistory()
+
+            def sleep(seconds):
+                now[0] += seconds
+                if now[0] == 5.:
+                    writeDump(tmp, 'FW7_3.txt', 'late\n')
+
+            history = FakeHistory()
+            history.fileNames = ['FW7_1.txt', 'FW7_2.txt', 'FW7_3.txt']
+            chart = WatchedChart('FW7', history, lambda h: None, rebuild)
+            watch(dict(FW7=chart), tmp, pollInterval=5., debounce=10.,
+                  maxPolls=4, clock=lambda: now[0], sleep=sleep,
+                  watcher=watcher)
+            self.assertEqual(rebuilt, [history.fileNames])
+            self.assertIsNot(chart.history, history)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from fingerprint import inputFingerprint, isUpToDate, saveFingerprint
+
+
+class Test1(unittest.TestCase):
+
+    def testFingerprint(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fNames = ['LUM_2018_06_26_10_00_00.txt',
+                      'LUM_2018_06_26_10_05_00.txt']
+            for fName in fNames:
+                with open(os.path.join(tmp, fName), 'w') as file:
+                    file.write('Users of FDTD_Solutions_design:\n')
+            settings = ('LUM', ['FDTD_Solutions_design'], 'html')
+            fingerprint = inputFingerprint(tmp, fNames, settings)
+            self.assertEqual(inputFingerprint(tmp, fNames, settings),
+                             fingerprint)
+            self.assertNotEqual(inputFingerprint(tmp, fNames[:1], settings),
+                                fingerprint)
+            self.assertNotEqual(inputFingerprint(tmp, fNames, ('LUM', [])),
+                                fingerprint)
+
+            outPath = os.path.join(tmp, 'LUM.html')
+            fingerprintPath = os.path.join(tmp, 'LUM.fingerprint.json')
+            self.assertFalse(isUpToDate(fingerprintPath, fingerprint))
+            with open(outPath, 'w') as file:
+                file.write('<html></html>')
+            saveFingerprint(fingerprintPath, fingerprint, [outPath])
+            self.assertTrue(isUpToDate(fingerprintPath, fingerprint))
+
+            with open(os.path.join(tmp, fNames[1]), 'a') as file:
+                file.write('  user FW6 FW76 (v5.3) (FW90/1718 101), start '
+                           'Tue 6/26 9:58\n')
+            changed = inputFingerprint(tmp, fNames, settings)
+            self.assertFalse(isUpToDate(fingerprintPath, changed))
+            os.remove(outPath)
+            self.assertFalse(isUpToDate(fingerprintPath, fingerprint))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,392 @@
+import os
+import sys
+import random
+import datetime
+import tempfile
+from collections import Counter
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from lease_record import LeaseRecord
+from flexnet_history import FlexNetHistory, weekAllocDict, weeklyUsage
+from flexnet_scraper import parseLeaseLines, recordsFromLines
+
+
+def vPrint(v, *args, **kwargs):
+    if v:
+        print(*args, **kwargs)
+
+
+def legacyListDifference(aList, bList):
+    aCopy = aList.copy()
+    for bElem in bList:
+        if bElem in aCopy:
+            aCopy.remove(bElem)
+    return aCopy
+
+
+def legacyListUpdate(aList, bList, attributes):
+    virginIndices = set(range(len(aList)))
+    for bElem in bList:
+        for i in virginIndices:
+            aElem = aList[i]
+            if aElem == bElem:
+                for att in attributes:
+                    aElem.__setattr__(att, bElem.__getattribute__(att))
+                virginIndices.remove(i)
+                break
+
+
+class LegacyHistory(FlexNetHistory):
+    """
+    FlexNetHistory with the original list based appendHistory.
+    """
+
+    def appendHistory(self, recordList):
+        currentLics = recordList.copy()
+        openLics = self.openLicenses
+        recentlyClosed = legacyListDifference(openLics, currentLics)
+        self.closedLicenses.extend(recentlyClosed)
+        recentlyOpened = legacyListDifference(currentLics, openLics)
+        newOpenLics = legacyListDifference(openLics, recentlyClosed)
+        newOpenLics = legacyListDifference(newOpenLics, recentlyOpened)
+        legacyListUpdate(newOpenLics, currentLics, {'lastSeen'})
+        newOpenLics.extend(recentlyOpened)
+        self.openLicenses = newOpenLics
+
+
+def syntheticSnapshots(seed, nSnapshots, uniqueSigs=True):
+    """
+    Generates a random walk of lmstat snapshots as lists of LeaseRecords.
+    """
+    rnd = random.Random(seed)
+    users = ['user' + str(i) for i in range(8)]
+    modules = ['COMSOLGUI', 'RF', 'WAVEOPTICS']
+    servers = ['FW3', 'FW5', 'FW7']
+    t = datetime.datetime(2018, 6, 22, 10, 0)
+    leases = list()
+    snapshots = list()
+    for _ in range(nSnapshots):
+        t += datetime.timedelta(minutes=5)
+        leases = [lease for lease in leases if rnd.random() > 0.1]
+        for _ in range(rnd.randint(0, 3)):
+            lease = (rnd.choice(users), rnd.choice(modules),
+                     rnd.choice(servers), t)
+            sigs = {lease[0:3] for lease in leases}
+            if uniqueSigs and lease[0:3] in sigs:
+                continue
+            leases.append(lease)
+        rnd.shuffle(leases)
+        snapshots.append([
+            LeaseRecord(user, module, server, server, 'v5.3', 'FW90',
+                        start, t, True)
+            for (user, module, server, start) in leases])
+    return snapshots
+
+
+def snapshotText(snapshot):
+    """
+    Renders a snapshot of syntheticSnapshots as an lmstat report.
+    """
+    t = snapshot[0].lastSeen
+    lines = ['Flexible License Manager status on Fri {0}/{1}/{2} {3}:{4:02d}'
+             .format(t.month, t.day, t.year, t.hour, t.minute)]
+    for module in ['COMSOLGUI', 'RF', 'WAVEOPTICS']:
+        lines.append('Users of ' + module + ':  (Total of 9 licenses issued)')
+        for r in snapshot:
+            if r.module == module:
+                lines.append(
+                    '    {0} {1} {2} ({3}) ({4}/1718 3504), start Fri '
+                    '{5}/{6} {7}:{8:02d}'.format(
+                        r.user, r.server, r.terminal, r.version, r.licServer,
+                        r.start.month, r.start.day, r.start.hour,
+                        r.start.minute))
+    return '\n'.join(lines) + '\n'
+
+
+def writeSnapshots(directory, seed, nSnapshots):
+    """
+    Writes the non-empty snapshots of syntheticSnapshots as dump files.
+
+    Returns:
+        (list(str)) -- The sorted file names.
+    """
+    fileNames = list()
+    for snapshot in syntheticSnapshots(seed, nSnapshots):
+        if not snapshot:
+            continue
+        fName = snapshot[0].lastSeen.strftime('COMSOL_%Y_%m_%d_%H_%M_%S.txt')
+        with open(os.path.join(directory, fName), 'w') as file:
+            file.write(snapshotText(snapshot))
+        fileNames.append(fName)
+    return fileNames
+
+
+def cloneSnapshot(snapshot):
+    return [LeaseRecord(r.user, r.module, r.server, r.terminal, r.version,
+                        r.licServer, r.start, r.lastSeen, r.checkedOut)
+            for r in snapshot]
+
+
+class Test1(unittest.TestCase):
+
+    def testMatchesLegacy(self):
+        """
+        Hash based reconciliation gives the same history as the list based one
+        when no two concurrent leases share a signature.
+        """
+        v = False
+        for seed in range(20):
+            snapshots = syntheticSnapshots(seed, 200)
+            new = FlexNetHistory('', '', 'COMSOL', [])
+            old = LegacyHistory('', '', 'COMSOL', [])
+            for snapshot in snapshots:
+                new.appendHistory(cloneSnapshot(snapshot))
+                old.appendHistory(cloneSnapshot(snapshot))
+            vPrint(v, seed, len(new.closedLicenses), len(new.openLicenses))
+            self.assertEqual(repr(new.closedLicenses),
+                             repr(old.closedLicenses))
+            self.assertEqual(repr(new.openLicenses), repr(old.openLicenses))
+
+    def testDuplicateSignatures(self):
+        """
+        A user holding two seats of a module on one server keeps both leases.
+        """
+        t0 = datetime.datetime(2018, 6, 22, 10, 0)
+        t1 = datetime.datetime(2018, 6, 22, 10, 5)
+        t2 = datetime.datetime(2018, 6, 22, 10, 10)
+        t3 = datetime.datetime(2018, 6, 22, 10, 15)
+        history = FlexNetHistory('', '', 'COMSOL', [])
+
+        def seat(start, seen):
+            return LeaseRecord('mencagli', 'RF', 'FW6', 'FW76', 'v5.3',
+                               'FW90', start, seen, True)
+
+        history.appendHistory([seat(t0, t0)])
+        history.appendHistory([seat(t1, t1), seat(t0, t1)])
+        history.appendHistory([seat(t1, t2)])
+        history.appendHistory([seat(t1, t3)])
+        self.assertEqual(len(history.closedLicenses), 1)
+        self.assertEqual(len(history.openLicenses), 1)
+        closed = history.closedLicenses[0]
+        self.assertEqual((closed.start, closed.lastSeen), (t0, t1))
+        still = history.openLicenses[0]
+        self.assertEqual((still.start, still.lastSeen), (t1, t3))
+
+    def testLinesMatchRecords(self):
+        """
+        Reconciling raw lease lines gives the same history as reconciling the
+        parsed records, including after resuming without the lines.  When
+        concurrent leases share a signature, the same seats are open and
+        closed at the same times, but their start times may be paired
+        differently.
+        """
+        modules = ['COMSOLGUI', 'RF', 'WAVEOPTICS']
+        seats = lambda records: Counter(
+            (record.getSig(), record.lastSeen) for record in records)
+        for seed in range(10):
+            uniqueSigs = seed % 2 == 0
+            texts = [snapshotText(snapshot) for snapshot in
+                     syntheticSnapshots(seed, 200, uniqueSigs) if snapshot]
+            lines = FlexNetHistory('', '', 'COMSOL', modules)
+            records = FlexNetHistory('', '', 'COMSOL', modules)
+            for (i, text) in enumerate(texts):
+                if i == 100:
+                    lines.openLines = dict()
+                    lines.lineKeys = dict()
+                lines.appendLines(*parseLeaseLines(text, modules))
+                records.appendHistory(
+                    recordsFromLines(*parseLeaseLines(text, modules)))
+            self.assertGreater(len(records.closedLicenses), 10)
+            if uniqueSigs:
+                self.assertEqual(repr(lines.closedLicenses),
+                                 repr(records.closedLicenses))
+                self.assertEqual(repr(lines.openLicenses),
+                                 repr(records.openLicenses))
+            self.assertEqual(seats(lines.closedLicenses),
+                             seats(records.closedLicenses))
+            self.assertEqual(seats(lines.openLicenses),
+                             seats(records.openLicenses))
+
+    def testAppendFiles(self):
+        """
+        Folding files as they land gives the same history as building from
+        all of them, and files older than the last one folded are ignored.
+        """
+        modules = ['COMSOLGUI', 'RF', 'WAVEOPTICS']
+        with tempfile.TemporaryDirectory() as tmp:
+            fileNames = writeSnapshots(tmp, 1, 150)
+            full = FlexNetHistory(tmp, tmp, 'COMSOL', modules,
+                                  fileNames=list(fileNames))
+            full.buildAllHistory()
+            folded = FlexNetHistory(tmp, tmp, 'COMSOL', modules,
+                                    fileNames=fileNames[:50])
+            folded.buildAllHistory()
+            for i in range(50, len(fileNames), 7):
+                folded.appendFiles(fileNames[i:i + 7])
+            folded.appendFiles(fileNames[:3])
+            self.assertEqual(folded.fileNames, fileNames)
+            self.assertEqual(repr(folded.closedLicenses),
+                             repr(full.closedLicenses))
+            self.assertEqual(repr(folded.openLicenses),
+                             repr(full.openLicenses))
+
+    def testIncrementalNumbers(self):
+        """
+        Numbers handed to closed licenses survive later runs and no two
+        licenses of a module share a number while overlapping.
+        """
+        snapshots = syntheticSnapshots(3, 300, uniqueSigs=False)
+        fixed = dict()
+        with tempfile.TemporaryDirectory() as tmp:
+            for run in range(6):
+                history = FlexNetHistory('', tmp, 'COMSOL', [],
+                                         cacheDirectory=tmp)
+                if run > 0:
+                    self.assertTrue(history.loadCheckpoint())
+                for snapshot in snapshots[run * 50:(run + 1) * 50]:
+                    history.appendHistory(cloneSnapshot(snapshot))
+                history.lastFile = 'COMSOL_' + str(run)
+                history.assignLicenseNumbers(incremental=True)
+                for record in history.closedLicenses:
+                    key = (record.user, record.module, record.server,
+                           record.start, record.lastSeen)
+                    self.assertEqual(fixed.setdefault(key, record.licNumber),
+                                     record.licNumber)
+                records = history.closedLicenses + history.openLicenses
+                for a in records:
+                    for b in records:
+                        if (a is not b and a.module == b.module
+                                and a.licNumber == b.licNumber):
+                            self.assertTrue(a.lastSeen <= b.start
+                                            or b.lastSeen <= a.start)
+        self.assertGreater(len(fixed), 50)
+
+    def testPoolMatchesSerial(self):
+        """
+        Parsing the files in a process pool gives the same history as parsing
+        them serially, and so do reading them through the snapshot cache and
+        reading them back from it.
+        """
+        modules = ['COMSOLGUI', 'RF', 'WAVEOPTICS']
+        with tempfile.TemporaryDirectory() as tmp:
+            fileNames = writeSnapshots(tmp, 4, 100)
+            serial = FlexNetHistory(tmp, tmp, 'COMSOL', modules,
+                                    fileNames=fileNames)
+            serial.buildAllHistory()
+            self.assertGreater(len(serial.closedLicenses), 10)
+            cache = os.path.join(tmp, 'cache')
+            for (nWorkers, cacheDirectory) in [(2, None), (1, cache),
+                                               (2, cache)]:
+                history = FlexNetHistory(tmp, tmp, 'COMSOL', modules,
+                                         nWorkers=nWorkers,
+                                         cacheDirectory=cacheDirectory,
+                                         fileNames=fileNames)
+                history.buildAllHistory()
+                self.assertEqual(repr(history.closedLicenses),
+                                 repr(serial.closedLicenses))
+                self.assertEqual(repr(history.openLicenses),
+                                 repr(serial.openLicenses))
+
+    def testCheckpointResume(self):
+        """
+        Resuming from a checkpoint gives the same history as a full rebuild.
+        The checkpoint is ignored if the module list changed, if it is
+        truncated or corrupt, or if the last file read changed since.
+        """
+        modules = ['COMSOLGUI', 'RF', 'WAVEOPTICS']
+        with tempfile.TemporaryDirectory() as tmp:
+            (data, cache) = (os.path.join(tmp, 'dump'),
+                             os.path.join(tmp, 'cache'))
+            os.mkdir(data)
+            os.mkdir(cache)
+            fileNames = writeSnapshots(data, 2, 150)
+
+            def build(nFiles, modules=modules):
+                history = FlexNetHistory(data, tmp, 'COMSOL', modules,
+                                         cacheDirectory=cache,
+                                         fileNames=fileNames[:nFiles])
+                history.buildAllHistory(incremental=True)
+                return history
+
+            def assertSameHistory(a, b):
+                self.assertEqual(repr(a.closedLicenses),
+                                 repr(b.closedLicenses))
+                self.assertEqual(repr(a.openLicenses), repr(b.openLicenses))
+
+            full = FlexNetHistory(data, tmp, 'COMSOL', modules,
+                                  cacheDirectory=cache, fileNames=fileNames)
+            full.buildAllHistory()
+            build(60)
+            resumed = build(len(fileNames))
+            self.assertEqual(resumed.nFilesParsed, len(fileNames) - 60)
+            assertSameHistory(resumed, full)
+            self.assertEqual(os.listdir(tmp), ['cache', 'dump'])
+            self.assertEqual(build(60, modules[:2]).nFilesParsed, 60)
+
+            build(60)
+            path = os.path.join(cache, 'COMSOL.pkl')
+            with open(path, 'rb') as file:
+                state = file.read()
+            for damaged in [state[:len(state) // 2], b'\x80\x05garbage', b'']:
+                with open(path, 'wb') as file:
+                    file.write(damaged)
+                rebuilt = build(len(fileNames))
+                self.assertEqual(rebuilt.nFilesParsed, len(fileNames))
+                assertSameHistory(rebuilt, full)
+
+            # The last file grows after it was read.
+            os.remove(path)
+            build(60)
+            with open(os.path.join(data, fileNames[59]), 'a') as file:
+                file.write('\n')
+            rebuilt = build(len(fileNames))
+            self.assertEqual(rebuilt.nFilesParsed, len(fileNames))
+
+    def testWeeklyUsage(self):
+        """
+        The vectorized weekly usage sums the per lease week allocations.
+        """
+        now = datetime.datetime(2018, 7, 1, 12, 0)
+        modules = ['COMSOLGUI', 'RF', 'WAVEOPTICS']
+        records = [r for snapshot in syntheticSnapshots(5, 3000)
+                   for r in snapshot[:1]]
+        (users, firstWeek, usage) = weeklyUsage(records, modules, now)
+        expected = dict()
+        for r in records:
+            key = (r.user.lower(), r.module)
+            for (week, value) in weekAllocDict(r.start, r.lastSeen,
+                                               now).items():
+                expected[key + (week,)] = (
+                    expected.get(key + (week,), 0.) + value)
+        self.assertEqual(len(users), len({k[0] for k in expected}))
+        for ((user, module, week), value) in expected.items():
+            self.assertAlmostEqual(
+                usage[users.index(user), week - firstWeek,
+                      modules.index(module)], value)
+        self.assertAlmostEqual(usage.sum(), sum(expected.values()))
+
+    def testWeekBoundaries(self):
+        """
+        A lease within a single week counts its length; one ending exactly on
+        a week boundary adds nothing to the following week.
+        """
+        now = datetime.datetime(2018, 7, 1, 12, 0)
+        week = datetime.timedelta(days=7)
+
+        def lease(start, end):
+            return LeaseRecord('Nasim', 'RF', 'FW6', 'FW76', 'v5.3', 'FW90',
+                               now + start, now + end, False)
+
+        records = [lease(-2 * week + week / 4, -2 * week + week / 2),
+                   lease(-3 * week / 2, -week),
+                   lease(-week, -week)]
+        (users, firstWeek, usage) = weeklyUsage(records, ['RF'], now)
+        self.assertEqual((users, firstWeek), (['nasim'], -2))
+        self.assertEqual(usage[0, :, 0].tolist(), [0.25 + 0.5, 0.])
+        self.assertEqual(weekAllocDict(now - week * 3 / 2, now - week, now),
+                         {-2: 0.5, -1: 0.})
+
+
+if __name__ == '__main__':
+    unittest.main()
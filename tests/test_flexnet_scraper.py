@@ -4,7 +4,44 @@ import numpy as np
 import scipy as sp
 sys.path.insert(0, os.path.abspath(
     os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import tempfile
 import unittest
+from datetime import datetime
+from flexnet_scraper import parseFlexNetText, extractReadTime, extractX
+from flexnet_scraper import parseStartTime, readFlexNetFileMapped
+from flexnet_scraper import parseLeaseLines, leaseLineColumns
+from flexnet_scraper import leaseLinesFromColumns
+
+_lmstatText = '''lmstat - Copyright (c) 1989-2017 Flexera Software LLC. All Rights Reserved.
+Flexible License Manager status on Fri 6/22/2018 10:25
+
+[Detecting lmgrd processes...]
+License server status: 1718@FW90
+
+Users of COMSOLGUI:  (Total of 5 licenses issued;  Total of 2 licenses in use)
+
+  "COMSOLGUI" v5.3, vendor: LMCOMSOL, expiry: permanent(no expiration date)
+  floating license
+
+    mencagli FW6 FW76 (v5.31) (FW90/1718 3504), start Fri 6/22 10:21
+    nasim FW7 FW7 (v5.31) (FW90/1718 1202), start Thu 6/21 18:02
+
+Users of WAVEOPTICS:  (Total of 1 license issued;  Total of 0 licenses in use)
+
+Users of RF:  (Total of 2 licenses issued;  Total of 1 license in use)
+
+  "RF" v5.3, vendor: LMCOMSOL, expiry: permanent(no expiration date)
+  floating license
+
+    mencagli FW6 FW76 (v5.31) (FW90/1718 3605), start Fri 6/22 10:22
+
+Users of OPTIMIZATION:  (Total of 1 license issued;  Total of 1 license in use)
+
+  "OPTIMIZATION" v5.3, vendor: LMCOMSOL, expiry: permanent(no expiration date)
+  floating license
+
+    nasim FW7 FW7 (v5.31) (FW90/1718 1301), start Thu 6/21 18:03
+'''
 
 
 def vPrint(v, *args, **kwargs):
@@ -15,4 +52,78 @@ def vPrint(v, *args, **kwargs):
 class Test1(unittest.TestCase):
 
     def testA(self):
-        self.assertTrue(True)
\ No newline at end of file
+        self.assertTrue(True)
+
+    def testSinglePassMatchesPerModule(self):
+        modules = ['RF', 'WAVEOPTICS', 'COMSOLGUI']
+        readTime = extractReadTime(_lmstatText)
+        expected = []
+        for module in modules:
+            expected.extend(extractX(_lmstatText, module, readTime))
+        records = parseFlexNetText(_lmstatText, modules)
+        self.assertEqual(repr(records), repr(expected))
+        self.assertEqual([r.module for r in records],
+                         ['RF', 'COMSOLGUI', 'COMSOLGUI'])
+
+    def testAllModulesAndLastSection(self):
+        records = parseFlexNetText(_lmstatText)
+        self.assertEqual([r.module for r in records],
+                         ['COMSOLGUI', 'COMSOLGUI', 'RF', 'OPTIMIZATION'])
+        last = records[-1]
+        self.assertEqual(last.user, 'nasim')
+        self.assertEqual(last.start, datetime(2018, 6, 21, 18, 3))
+        self.assertEqual(last.lastSeen, datetime(2018, 6, 22, 10, 25))
+
+    def testStartTimeYear(self):
+        readTime = datetime(2019, 1, 1, 0, 5)
+        self.assertEqual(parseStartTime('12/31 23:50', readTime),
+                         datetime(2018, 12, 31, 23, 50))
+        self.assertEqual(parseStartTime('1/1 0:02', readTime),
+                         datetime(2019, 1, 1, 0, 2))
+        readTime = datetime(2021, 3, 1, 8, 0)
+        self.assertEqual(parseStartTime('2/29 9:15', readTime),
+                         datetime(2020, 2, 29, 9, 15))
+
+    def testMappedMatchesText(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            fName = os.path.join(tmp, 'COMSOL_2018_06_22_10_25_00.txt')
+            for newline in ['\n', '\r\n']:
+                with open(fName, 'w', newline=newline) as file:
+                    file.write(_lmstatText)
+                for modules in [None, ['RF', 'WAVEOPTICS', 'COMSOLGUI'],
+                                ['OPTIMIZATION', 'CST']]:
+                    expected = parseFlexNetText(_lmstatText, modules)
+                    for cacheIndex in [False, True, True]:
+                        records = readFlexNetFileMapped(fName, modules,
+                                                        cacheIndex)
+                        self.assertEqual(repr(records), repr(expected))
+            with open(fName + '.idx') as file:
+                lines = file.read().splitlines()
+            self.assertEqual([line.split('\t')[0] for line in lines[1:]], [
+                'COMSOLGUI', 'WAVEOPTICS', 'RF', 'OPTIMIZATION'])
+
+            # The sidecar index is reused while the file is unchanged.
+            with open(fName + '.idx', 'w') as file:
+                file.write(lines[0] + '\n')
+            self.assertEqual(readFlexNetFileMapped(fName, ['RF']), [])
+
+
+    def testLeaseLineColumns(self):
+        """
+        The lease lines of every module survive the cache columns and are
+        given back for any module list, along with the read time.
+        """
+        columns = leaseLineColumns(parseLeaseLines(_lmstatText))
+        for modules in [None, ['RF', 'WAVEOPTICS', 'COMSOLGUI'],
+                        ['OPTIMIZATION', 'CST']]:
+            self.assertEqual(leaseLinesFromColumns(columns, modules),
+                             parseLeaseLines(_lmstatText, modules))
+        empty = _lmstatText[:_lmstatText.index('Users of')]
+        self.assertEqual(
+            leaseLinesFromColumns(leaseLineColumns(parseLeaseLines(empty)),
+                                  ['RF']),
+            parseLeaseLines(empty, ['RF']))
+
+
+if __name__ == '__main__':
+    unittest.main()
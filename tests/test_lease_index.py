@@ -0,0 +1,111 @@
+import io
+import os
+import sys
+import random
+import datetime
+import tempfile
+import contextlib
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from lease_record import LeaseRecord
+from lease_index import LeaseIndex, main
+from flexnet_history import FlexNetHistory
+
+
+def randomLeases(seed, n):
+    rnd = random.Random(seed)
+    t0 = datetime.datetime(2018, 6, 1)
+    leases = list()
+    for i in range(n):
+        start = t0 + datetime.timedelta(minutes=5 * rnd.randint(0, 5000))
+        lastSeen = start + datetime.timedelta(minutes=5 * rnd.randint(0, 200))
+        record = LeaseRecord('user' + str(rnd.randint(0, 9)),
+                             rnd.choice(['COMSOLGUI', 'RF', 'ACOUSTICS']),
+                             rnd.choice(['FW5', 'FW7']), 'FW7-' + str(i),
+                             'v5.3', 'FW90', start, lastSeen)
+        record.licNumber = rnd.choice([None, 0, 1, 2])
+        leases.append(record)
+    return leases
+
+
+def fields(record):
+    return (record.user, record.module, record.server, record.start,
+            record.lastSeen, record.licNumber)
+
+
+class Test1(unittest.TestCase):
+
+    def testMatchesScan(self):
+        """
+        Point and window queries, filtered or not, find exactly the leases a
+        scan of the records finds.
+        """
+        leases = randomLeases(0, 1000)
+        index = LeaseIndex.fromRecords(leases)
+        rnd = random.Random(1)
+        t0 = datetime.datetime(2018, 6, 1)
+        for _ in range(200):
+            first = t0 + datetime.timedelta(minutes=5 * rnd.randint(0, 5200))
+            last = first + datetime.timedelta(
+                minutes=5 * rnd.choice([0, 0, 1, 50]))
+            module = rnd.choice([None, 'RF', 'COMSOLGUI', 'OPTICS'])
+            user = rnd.choice([None, 'user3', 'nobody'])
+            server = rnd.choice([None, 'FW7'])
+            expected = [fields(r) for r in leases
+                        if r.start <= last and r.lastSeen >= first
+                        and module in (None, r.module)
+                        and user in (None, r.user)
+                        and server in (None, r.server)]
+            found = index.between(first, last, module, user, server)
+            self.assertEqual(sorted(found), sorted(expected))
+            self.assertEqual(found, sorted(found, key=lambda lease: (
+                lease.module, lease.start)))
+
+    def testSaveLoad(self):
+        """
+        A saved index answers the command line without the history.
+        """
+        leases = randomLeases(2, 1000)
+        at = datetime.datetime(2018, 6, 10, 14)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'COMSOL_leases.npz')
+            LeaseIndex.fromRecords(leases).save(path)
+            loaded = LeaseIndex.load(path)
+            expected = [fields(r) for r in leases
+                        if r.module == 'RF' and r.start <= at <= r.lastSeen]
+            self.assertGreater(len(expected), 0)
+            self.assertEqual(sorted(loaded.at(at, 'RF')), sorted(expected))
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                main([path, '--at', '2018-06-10 14:00', '--module', 'RF'])
+            self.assertEqual(len(output.getvalue().splitlines()),
+                             len(expected))
+            empty = LeaseIndex.fromRecords([])
+            self.assertEqual(empty.at(at), [])
+
+    def testHistoryIndexPath(self):
+        """
+        A history saves its index in the cache directory, out of reach of the
+        web server, and saves none without one.
+        """
+        leases = randomLeases(3, 50)
+        with tempfile.TemporaryDirectory() as tmp:
+            (out, cache) = (os.path.join(tmp, 'out'), os.path.join(tmp, 'cache'))
+            os.mkdir(out)
+            os.mkdir(cache)
+            history = FlexNetHistory('', out, 'COMSOL', ['RF'],
+                                     cacheDirectory=cache)
+            history.closedLicenses = leases
+            history.saveLeaseIndex()
+            self.assertEqual(os.listdir(out), [])
+            path = os.path.join(cache, 'COMSOL_leases.npz')
+            self.assertEqual(len(LeaseIndex.load(path)), 50)
+            # Listed, so a build is not skipped while it is missing.
+            self.assertEqual(history.outputFiles, [path])
+            history.cacheDirectory = None
+            self.assertIsNone(history.leaseIndexPath())
+
+
+if __name__ == '__main__':
+    unittest.main()
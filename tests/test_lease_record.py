@@ -1,10 +1,18 @@
 import os
 import sys
+import pickle
+import datetime
+import subprocess
 import numpy as np
 import scipy as sp
-sys.path.insert(0, os.path.abspath(
-    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+_libDir = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging'))
+sys.path.insert(0, _libDir)
 import unittest
+from lease_record import LeaseRecord
+
+_t0 = datetime.datetime(2018, 6, 22, 10, 21)
+_t1 = datetime.datetime(2018, 6, 22, 10, 25)
 
 
 def vPrint(v, *args, **kwargs):
@@ -12,6 +20,11 @@ def vPrint(v, *args, **kwargs):
         print(*args, **kwargs)
 
 
+def seat(user='mencagli', module='RF', start=_t0):
+    return LeaseRecord(user, module, 'FW6', 'FW76', 'v5.31',
+                       'FW90/1718 3605', start, _t1)
+
+
 class Test1(unittest.TestCase):
 
     def testA(self):
@@ -20,3 +33,51 @@ class Test1(unittest.TestCase):
         """
         v = False
         self.assertTrue(True)
+
+    def testEquality(self):
+        a = seat()
+        b = seat(start=_t1)
+        self.assertEqual(a, b)
+        self.assertEqual(hash(a), hash(a.getSig()))
+        self.assertIs(a.getSig(), b.getSig())
+        self.assertNotEqual(a, seat(user='nasim'))
+        self.assertNotEqual(a, a.getSig())
+        b.checkedOut = False
+        self.assertNotEqual(a, b)
+        self.assertEqual(b.getSig(), ('mencagli', 'RF', 'FW6', False))
+        self.assertEqual(hash(b), hash(b.getSig()))
+        self.assertFalse(hasattr(a, '__dict__'))
+
+    def testPickleAcrossProcesses(self):
+        """
+        Unpickled records hash with the string hashes of the new process.
+        """
+        data = pickle.dumps([seat(), seat(module='CADIMPORT')])
+        code = ('import sys, pickle; sys.path.insert(0, {0!r}); '
+                'from lease_record import LeaseRecord; '
+                'records = pickle.loads(sys.stdin.buffer.read()); '
+                'print(all(hash(r) == hash(r.getSig()) for r in records), '
+                'LeaseRecord("mencagli", "RF", "FW6", "", "", "", None) '
+                'in set(records), repr(records[1]))').format(_libDir)
+        env = dict(os.environ, PYTHONHASHSEED='12345')
+        output = subprocess.run([sys.executable, '-c', code], input=data,
+                                stdout=subprocess.PIPE, env=env,
+                                check=True).stdout.decode()
+        self.assertEqual(output.strip(), 'True True ' +
+                         repr(seat(module='CADIMPORT')))
+
+    def testOldPickleState(self):
+        state = dict(user='nasim', module='RF', server='FW7', terminal='FW7',
+                     version='v5.31', licServer='FW90/1718 1202', start=_t0,
+                     lastSeen=_t1, checkedOut=True, licNumber=3)
+        record = LeaseRecord.__new__(LeaseRecord)
+        record.__setstate__(state)
+        self.assertEqual(repr(record), repr(LeaseRecord(
+            'nasim', 'RF', 'FW7', 'FW7', 'v5.31', 'FW90/1718 1202', _t0,
+            _t1)))
+        self.assertEqual(record.licNumber, 3)
+        self.assertEqual(hash(record), hash(('nasim', 'RF', 'FW7', True)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+import os
+import sys
+import random
+import datetime
+import tempfile
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from lease_record import LeaseRecord
+from lease_store import LeaseStore
+from flexnet_history import FlexNetHistory
+
+
+def randomLeases(seed, n):
+    rnd = random.Random(seed)
+    t0 = datetime.datetime(2018, 6, 1)
+    leases = list()
+    for i in range(n):
+        start = t0 + datetime.timedelta(minutes=5 * rnd.randint(0, 5000))
+        lastSeen = start + datetime.timedelta(minutes=5 * rnd.randint(0, 200))
+        record = LeaseRecord('user' + str(rnd.randint(0, 9)),
+                             rnd.choice(['COMSOLGUI', 'RF']), 'FW7',
+                             'FW7-' + str(i), 'v5.3', 'FW90', start, lastSeen)
+        record.licNumber = rnd.randint(0, 4)
+        leases.append(record)
+    return leases
+
+
+def fields(record):
+    return (record.user, record.module, record.server, record.terminal,
+            record.start, record.lastSeen, record.licNumber)
+
+
+class Test1(unittest.TestCase):
+
+    def testWindow(self):
+        """
+        A window query returns exactly the leases overlapping the window,
+        through the (program, module, start, lastSeen) index.
+        """
+        leases = randomLeases(0, 2000)
+        with LeaseStore(':memory:') as store:
+            store.upsertLeases('COMSOL', leases[:1500], leases[1500:])
+            start = datetime.datetime(2018, 6, 10)
+            end = datetime.datetime(2018, 6, 12, 12)
+            (closed, open_) = store.leases('COMSOL', ['COMSOLGUI', 'RF'],
+                                           start, end)
+            expected = [lease for lease in leases
+                        if lease.start < end and lease.lastSeen >= start]
+            self.assertGreater(len(expected), 50)
+            self.assertEqual(sorted(map(fields, closed + open_)),
+                             sorted(map(fields, expected)))
+            self.assertEqual(sorted(map(fields, open_)),
+                             sorted(fields(lease) for lease in leases[1500:]
+                                    if lease.start < end
+                                    and lease.lastSeen >= start))
+            plan = store.connection.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM leases WHERE program = ? '
+                'AND module = ? AND start < ? AND lastSeen >= ?',
+                ('COMSOL', 'RF', '', '')).fetchall()
+            self.assertIn('leasesByTime', repr(plan))
+
+    def testUpsert(self):
+        """
+        Storing a lease again updates it, and lastSeen never moves back.
+        """
+        t0 = datetime.datetime(2018, 6, 22, 10, 0)
+        t1 = datetime.datetime(2018, 6, 22, 11, 0)
+        lease = LeaseRecord('nasim', 'RF', 'FW7', 'FW7', 'v5.3', 'FW90', t0,
+                            t1)
+        stale = LeaseRecord('nasim', 'RF', 'FW7', 'FW7', 'v5.3', 'FW90', t0,
+                            t0)
+        stale.licNumber = 2
+        with LeaseStore(':memory:') as store:
+            store.upsertLeases('COMSOL', openRecords=[lease])
+            store.upsertLeases('COMSOL', closedRecords=[stale])
+            store.upsertLeases('CST', closedRecords=[stale])
+            (closed, open_) = store.leases('COMSOL', ['RF'], t0, t1)
+            self.assertEqual(open_, [])
+            self.assertEqual([(r.lastSeen, r.licNumber) for r in closed],
+                             [(t1, 2)])
+            (closed, open_) = store.leases('CST', ['RF'], t0, t1)
+            self.assertEqual([r.lastSeen for r in closed], [t0])
+
+    def testSeats(self):
+        """
+        Two seats taken by one user on one terminal in the same minute are
+        stored as two leases, through being closed one at a time.
+        """
+        t0 = datetime.datetime(2018, 6, 22, 10, 0)
+        (t1, t2) = (t0 + datetime.timedelta(hours=1),
+                    t0 + datetime.timedelta(hours=2))
+
+        def seat(lastSeen, licNumber):
+            record = LeaseRecord('nasim', 'RF', 'FW7', 'FW7', 'v5.3', 'FW90',
+                                 t0, lastSeen)
+            record.licNumber = licNumber
+            return record
+        with LeaseStore(':memory:') as store:
+            store.upsertLeases('COMSOL', openRecords=[seat(t0, 0), seat(t0, 1)])
+            store.upsertLeases('COMSOL', [seat(t1, 0)], [seat(t1, 1)])
+            store.upsertLeases('COMSOL', [seat(t1, 0)], [seat(t2, 1)])
+            store.upsertLeases('COMSOL', [seat(t2, 1)])
+            store.upsertLeases('COMSOL', [seat(t1, 0), seat(t2, 1)])
+            (closed, open_) = store.leases('COMSOL', ['RF'], t0, t2)
+            self.assertEqual(open_, [])
+            self.assertEqual(sorted((r.lastSeen, r.licNumber) for r in closed),
+                             [(t1, 0), (t2, 1)])
+
+    def testUsage(self):
+        t0 = datetime.datetime(2018, 6, 22, 10, 0)
+        samples = [
+            (t0 + datetime.timedelta(minutes=5 * i),
+             {'nasim': 0.5 * i, 'system': 0.1}, {'nasim': 1e6, 'system': 2e5})
+            for i in range(10)]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'lab_logging.sqlite')
+            with LeaseStore(path) as store:
+                store.addUsage('FW7', samples[:6])
+                store.addUsage('FW7', samples[4:])
+                store.addUsage('FW6', samples)
+            with LeaseStore(path) as store:
+                self.assertEqual(store.usage('FW7', samples[2][0],
+                                             samples[8][0]), samples[2:8])
+                self.assertEqual(store.lastUsageTime('FW7'), samples[-1][0])
+                self.assertIsNone(store.lastUsageTime('FW5'))
+
+    def testHistoryWindow(self):
+        """
+        The numbered leases of a history are stored by assignLicenseNumbers
+        and can be loaded back for a window.
+        """
+        leases = randomLeases(1, 300)
+        with LeaseStore(':memory:') as store:
+            history = FlexNetHistory('', '', 'COMSOL', ['COMSOLGUI', 'RF'],
+                                     store=store)
+            history.closedLicenses = leases[:200]
+            history.openLicenses = leases[200:]
+            history.assignLicenseNumbers()
+            start = datetime.datetime(2018, 6, 1)
+            end = datetime.datetime(2018, 7, 1)
+            loaded = FlexNetHistory('', '', 'COMSOL', ['COMSOLGUI', 'RF'],
+                                    store=store)
+            loaded.loadWindow(start, end)
+            self.assertEqual(sorted(map(fields, loaded.closedLicenses)),
+                             sorted(map(fields, leases[:200])))
+            self.assertEqual(sorted(map(fields, loaded.openLicenses)),
+                             sorted(map(fields, leases[200:])))
+            # The window renders with its stored numbers and is never
+            # checkpointed or folded into.
+            loaded.assignLicenseNumbers(incremental=True)
+            self.assertEqual(sorted(map(fields, loaded.closedLicenses)),
+                             sorted(map(fields, leases[:200])))
+            self.assertRaises(RuntimeError, loaded.saveCheckpoint)
+            self.assertRaises(RuntimeError, loaded.appendFiles, ['x.txt'])
+
+
+if __name__ == '__main__':
+    unittest.main()
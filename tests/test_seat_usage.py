@@ -0,0 +1,107 @@
+import os
+import sys
+import random
+import datetime
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+import numpy as np
+from lease_record import LeaseRecord
+from seat_usage import seatSeries, recordSeatSeries, periodStarts, periodStats
+
+_step = np.timedelta64(300, 's')
+
+
+def randomLeases(seed, n):
+    """
+    Leases starting and ending on five minute marks over three weeks.
+    """
+    rnd = random.Random(seed)
+    t0 = np.datetime64('2018-06-04T00:00:00')
+    starts = t0 + _step * np.array([rnd.randint(0, 20 * 288)
+                                    for _ in range(n)])
+    ends = starts + _step * np.array([rnd.randint(0, 288) for _ in range(n)])
+    return (starts, ends)
+
+
+class Test1(unittest.TestCase):
+
+    def testMatchesSampling(self):
+        """
+        The seat counts and the daily and weekly statistics match counting
+        the leases held at every five minute mark.
+        """
+        for seed in range(3):
+            (starts, ends) = randomLeases(seed, 300)
+            (times, seats) = seatSeries(starts, ends)
+            grid = np.arange(starts.min(), ends.max() + np.timedelta64(8, 'D'),
+                             _step)
+            # A lease seen in one snapshot holds its seat until the next.
+            holdEnds = np.maximum(ends, starts + _step)
+            sampled = ((starts[None, :] <= grid[:, None]) &
+                       (holdEnds[None, :] > grid[:, None])).sum(axis=1)
+            held = np.searchsorted(times, grid, side='right') - 1
+            self.assertTrue(np.array_equal(
+                np.where(held >= 0, seats[np.maximum(held, 0)], 0), sampled))
+            for period in ['day', 'week']:
+                stats = periodStats(times, seats, period)
+                gridPeriods = periodStarts(grid, period)
+                for (i, start) in enumerate(stats['start']):
+                    values = np.sort(sampled[gridPeriods == start])
+                    self.assertEqual(stats['peak'][i], values[-1])
+                    self.assertAlmostEqual(stats['seatHours'][i],
+                                           values.sum() / 12.)
+                    k = int(np.ceil(0.95 * len(values))) - 1
+                    self.assertEqual(stats['percentile'][i], values[k])
+
+    def testHandover(self):
+        """
+        A seat released when another lease starts is counted once.
+        """
+        t = [datetime.datetime(2018, 6, 22, 10, 0),
+             datetime.datetime(2018, 6, 22, 11, 0),
+             datetime.datetime(2018, 6, 22, 12, 0)]
+        records = [
+            LeaseRecord('nasim', 'RF', 'FW7', 'FW7', 'v5.3', 'FW90', t[0],
+                        t[1]),
+            LeaseRecord('yasaman', 'RF', 'FW5', 'FW5', 'v5.3', 'FW90', t[1],
+                        t[2]),
+            LeaseRecord('nasim', 'COMSOLGUI', 'FW7', 'FW7', 'v5.3', 'FW90',
+                        t[0], t[2])]
+        series = recordSeatSeries(records, ['RF', 'ACOUSTICS'])
+        self.assertEqual(list(series), ['RF'])
+        (times, seats) = series['RF']
+        self.assertEqual(times.tolist(), t)
+        self.assertEqual(seats.tolist(), [1, 1, 0])
+        stats = periodStats(times, seats, 'week')
+        # 2018-06-22 was a Friday.
+        self.assertEqual(stats['start'].tolist(),
+                         [datetime.datetime(2018, 6, 18)])
+        self.assertEqual(stats['peak'].tolist(), [1])
+        self.assertEqual(stats['seatHours'].tolist(), [2.])
+
+    def testSeenOnce(self):
+        """
+        A lease seen in a single snapshot holds its seat for one snapshot
+        interval, or 'minHold'.
+        """
+        t0 = datetime.datetime(2018, 6, 22, 10, 0)
+        t1 = datetime.datetime(2018, 6, 22, 10, 5)
+        records = [
+            LeaseRecord('nasim', 'RF', 'FW7', 'FW7', 'v5.3', 'FW90', t0, t0),
+            LeaseRecord('yasaman', 'RF', 'FW5', 'FW5', 'v5.3', 'FW90', t0,
+                        t1)]
+        (times, seats) = recordSeatSeries(records, ['RF'])['RF']
+        self.assertEqual(times.tolist(), [t0, t1])
+        self.assertEqual(seats.tolist(), [2, 0])
+        self.assertEqual(periodStats(times, seats)['seatHours'].tolist(),
+                         [2 / 12.])
+        (times, seats) = recordSeatSeries(records, ['RF'],
+                                          np.timedelta64(60, 's'))['RF']
+        self.assertEqual(times.tolist(),
+                         [t0, datetime.datetime(2018, 6, 22, 10, 1), t1])
+        self.assertEqual(seats.tolist(), [2, 1, 0])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import os
+import sys
+import tempfile
+import numpy as np
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from snapshot_cache import SnapshotCache, shardKey
+
+
+class Test1(unittest.TestCase):
+
+    def testShardKey(self):
+        self.assertEqual(shardKey('C:\\dump\\FW7_2018_06_26_20_05_00.txt'
+                                  .replace('\\', os.sep)), 'FW7_2018_06_26')
+
+    def testHitsAndInvalidation(self):
+        parsed = []
+
+        def parse(fName):
+            parsed.append(fName)
+            with open(os.path.join(tmp, fName)) as file:
+                return [int(word) for word in file.read().split()]
+
+        def toColumns(values):
+            return dict(value=np.array(values, dtype=np.int64))
+
+        def fromColumns(columns):
+            return columns['value'].tolist()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            fNames = ['CST_2018_06_26_10_00_00.txt',
+                      'CST_2018_06_26_10_05_00.txt',
+                      'CST_2018_06_27_10_00_00.txt']
+            for (i, fName) in enumerate(fNames):
+                with open(os.path.join(tmp, fName), 'w') as file:
+                    file.write(' '.join(str(j) for j in range(i)))
+            cache = SnapshotCache(os.path.join(tmp, 'cache'))
+            expected = [[], [0], [0, 1]]
+            result = list(cache.mapCached(parse, fNames, toColumns,
+                                          fromColumns, directory=tmp))
+            self.assertEqual(result, expected)
+            self.assertEqual(parsed, fNames)
+            del parsed[:]
+            result = list(cache.mapCached(parse, fNames, toColumns,
+                                          fromColumns, directory=tmp))
+            self.assertEqual(result, expected)
+            self.assertEqual(parsed, [])
+            with open(os.path.join(tmp, fNames[1]), 'w') as file:
+                file.write('7 8 9')
+            result = list(cache.mapCached(parse, fNames, toColumns,
+                                          fromColumns, directory=tmp))
+            self.assertEqual(result, [[], [7, 8, 9], [0, 1]])
+            self.assertEqual(parsed, [fNames[1]])
+            # Files not requested are kept while they exist, and dropped
+            # from the shard once they are deleted.
+            del parsed[:]
+            list(cache.mapCached(parse, fNames[1:2], toColumns, fromColumns,
+                                 directory=tmp))
+            self.assertEqual(sorted(cache.loadIndex('CST_2018_06_26')),
+                             fNames[:2])
+            os.remove(os.path.join(tmp, fNames[0]))
+            result = list(cache.mapCached(parse, fNames[1:], toColumns,
+                                          fromColumns, directory=tmp))
+            self.assertEqual(result, [[7, 8, 9], [0, 1]])
+            self.assertEqual(parsed, [])
+            self.assertEqual(list(cache.loadIndex('CST_2018_06_26')),
+                             fNames[1:2])
+            self.assertEqual(sorted(os.listdir(os.path.join(tmp, 'cache'))),
+                             ['CST_2018_06_26.npz', 'CST_2018_06_27.npz'])
+
+
+if __name__ == '__main__':
+    unittest.main()
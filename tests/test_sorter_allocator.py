@@ -0,0 +1,57 @@
+import os
+import sys
+import random
+sys.path.insert(0, os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..//lab_logging')))
+import unittest
+from sorter_allocator import SorterAllocator
+from sorter_allocator import PlaceAllInAvailableSlots, PlaceAllInFreeSlots
+
+
+def fStart(item):
+    return item[1]
+
+
+def fEnd(item):
+    return item[2]
+
+
+def randomItems(seed, nItems):
+    rnd = random.Random(seed)
+    items = []
+    for i in range(nItems):
+        start = rnd.randint(0, 200)
+        # Zero length and touching intervals exercise the <= boundary.
+        items.append((i, start, start + rnd.choice([0, 1, 5, 20, 60])))
+    return items
+
+
+class Test1(unittest.TestCase):
+
+    def testMatchesScan(self):
+        for seed in range(50):
+            items = randomItems(seed, 150)
+            expected = PlaceAllInAvailableSlots(list(items), fStart, fEnd)
+            self.assertEqual(PlaceAllInFreeSlots(list(items), fStart, fEnd),
+                             expected)
+
+    def testLowestFreeIndex(self):
+        items = [('a', 0, 10), ('b', 1, 3), ('c', 2, 4), ('d', 5, 9)]
+        slotBank = PlaceAllInFreeSlots(items, fStart, fEnd)
+        self.assertEqual(slotBank, [[('a', 0, 10)],
+                                    [('b', 1, 3), ('d', 5, 9)],
+                                    [('c', 2, 4)]])
+
+    def testAllocatorCategories(self):
+        items = [('RF', 0, 5), ('RF', 3, 8), ('CFD', 1, 2), ('RF', 5, 6)]
+        allocator = SorterAllocator(lambda item: item[0], fStart, fEnd,
+                                    items)
+        allocator.partition()
+        allocator.allocate()
+        self.assertEqual(allocator.slotBanks, {
+            'RF': [[('RF', 0, 5), ('RF', 5, 6)], [('RF', 3, 8)]],
+            'CFD': [[('CFD', 1, 2)]]})
+
+
+if __name__ == '__main__':
+    unittest.main()